@@ -0,0 +1,219 @@
+import argparse
+import ast
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import pickle
+import tempfile
+
+# Disk-backed memoization of whole backtests. A result (trade log, equity
+# curve, final value: anything picklable the script needs after the run) is
+# stored under a hash of everything that determines it:
+#   - the dataset file's contents
+#   - the strategy class's name, the source file defining it and every
+#     project module that file imports, followed transitively
+#   - its effective parameters and the broker settings
+#   - the engine and its version
+# so a repeated run with unchanged inputs is served from disk. Entries are
+# evicted least-recently-used once the cache outgrows max_bytes.
+#
+#   python backtest_memo.py stats
+#   python backtest_memo.py clear [--strategy BollingerBandStrategy]
+
+CACHE_DIR = "results/backtest_cache"
+MAX_BYTES = 256 * 1024 * 1024
+MEMO_VERSION = 1   # bump when the cached result layout changes
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Hashed for every strategy, whether or not its file imports them directly
+CORE_SOURCES = ("bt_indicators.py", "indicators.py", "bt_feeds.py", "dataset_store.py")
+
+_digests = {}
+_imports = {}
+
+
+def file_digest(path):
+    # Content hash of the dataset, reused while its size and mtime are unchanged
+    stat = os.stat(path)
+    signature = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if signature not in _digests:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        _digests[signature] = digest.hexdigest()
+    return _digests[signature]
+
+
+def project_imports(path):
+    # Project files imported anywhere in the file at path (function-level
+    # imports included), looked up next to it and at the project root
+    stat = os.stat(path)
+    signature = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if signature not in _imports:
+        with open(path, "rb") as f:
+            tree = ast.parse(f.read(), path)
+        names = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names.update(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and not node.level and node.module:
+                names.add(node.module)
+        found = []
+        for name in names:
+            for directory in (os.path.dirname(signature[0]), PROJECT_DIR):
+                candidate = os.path.join(directory, *name.split(".")) + ".py"
+                if os.path.isfile(candidate):
+                    found.append(candidate)
+                    break
+        _imports[signature] = found
+    return _imports[signature]
+
+
+def source_files(path, sources=()):
+    # path, the core modules and any extra sources, plus everything they import
+    pending = [path, *(os.path.join(PROJECT_DIR, name) for name in CORE_SOURCES), *sources]
+    seen = set()
+    while pending:
+        path = os.path.abspath(pending.pop())
+        if path in seen or not os.path.isfile(path):
+            continue
+        seen.add(path)
+        pending.extend(project_imports(path))
+    return sorted(seen)
+
+
+def strategy_fingerprint(strategy, sources=()):
+    # The file the class is defined in and the project code it runs on, so
+    # edits to the strategy, to indicators and analyzers defined next to it
+    # or to the feeds and indicator modules it uses invalidate its entries
+    try:
+        path = inspect.getsourcefile(strategy) or ""
+    except TypeError:
+        path = ""
+    files = source_files(path, sources)
+    return [strategy.__qualname__,
+            {os.path.relpath(file, PROJECT_DIR): file_digest(file) for file in files}]
+
+
+def strategy_params(strategy, overrides=None):
+    # Defaults of a Backtrader strategy merged with the overrides passed to addstrategy
+    params = dict(strategy.params._getpairs()) if hasattr(strategy, "params") else {}
+    params.update(overrides or {})
+    return params
+
+
+def engine_version(engine="backtrader"):
+    module = importlib.import_module(engine)
+    return [engine, getattr(module, "__version__", ""), MEMO_VERSION]
+
+
+class BacktestMemo:
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def key(self, data_path, strategy, params=None, settings=None, engine="backtrader", sources=()):
+        parts = [file_digest(data_path), strategy_fingerprint(strategy, sources),
+                 strategy_params(strategy, params), settings or {}, engine_version(engine)]
+        text = json.dumps(parts, sort_keys=True, default=repr)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def _path(self, strategy, key):
+        # Strategy name up front so entries can be cleared per strategy
+        return os.path.join(self.cache_dir, f"{strategy.__qualname__}-{key}.pkl")
+
+    def get(self, strategy, key):
+        path = self._path(strategy, key)
+        try:
+            with open(path, "rb") as f:
+                result = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        os.utime(path)  # mtime doubles as the last-used time for eviction
+        return result
+
+    def put(self, strategy, key, result):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(strategy, key)
+        # Written to a file of its own and renamed, so an interrupted run never
+        # leaves a torn entry and concurrent runs never share a temp file
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        self.evict()
+
+    def entries(self):
+        # (path, size, last used) per entry, least recently used first
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".pkl"):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((os.path.join(self.cache_dir, name), stat.st_size, stat.st_mtime))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def clear(self, strategy_name=None):
+        removed = 0
+        for path, _, _ in self.entries():
+            if strategy_name is None or os.path.basename(path).startswith(f"{strategy_name}-"):
+                os.remove(path)
+                removed += 1
+        return removed
+
+
+def memoized(run, data_path, strategy, params=None, settings=None, engine="backtrader", memo=None,
+             sources=()):
+    # run() -> picklable result, only called when the cache has no entry for
+    # these inputs. settings carries everything else that shapes the run
+    # (cash, commission, order types) and must be JSON-friendly; sources
+    # names further files the result depends on beyond the strategy's imports.
+    memo = memo or BacktestMemo()
+    key = memo.key(data_path, strategy, params, settings, engine, sources)
+    result = memo.get(strategy, key)
+    if result is None:
+        result = run()
+        memo.put(strategy, key, result)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or invalidate the backtest result cache")
+    parser.add_argument("command", choices=["stats", "clear"])
+    parser.add_argument("--strategy", help="clear only this strategy class's entries")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    args = parser.parse_args()
+
+    memo = BacktestMemo(args.cache_dir)
+    if args.command == "clear":
+        print(f"Removed {memo.clear(args.strategy)} cached backtest(s) from {args.cache_dir}")
+        return
+    entries = memo.entries()
+    counts = {}
+    for path, size, _ in entries:
+        name = os.path.basename(path).rsplit("-", 1)[0]
+        counts[name] = counts.get(name, 0) + 1
+    total = sum(size for _, size, _ in entries)
+    print(f"{len(entries)} cached backtest(s), {total / 2**20:.1f} MB of {memo.max_bytes / 2**20:.0f} MB in {args.cache_dir}")
+    for name, count in sorted(counts.items()):
+        print(f"  {name:<28}{count:>4}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import keyword
+from collections import namedtuple
+
+import numpy as np
+
+from profiling import loop
+
+# Fast bar-by-bar access for the pure Python strategy loops. df.iloc[i] and
+# iterrows() build a Series for every bar; these helpers hand out the frame's
+# columns as NumPy views, or one small namedtuple record per bar, instead.
+# By default values keep their NumPy scalar types, so arithmetic and printed
+# output are the same as with row['Close']; native=True hands out Python
+# floats/ints instead, which are several times cheaper to compute with.
+# Compact float32 / int32 columns are widened to 64 bits first, so running
+# totals like cash don't pick up float32 rounding.
+
+
+def _check_columns(columns):
+    for col in columns:
+        if not col.isidentifier() or keyword.iskeyword(col):
+            raise ValueError(f"column {col!r} can't be used as a bar attribute")
+
+
+class BarColumns:
+    # Column views addressed as attributes: bars.Close[i], bars.index[i]
+    # (lists of Python scalars rather than views with native=True)
+    def __init__(self, df, columns=None, native=False):
+        self.columns = tuple(df.columns if columns is None else columns)
+        _check_columns(self.columns)
+        self.index = df.index
+        for col in self.columns:
+            values = df[col].to_numpy()
+            if values.dtype.kind in "fi" and values.dtype.itemsize < 8:
+                values = values.astype(np.float64 if values.dtype.kind == "f" else np.int64)
+            setattr(self, col, values.tolist() if native else values)
+
+    def __len__(self):
+        return len(self.index)
+
+
+def bar_record_type(index, columns):
+    # Record class for one frame: bar.i (bar position), one field per column,
+    # and bar.date looked up from the index only when it is read, since
+    # boxing a Timestamp for every bar costs more than the rest of the record
+    fields = ('i',) + tuple(columns)
+    _check_columns(fields)
+
+    class Bar(namedtuple("Bar", fields)):
+        __slots__ = ()
+
+        @property
+        def date(self):
+            return index[self.i]
+
+        def __repr__(self):
+            values = ", ".join(f"{field}={value!r}" for field, value in zip(fields[1:], self[1:]))
+            return f"Bar(date={self.date!r}, {values})"
+
+    return Bar
+
+
+def iter_bars(df, columns=None, start=0, native=False):
+    # Yields one record per bar from `start` on; pair consecutive bars with
+    # itertools.pairwise(iter_bars(...)) where a rule needs the previous bar
+    bars = BarColumns(df, columns, native=native)
+    record = bar_record_type(bars.index, bars.columns)
+    arrays = [getattr(bars, col)[start:] for col in bars.columns]
+    # zip already builds each bar's tuple; wrap it without going through the
+    # record's Python-level __new__
+    new = tuple.__new__
+    for values in loop("bar_loop", zip(range(start, len(bars)), *arrays), bars=max(len(bars) - start, 0)):
+        yield new(record, values)
@@ -0,0 +1,172 @@
+import numpy as np
+
+from indicator_cache import CachedIndicators
+from profiling import loop
+from pruning import remaining_gains
+
+# Batch backtest engine: evaluates many parameter sets at once as
+# (params x bars) arrays instead of one iterrows() pass per combination.
+
+# Pruning rules are checked every PRUNE_EVERY bars: each check costs about as
+# much as a bar step, so checking every bar would eat most of the savings
+PRUNE_EVERY = 8
+
+
+def day_numbers(index):
+    # Calendar day number for every bar, so (date - last_trade_date).days
+    # becomes a plain integer subtraction
+    return np.asarray(index.values.astype("datetime64[D]").astype(np.int64))
+
+
+def crossover_signals(line, signal):
+    # Same rule as the optimizers: cross on this bar, compared with the previous bar
+    buy = np.zeros(line.shape, dtype=bool)
+    sell = np.zeros(line.shape, dtype=bool)
+    buy[:, 1:] = (line[:, 1:] > signal[:, 1:]) & (line[:, :-1] <= signal[:, :-1])
+    sell[:, 1:] = (line[:, 1:] < signal[:, 1:]) & (line[:, :-1] >= signal[:, :-1])
+    return buy, sell
+
+
+def macd_lines(indicators, fast, slow, signal):
+    # MACD and signal line for every (fast, slow, signal) row. Lines missing
+    # from the shared indicator cache are built together in one kernel pass.
+    lines = indicators.macd_many(zip(fast.tolist(), slow.tolist(), signal.tolist()))
+    macd = np.array([line for line, _ in lines])
+    signal_line = np.array([sig for _, sig in lines])
+    return macd, signal_line
+
+
+def simulate_fixed_size(close, days, buy, sell, min_days, trade_size,
+                        initial_cash=1_000_000, keep_equity=False, single_position=False,
+                        pruning=None, pruned=None, held_bars=None):
+    # Fixed-size long/flat book with a minimum calendar-day gap between trades,
+    # stepped one bar at a time across all parameter rows together.
+    # single_position=True only buys when flat (the RSI optimizer's rule);
+    # otherwise buys stack while cash allows, as in the MACD optimizer.
+    # With pruning (see pruning.py), rows that break a rule get a NaN final
+    # value; pruned, an optional (rows x 2) int array, receives each row's
+    # reason index and bars simulated. held_bars, an optional per-row int
+    # array, receives the number of bars each row held shares (for exposure).
+    n_params, n_bars = buy.shape
+    min_days = np.broadcast_to(np.asarray(min_days, dtype=np.int64), (n_params,))
+    trade_size = np.broadcast_to(np.asarray(trade_size, dtype=np.int64), (n_params,))
+
+    cash = np.full(n_params, float(initial_cash))
+    shares = np.zeros(n_params, dtype=np.int64)
+    last_trade_day = days[0] - min_days
+    equity = np.empty((n_params, n_bars)) if keep_equity else None
+
+    # Original row of each stepped row (all of them until the first
+    # compaction). Pruned rows are carried along as dead until they make up
+    # half of the step, then every per-row array is compacted at once, so the
+    # step keeps working on plain slices instead of gathering rows every bar.
+    rows = slice(None)
+    if pruning:
+        alive = np.ones(n_params, dtype=bool)
+        peak = cash.copy()
+        if keep_equity:
+            equity[:] = np.nan
+        if pruned is not None:
+            pruned[:] = (0, n_bars)
+        if pruning.bound:
+            # Holdings only grow by trade_size per later buy signal, and each
+            # share can at most gain every up-move left
+            gains = remaining_gains(close)
+            # Buy signals per block of PRUNE_EVERY bars, so the count left
+            # after a check bar is one subtraction per check
+            blocks = np.add.reduceat(buy, np.arange(0, n_bars, PRUNE_EVERY), axis=1, dtype=np.int64)
+            buys_left = blocks.sum(axis=1)
+
+    for t in loop("bar_loop", range(n_bars), bars=n_bars * n_params):
+        price = close[t]
+        gap_ok = (days[t] - last_trade_day) >= min_days
+        cost = trade_size * price
+
+        do_buy = buy[:, t] & gap_ok & (cash >= cost)
+        if single_position:
+            do_buy &= shares == 0
+        do_sell = sell[:, t] & gap_ok & (shares >= trade_size)
+
+        cash = np.where(do_buy, cash - cost, cash)
+        cash = np.where(do_sell, cash + cost, cash)
+        shares = shares + np.where(do_buy, trade_size, 0) - np.where(do_sell, trade_size, 0)
+        last_trade_day = np.where(do_buy | do_sell, days[t], last_trade_day)
+        if held_bars is not None:
+            # Pruned rows still waiting for compaction stop counting
+            held_bars[rows] += (shares > 0) & alive if pruning else shares > 0
+
+        if keep_equity:
+            equity[rows, t] = np.where(alive, cash + shares * price, np.nan) if pruning else cash + shares * price
+
+        if not pruning:
+            continue
+        if pruning.max_drawdown is not None:
+            # The peak needs every bar; everything else only the check bars
+            peak = np.maximum(peak, cash + shares * price)
+        if t % PRUNE_EVERY:
+            continue
+
+        value = cash + shares * price
+        upside = np.inf
+        if pruning.bound:
+            # Signals after bar t: minus the previous block and this bar's own
+            if t:
+                buys_left = buys_left - blocks[:, t // PRUNE_EVERY - 1]
+            upside = (shares + trade_size * (buys_left - buy[:, t])) * gains[t]
+        reason = np.where(alive, pruning.check_many(value, peak, upside), 0)
+        stop = reason > 0
+        if not stop.any():
+            continue
+        index = np.arange(n_params)[rows]
+        if pruned is not None:
+            pruned[index[stop]] = np.column_stack((reason[stop], np.full(stop.sum(), t + 1)))
+        alive &= ~stop
+        if np.count_nonzero(alive) * 2 <= len(alive):
+            if not alive.any():
+                break
+            rows = index[alive]
+            buy, sell = buy[alive], sell[alive]
+            cash, shares, peak = cash[alive], shares[alive], peak[alive]
+            last_trade_day, min_days, trade_size = last_trade_day[alive], min_days[alive], trade_size[alive]
+            if pruning.bound:
+                blocks, buys_left = blocks[alive], buys_left[alive]
+            alive = alive[alive]
+
+    final_value = np.full(n_params, np.nan)
+    if pruning:
+        if alive.any():
+            final_value[np.arange(n_params)[rows][alive]] = (cash + shares * close[-1])[alive]
+        pruning.completed(final_value)
+    else:
+        final_value[:] = cash + shares * close[-1]
+    return final_value, equity
+
+
+def run_macd_batch(df, params, initial_cash=1_000_000, batch_size=2048, keep_equity=False,
+                   indicators=None, pruning=None, pruned=None, held_bars=None):
+    # params: integer array with columns (fast, slow, signal, min_days, trade_size)
+    params = np.asarray(params, dtype=np.int64).reshape(-1, 5)
+    if indicators is None:
+        indicators = CachedIndicators(df)
+    close = df["Close"].to_numpy(dtype=float)
+    days = day_numbers(df.index)
+
+    final_values = np.empty(len(params))
+    equity = np.empty((len(params), len(close))) if keep_equity else None
+
+    for start in range(0, len(params), batch_size):
+        chunk = params[start:start + batch_size]
+        # min_days / trade_size do not change the lines, so build them per unique triple
+        triples, row_of = np.unique(chunk[:, :3], axis=0, return_inverse=True)
+        macd, signal_line = macd_lines(indicators, triples[:, 0], triples[:, 1], triples[:, 2])
+        buy, sell = crossover_signals(macd, signal_line)
+        values, curve = simulate_fixed_size(close, days, buy[row_of], sell[row_of],
+                                            chunk[:, 3], chunk[:, 4],
+                                            initial_cash, keep_equity, pruning=pruning,
+                                            pruned=None if pruned is None else pruned[start:start + batch_size],
+                                            held_bars=None if held_bars is None else held_bars[start:start + batch_size])
+        final_values[start:start + batch_size] = values
+        if keep_equity:
+            equity[start:start + batch_size] = curve
+
+    return final_values, equity
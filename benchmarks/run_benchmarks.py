@@ -0,0 +1,361 @@
+import argparse
+import datetime
+import glob
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# asv-style benchmark harness. Every benchmark runs in its own process against
+# a fixture workspace (a temp directory laid out like the repo root, with the
+# fixture in place of the NIFTY CSVs), so scripts run unmodified and peak RSS
+# is per benchmark. Results are appended to a JSON history and compared with
+# the previous run to make regressions visible.
+#
+# The parent process only uses the standard library: a child's peak RSS
+# includes the memory of the process it was forked from, so NumPy/pandas are
+# imported only in the child-side functions (fixtures, indicator timing).
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY_PATH = os.path.join(REPO_ROOT, "benchmarks", "history.json")
+
+DATASET_FILES = ("nifty_data_clean.csv", "nifty_data_with_indicators.csv")
+
+# Synthetic fixtures are seeded hourly random walks (hourly so 250k bars fit
+# pandas' timestamp range); "real" is the NIFTY dataset itself
+FIXTURES = {
+    "real": None,
+    "2.5k": 2_500,
+    "25k": 25_000,
+    "250k": 250_000,
+}
+
+# name -> (kernel in indicators.py, arguments after the close prices)
+INDICATORS = {
+    "sma_20": ("sma", 20),
+    "sma_20_90": ("sma", [20, 90]),
+    "rolling_std_20": ("rolling_std", 20),
+    "bollinger_20": ("bollinger_bands", 20, 2.0),
+    "ema_12": ("ema", 12),
+    "macd_12_26_9": ("macd", 12, 26, 9),
+    "wilder_rsi_14": ("wilder_rsi", 14),
+    "obv": ("obv", "Volume"),
+}
+
+# Phase scripts left out of the registry because they fail on every run:
+# strategy_ma_crossover.py reads a hard-coded C:/ path, and obv_bt_corrected.py
+# reads broker._value_history, which Backtrader's broker doesn't have
+EXCLUDED_SCRIPTS = ("strategy_ma_crossover.py", "obv_bt_corrected.py")
+
+OPTIMIZERS = ("macd_optimizer", "rsi_optimizer", "obv_optimizer", "optimize_bb", "optimize_ma")
+
+# Optimizers that support pruning, benchmarked a second time with these rules
+# to show the evaluations saved (see pruning.py)
+PRUNED_OPTIMIZERS = ("macd_optimizer", "rsi_optimizer", "obv_optimizer")
+PRUNING_ARGS = ["--max-drawdown", "0.05", "--prune-bound"]
+
+
+def benchmark_registry():
+    # name -> command (run with the fixture workspace as cwd)
+    registry = {}
+    for name in INDICATORS:
+        registry[f"indicator.{name}"] = [sys.executable, os.path.abspath(__file__), "--child-indicator", name]
+    for phase, folder in (("phase_1", "phase_1_Strategy_Development_Pure_Python"),
+                          ("phase_2", "phase_2_Backtrader_implementation")):
+        for path in sorted(glob.glob(os.path.join(REPO_ROOT, folder, "*.py"))):
+            if os.path.basename(path) in EXCLUDED_SCRIPTS:
+                continue
+            registry[f"{phase}.{os.path.basename(path)[:-3]}"] = [sys.executable, path]
+    for name in OPTIMIZERS:
+        registry[f"optimizer.{name}"] = [sys.executable, os.path.join(REPO_ROOT, "optimization", f"{name}.py")]
+    for name in PRUNED_OPTIMIZERS:
+        registry[f"optimizer.{name}.pruned"] = registry[f"optimizer.{name}"] + PRUNING_ARGS
+    return registry
+
+
+# ==== Fixtures ====
+def synthetic_frame(n_bars, seed=None):
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(n_bars if seed is None else seed)
+    close = 8000 * np.exp(np.cumsum(rng.normal(0.0003, 0.011, n_bars)))
+    open_ = np.concatenate(([close[0]], close[:-1])) * (1 + rng.normal(0, 0.002, n_bars))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.004, n_bars)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.004, n_bars)))
+    volume = rng.lognormal(np.log(150_000), 0.4, n_bars).astype(np.int64)
+    index = pd.date_range("2000-01-03", periods=n_bars, freq="h", name="Date")
+    return pd.DataFrame({"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume},
+                        index=index)
+
+
+def write_fixture(fixture, workspace):
+    # Child side: fills dataset/ and builds the columnar stores up front, so
+    # no benchmark pays for the conversion. Prints the number of bars.
+    import indicators
+    from dataset_store import load_frame
+
+    if FIXTURES[fixture] is None:
+        for name in DATASET_FILES:
+            shutil.copy(os.path.join(REPO_ROOT, "dataset", name), os.path.join(workspace, "dataset", name))
+    else:
+        df = synthetic_frame(FIXTURES[fixture])
+        df.to_csv(os.path.join(workspace, "dataset", DATASET_FILES[0]))
+        indicators.add_indicators(df).to_csv(os.path.join(workspace, "dataset", DATASET_FILES[1]))
+    load_frame(os.path.join(workspace, "dataset", DATASET_FILES[1]))
+    print(len(load_frame(os.path.join(workspace, "dataset", DATASET_FILES[0]))))
+
+
+def build_workspace(fixture, root):
+    # Returns (workspace, bars). The workspace mirrors the repo's relative
+    # layout: dataset/, results/ and optimization/
+    workspace = os.path.join(root, fixture)
+    for folder in ("dataset", "results", "optimization"):
+        os.makedirs(os.path.join(workspace, folder), exist_ok=True)
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child-fixture", fixture],
+                            cwd=workspace, capture_output=True, text=True, check=True).stdout
+    return workspace, int(output.split()[-1])
+
+
+# ==== Running ====
+def run_child(command, cwd, timeout, log_path):
+    # (status, wall time, peak RSS in MB or None) of one benchmark process
+    env = dict(os.environ, MPLBACKEND="Agg")
+    with open(log_path, "wb") as log:
+        start = time.perf_counter()
+        proc = subprocess.Popen(command, cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT)
+        if hasattr(os, "wait4"):
+            timed_out, peak_rss_mb = _wait_wait4(proc, start, timeout)
+        else:
+            timed_out, peak_rss_mb = _wait_polling(proc, start, timeout)
+        wall = time.perf_counter() - start
+
+    if timed_out:
+        status = "timeout"
+    else:
+        status = "ok" if proc.returncode == 0 else "failed"
+    return status, wall, peak_rss_mb
+
+
+def _wait_wait4(proc, start, timeout):
+    # Unix: wait4 gives the RSS of that child (and of the workers it reaped),
+    # unlike RUSAGE_CHILDREN which is a high-water mark across every benchmark
+    # run so far
+    timed_out = False
+    while True:
+        pid, exit_status, usage = os.wait4(proc.pid, os.WNOHANG)
+        if pid:
+            break
+        if time.perf_counter() - start > timeout:
+            proc.kill()
+            _, exit_status, usage = os.wait4(proc.pid, 0)
+            timed_out = True
+            break
+        time.sleep(0.005)
+    proc.returncode = os.waitstatus_to_exitcode(exit_status)
+    return timed_out, usage.ru_maxrss / 1024
+
+
+def _wait_polling(proc, start, timeout):
+    # Platforms without os.wait4 (Windows): the peak working set from psutil,
+    # sampled while the child runs; without psutil RSS isn't measured
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    handle = None
+    if psutil is not None:
+        try:
+            handle = psutil.Process(proc.pid)
+        except psutil.Error:
+            pass
+    peak = None
+    timed_out = False
+    while proc.poll() is None:
+        if handle is not None:
+            try:
+                info = handle.memory_info()
+                peak = max(peak or 0, getattr(info, "peak_wset", info.rss))
+            except psutil.Error:
+                pass
+        if time.perf_counter() - start > timeout:
+            proc.kill()
+            proc.wait()
+            timed_out = True
+            break
+        time.sleep(0.005)
+    return timed_out, peak / 2**20 if peak is not None else None
+
+
+def run_benchmark(name, command, workspace, bars, timeout):
+    log_path = os.path.join(workspace, f"{name}.log")
+    status, wall, peak_rss_mb = run_child(command, workspace, timeout, log_path)
+    if status == "ok" and name.startswith("indicator."):
+        # Indicator children time the kernel itself, excluding interpreter start-up
+        with open(log_path) as f:
+            wall = json.loads(f.read().strip().splitlines()[-1])["wall_s"]
+
+    result = {
+        "status": status,
+        "bars": bars,
+        "wall_s": round(wall, 6),
+        "peak_rss_mb": round(peak_rss_mb, 1) if peak_rss_mb is not None else None,
+        "bars_per_sec": round(bars / wall, 1) if wall > 0 else None,
+    }
+    if status == "ok" and name.endswith(".pruned"):
+        # Pruned optimizers end their output with a JSON summary of the pruning
+        with open(log_path) as f:
+            result["pruning"] = json.loads(f.read().strip().splitlines()[-1])
+    if status != "ok":
+        with open(log_path, errors="replace") as f:
+            result["log_tail"] = f.read()[-500:]
+    return result
+
+
+def time_indicator(name, min_time=0.5, max_repeats=1000):
+    # Child side: best-of-N time of one kernel call on the fixture
+    import indicators
+    from dataset_store import load_frame
+
+    df = load_frame("dataset/nifty_data_clean.csv")
+    kernel_name, *args = INDICATORS[name]
+    kernel = getattr(indicators, kernel_name)
+    args = [df[arg].to_numpy() if isinstance(arg, str) else arg for arg in args]
+    close = df["Close"].to_numpy()
+    kernel(close, *args)
+
+    best = float("inf")
+    total = 0.
+    for _ in range(max_repeats):
+        start = time.perf_counter()
+        kernel(close, *args)
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        total += elapsed
+        if total >= min_time:
+            break
+    print(json.dumps({"wall_s": best}))
+
+
+# ==== History ====
+def current_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def previous_result(history, key, machine):
+    for run in reversed(history):
+        if run["machine"] == machine and run["results"].get(key, {}).get("status") == "ok":
+            return run["results"][key]
+    return None
+
+
+def report(results, history, machine, threshold):
+    print(f"\n{'Benchmark':<58}{'Wall (s)':>11}{'RSS (MB)':>10}{'Bars/sec':>14}  vs previous")
+    regressions = []
+    for key, result in results.items():
+        if result["status"] != "ok":
+            print(f"{key:<58}{result['status'].upper():>11}")
+            continue
+        change = ""
+        previous = previous_result(history, key, machine)
+        if previous is not None:
+            ratio = result["wall_s"] / previous["wall_s"]
+            change = f"{ratio:.2f}x"
+            if ratio > 1 + threshold:
+                change += "  REGRESSION"
+                regressions.append(key)
+        if "pruning" in result:
+            pruning = result["pruning"]
+            change += (f"  pruned {pruning['pruned']}/{pruning['combinations']}, "
+                       f"{pruning['bars_saved_pct']}% of bars saved")
+        rss = f"{result['peak_rss_mb']:.1f}" if result["peak_rss_mb"] is not None else "-"
+        print(f"{key:<58}{result['wall_s']:>11.4f}{rss:>10}"
+              f"{result['bars_per_sec']:>14,.0f}  {change}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time indicators, strategy scripts and optimizer grids")
+    parser.add_argument("--fixtures", nargs="+", choices=list(FIXTURES), default=list(FIXTURES))
+    parser.add_argument("--bench", default=".", help="regex selecting benchmark names")
+    parser.add_argument("--timeout", type=float, default=1800, help="seconds per benchmark")
+    parser.add_argument("--history", default=HISTORY_PATH)
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="flag runs this much slower than the previous one (0.2 = 20%%)")
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--list", action="store_true", help="list benchmark names and exit")
+    parser.add_argument("--child-indicator", help=argparse.SUPPRESS)
+    parser.add_argument("--child-fixture", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_indicator:
+        time_indicator(args.child_indicator)
+        return
+    if args.child_fixture:
+        write_fixture(args.child_fixture, os.getcwd())
+        return
+
+    pattern = re.compile(args.bench)
+    registry = {name: command for name, command in benchmark_registry().items() if pattern.search(name)}
+    if args.list:
+        print("\n".join(registry))
+        return
+
+    if not hasattr(os, "wait4"):
+        try:
+            import psutil  # noqa: F401
+        except ImportError:
+            print("Peak RSS is not measured here: os.wait4 is unavailable and psutil isn't installed")
+
+    machine = platform.node()
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="nifty_bench_") as root:
+        for fixture in args.fixtures:
+            workspace, bars = build_workspace(fixture, root)
+            for name, command in registry.items():
+                key = f"{name}[{fixture}]"
+                print(f"Running {key} ...", flush=True)
+                results[key] = run_benchmark(name, command, workspace, bars, args.timeout)
+
+    history = load_history(args.history)
+    regressions = report(results, history, machine, args.threshold)
+
+    if not args.no_save:
+        history.append({
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "commit": current_commit(),
+            "machine": machine,
+            "cpus": os.cpu_count(),
+            "python": platform.python_version(),
+            "results": results,
+        })
+        with open(args.history, "w") as f:
+            json.dump(history, f, indent=2)
+        print(f"\nResults appended to {args.history}")
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import numpy as np
+
+from batch_engine import day_numbers
+from jit import njit
+from profiling import phase
+
+# Compiled Bollinger Band mean-reversion backtest: buy when the close drops
+# below the lower band, sell when it closes above the SMA, hits the profit
+# target or has been held max_hold_days. Two fill models are supported:
+#   FILL_CLOSE      orders fill at the signal bar's close (phase 1 scripts)
+#   FILL_NEXT_OPEN  orders fill at the next bar's open (Backtrader market orders)
+# With keep_pending the strategy never clears its order once placed, like
+# optimize_bb's BollingerBandOpt, so it stops trading after the first order.
+
+FILL_CLOSE = 0
+FILL_NEXT_OPEN = 1
+
+BUY = 1
+SELL = -1
+
+
+@njit(cache=True)
+def _bollinger_kernel(open_, close, lower, sma, day_index, initial_capital, position_size,
+                      profit_target, max_hold_days, commission, fill_mode, keep_pending, start):
+    n_bars = len(close)
+    trade_bar = np.empty(n_bars, np.int64)
+    trade_side = np.empty(n_bars, np.int64)
+    trade_price = np.empty(n_bars)
+    trade_brokerage = np.empty(n_bars)
+    trade_pnl = np.empty(n_bars)
+    trade_capital = np.empty(n_bars)
+    equity = np.empty(n_bars)
+
+    n_trades = 0
+    capital = initial_capital
+    quantity = 0
+    entry_price = 0.      # signal close, used for the profit target
+    fill_price = 0.       # execution price, used for the trade PnL
+    entry_day = 0
+    pending = 0           # side of an order waiting for the next open
+    locked = False        # keep_pending: an order was placed, nothing more is evaluated
+
+    for i in range(n_bars):
+        # Step 0 fills an order pending from the previous bar at this bar's
+        # open; step 1 evaluates the bar's close, as Backtrader's next() does
+        for step in range(2):
+            side = 0
+            price = 0.
+            brokerage = 0.
+            if step == 0:
+                if pending == 0:
+                    continue
+                side = pending
+                price = open_[i]
+                pending = 0
+            elif i >= start and not locked:
+                if quantity == 0:
+                    if close[i] < lower[i]:
+                        entry_price = close[i]
+                        entry_day = day_index[i]
+                        side = BUY
+                else:
+                    holding_days = day_index[i] - entry_day
+                    gain_pct = (close[i] - entry_price) / entry_price
+                    if close[i] > sma[i] or gain_pct >= profit_target or holding_days >= max_hold_days:
+                        side = SELL
+                if side != 0 and keep_pending:
+                    locked = True
+                if side != 0 and fill_mode == FILL_NEXT_OPEN:
+                    pending = side
+                    side = 0
+                price = close[i]
+
+            if side == BUY:
+                cost = price * position_size
+                brokerage = commission * cost
+                if capital >= cost + brokerage:
+                    capital -= cost + brokerage
+                    quantity = position_size
+                    fill_price = price
+                    trade_pnl[n_trades] = np.nan
+                else:
+                    side = 0
+            elif side == SELL:
+                value = price * quantity
+                brokerage = commission * value
+                trade_pnl[n_trades] = (price - fill_price) * quantity - brokerage
+                capital += value - brokerage
+                quantity = 0
+
+            if side != 0:
+                trade_bar[n_trades] = i
+                trade_side[n_trades] = side
+                trade_price[n_trades] = price
+                trade_brokerage[n_trades] = brokerage
+                trade_capital[n_trades] = capital
+                n_trades += 1
+
+        equity[i] = capital + quantity * close[i]
+
+    return (trade_bar[:n_trades], trade_side[:n_trades], trade_price[:n_trades],
+            trade_brokerage[:n_trades], trade_pnl[:n_trades], trade_capital[:n_trades], equity)
+
+
+def run_bollinger(close, lower, sma, day_index=None, open_=None, initial_capital=1_000_000,
+                  position_size=35, profit_target=0.03, max_hold_days=20, commission=0.001,
+                  fill_mode=FILL_CLOSE, keep_pending=False, start=1):
+    # Returns (trades, equity): trades is a dict of per-trade arrays (bar,
+    # side, price, brokerage, pnl, capital_after; pnl is NaN for buys) and
+    # equity the bar-by-bar account value. day_index measures holding time:
+    # calendar day numbers for the phase 1 scripts, bar numbers (the default)
+    # for Backtrader's len(self).
+    close = np.ascontiguousarray(close, dtype=float)
+    day_index = np.arange(len(close)) if day_index is None else day_index
+    open_ = close if open_ is None else open_
+    with phase("bar_loop", bars=max(len(close) - start, 0)):
+        bar, side, price, brokerage, pnl, capital, equity = _bollinger_kernel(
+            np.ascontiguousarray(open_, dtype=float), close,
+            np.ascontiguousarray(lower, dtype=float), np.ascontiguousarray(sma, dtype=float),
+            np.ascontiguousarray(day_index, dtype=np.int64), float(initial_capital), int(position_size),
+            float(profit_target), int(max_hold_days), float(commission), fill_mode, bool(keep_pending), start)
+    trades = {'bar': bar, 'side': side, 'price': price, 'brokerage': brokerage,
+              'pnl': pnl, 'capital_after': capital}
+    return trades, equity
+
+
+def run_bollinger_frame(df, **params):
+    # Phase 1 semantics on a frame with Close/Lower_Band/SMA_20 columns:
+    # close fills and holding time in calendar days
+    return run_bollinger(df['Close'].to_numpy(), df['Lower_Band'].to_numpy(), df['SMA_20'].to_numpy(),
+                         day_index=day_numbers(df.index), **params)
@@ -0,0 +1,141 @@
+import argparse
+import array
+import os
+import sys
+import time
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+from backtrader.linebuffer import LineBuffer
+from backtrader.utils import date2num
+
+from indicator_cache import CachedIndicators
+
+# Backtrader feeds for the NIFTY frames.
+#
+# FastPandasData preloads every line straight from the frame's NumPy columns,
+# one array per line, where PandasData reads one cell at a time through
+# .iloc. Feeds with filters, date bounds, a datetime column or an input
+# timezone fall back to the PandasData path; either way the lines are identical.
+#
+# IndicatorPandasData also carries the MA crossover's 20 / 90 SMAs and the
+# 20-bar, 2 std Bollinger Bands as data lines (self.data.sma_fast, .sma_slow,
+# .sma_20, .upper_band, .lower_band), so a strategy can read them instead of
+# building Backtrader indicators. They are computed once at preload from the
+# close line with CachedIndicators' Backtrader arithmetic (NaN warm-up,
+# population std bands), not read from the dataset's precomputed columns
+# (full-history windows, sample std), so a strategy on feed lines trades
+# exactly like one on bt.indicators once it keeps their warm-up (WarmupLine).
+#
+#   python bt_feeds.py    # time the MA and Bollinger strategies both ways
+
+SMA_FAST_PERIOD, SMA_SLOW_PERIOD = 20, 90
+BAND_PERIOD, BAND_DEVFACTOR = 20, 2.0
+INDICATOR_LINES = ('sma_fast', 'sma_slow', 'sma_20', 'upper_band', 'lower_band')
+
+
+def _line_array(values):
+    # float64 column -> the array.array('d') Backtrader lines are stored in
+    return array.array('d', np.ascontiguousarray(values, dtype=np.float64).tobytes())
+
+
+class FastPandasData(bt.feeds.PandasData):
+    def _fast_preload(self):
+        return (self.p.datetime is None and self.p.fromdate is None and self.p.todate is None
+                and not self._tzinput and not self._filters and not self._ffilters
+                and self.lines.datetime.mode != LineBuffer.QBuffer)
+
+    def preload(self):
+        if not self._fast_preload():
+            super().preload()
+            return
+
+        frame = self.p.dataname
+        for alias in self.getlinealiases():
+            line = getattr(self.lines, alias)
+            if alias == 'datetime':
+                line.array = array.array('d', map(date2num, frame.index.to_pydatetime()))
+            elif self._colmapping[alias] is None:
+                line.array = _line_array(np.full(len(frame), np.nan))
+            else:
+                line.array = _line_array(frame.iloc[:, self._colmapping[alias]].to_numpy())
+        # Every row is consumed: next mode (runonce=False) calls _load once the
+        # preloaded bars run out, which would otherwise replay the frame
+        self._idx = len(frame) - 1
+
+        self._last()
+        self.home()
+
+
+class IndicatorPandasData(FastPandasData):
+    lines = INDICATOR_LINES
+    params = tuple((line, None) for line in INDICATOR_LINES)
+
+    def preload(self):
+        super().preload()
+        # From the bars actually loaded, so filters and date bounds are honoured;
+        # the shared cache serves repeated runs over the same closes
+        indicators = CachedIndicators(pd.DataFrame({'Close': np.asarray(self.lines.close.array)}))
+        mid, top, bot = indicators.bt_bollinger(BAND_PERIOD, BAND_DEVFACTOR)
+        lines = {'sma_fast': indicators.bt_sma(SMA_FAST_PERIOD), 'sma_slow': indicators.bt_sma(SMA_SLOW_PERIOD),
+                 'sma_20': mid, 'upper_band': top, 'lower_band': bot}
+        for alias, values in lines.items():
+            getattr(self.lines, alias).array = _line_array(values)
+
+
+def time_strategy(df, feed, strategy, repeats, **params):
+    # Best-of-N wall time of one Cerebro run (preload included) and its final value
+    best = float('inf')
+    for _ in range(repeats):
+        cerebro = bt.Cerebro(stdstats=False)
+        cerebro.adddata(feed(dataname=df))
+        cerebro.addstrategy(strategy, **params)
+        cerebro.broker.setcash(1000000)
+        cerebro.broker.setcommission(commission=0.001)
+        start = time.perf_counter()
+        cerebro.run()
+        best = min(best, time.perf_counter() - start)
+    return best, cerebro.broker.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the MA and Bollinger strategies on precomputed feed lines")
+    parser.add_argument("--data", default="dataset/nifty_data_with_indicators.csv")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "phase_2_Backtrader_implementation"))
+    from bollinger_band_bt_final import BollingerBandStrategy
+    from dataset_store import load_frame
+    from ma_crossover_bt import MACrossoverStrategy
+
+    df = load_frame(args.data)
+    print(f"{len(df)} bars, best of {args.repeats}")
+
+    preload = {}
+    for feed in (bt.feeds.PandasData, FastPandasData):
+        best = float('inf')
+        for _ in range(args.repeats):
+            data = feed(dataname=df)
+            data.setenvironment(bt.Cerebro())
+            data._start()
+            start = time.perf_counter()
+            data.preload()
+            best = min(best, time.perf_counter() - start)
+        preload[feed] = best
+    print(f"{'Preload':<22}PandasData {preload[bt.feeds.PandasData]:.4f}s  "
+          f"FastPandasData {preload[FastPandasData]:.4f}s  "
+          f"({preload[bt.feeds.PandasData] / preload[FastPandasData]:.0f}x)")
+
+    for name, strategy in (("MA crossover", MACrossoverStrategy), ("Bollinger bands", BollingerBandStrategy)):
+        built, built_value = time_strategy(df, bt.feeds.PandasData, strategy, args.repeats)
+        fed, fed_value = time_strategy(df, IndicatorPandasData, strategy, args.repeats, feed_lines=True)
+        # The speedup only means something if both runs traded the same
+        same = "same result" if built_value == fed_value else "DIFFERENT result"
+        print(f"{name:<22}bt indicators {built:.3f}s (final {built_value:,.2f})  "
+              f"feed lines {fed:.3f}s (final {fed_value:,.2f})  {built / fed:.2f}x, {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import backtrader as bt
+
+import indicators
+
+# Shared Backtrader indicators and analyzers used by the optimizers and phase 2 scripts
+
+
+class PrecomputedLine(bt.Indicator):
+    # Replays an array computed outside Cerebro (one value per data bar), so
+    # strategies can use cached indicator series instead of rebuilding them
+    lines = ('value',)
+    params = (
+        ('values', None),
+        ('period', 1),
+    )
+
+    def __init__(self):
+        self.addminperiod(self.p.period)
+
+    def next(self):
+        self.lines.value[0] = self.p.values[len(self) - 1]
+
+    def once(self, start, end):
+        dst = self.lines.value.array
+        values = self.p.values
+        for i in range(start, end):
+            dst[i] = values[i]
+
+
+class WarmupLine(bt.Indicator):
+    # Passes a precomputed data line through with the minimum period of the
+    # indicator it stands in for, so a strategy reading feed lines starts on
+    # the same bar (and its crossovers see the same first values)
+    lines = ('value',)
+    params = (
+        ('period', 1),
+    )
+
+    def __init__(self):
+        self.addminperiod(self.p.period)
+
+    def next(self):
+        self.lines.value[0] = self.data[0]
+
+    def once(self, start, end):
+        dst = self.lines.value.array
+        src = self.data.array
+        for i in range(start, end):
+            dst[i] = src[i]
+
+
+class OBV(bt.Indicator):
+    # Running on-balance volume, 0 on the first bar like indicators.obv. Each
+    # bar adds (or subtracts) its volume to the previous total, so the cost is
+    # linear in bars rather than re-summing the whole history
+    lines = ('obv',)
+    plotinfo = dict(subplot=True)
+
+    def next(self):
+        if len(self) == 1:
+            self.lines.obv[0] = 0.
+        elif self.data.close[0] > self.data.close[-1]:
+            self.lines.obv[0] = self.lines.obv[-1] + self.data.volume[0]
+        elif self.data.close[0] < self.data.close[-1]:
+            self.lines.obv[0] = self.lines.obv[-1] - self.data.volume[0]
+        else:
+            self.lines.obv[0] = self.lines.obv[-1]
+
+    def once(self, start, end):
+        dst = self.lines.obv.array
+        values = indicators.obv(self.data.close.array[:end], self.data.volume.array[:end])
+        for i in range(start, end):
+            dst[i] = values[i]
+
+
+class FinalValue(bt.Analyzer):
+    # Broker value at the end of the run; survives optstrategy's optreturn
+    # stripping, unlike attributes set on the strategy itself
+    def stop(self):
+        self.value = self.strategy.broker.getvalue()
+
+    def get_analysis(self):
+        return self.value
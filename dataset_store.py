@@ -0,0 +1,204 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from profiling import profiled
+
+# Columnar binary copy of the CSV datasets: one .npy file per column (dates as
+# int64 epoch nanoseconds) opened with memory mapping. Loading skips CSV and
+# date parsing, and every process that opens the same store shares one
+# page-cache copy of the data instead of holding its own parsed frame.
+#
+# The CSV is converted in chunks straight into the memory-mapped files, so
+# even minute-bar files of millions of rows never sit in memory whole. A
+# compact store keeps float columns as float32 and integer columns as int32,
+# halving the footprint; large files (COMPACT_MIN_ROWS and up) use it by
+# default.
+#
+# A store is built in a temporary directory and swapped in whole, under a lock
+# file, so processes that start together convert it once and none of them
+# reads a half-written or truncated column.
+
+META_FILE = "meta.json"
+CHUNK_ROWS = 250_000
+COMPACT_MIN_ROWS = 500_000
+COMPACT_DTYPES = {"f": np.float32, "i": np.int32}
+LOCK_TIMEOUT = 600
+
+
+def store_dir(csv_path, compact=False):
+    return os.path.splitext(csv_path)[0] + ("_columns_compact" if compact else "_columns")
+
+
+def _source_stamp(csv_path):
+    stat = os.stat(csv_path)
+    return {"source_size": stat.st_size, "source_mtime_ns": stat.st_mtime_ns}
+
+
+def _read_meta(path):
+    meta_path = os.path.join(path, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        return json.load(f)
+
+
+def is_stale(csv_path, compact=False):
+    meta = _read_meta(store_dir(csv_path, compact))
+    if meta is None:
+        return True
+    if not os.path.exists(csv_path):
+        # Store without its source CSV is still usable
+        return False
+    stamp = _source_stamp(csv_path)
+    return any(meta.get(key) != value for key, value in stamp.items())
+
+
+def count_rows(csv_path):
+    # Data rows in the CSV (lines after the header), without parsing it
+    lines = 0
+    last = b"\n"
+    with open(csv_path, "rb") as f:
+        while block := f.read(1 << 24):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    return lines + (last != b"\n") - 1
+
+
+def _column_values(values, compact):
+    if values.dtype.kind == "M":
+        return values.astype("datetime64[ns]").view(np.int64)
+    if compact and values.dtype.kind in COMPACT_DTYPES:
+        dtype = COMPACT_DTYPES[values.dtype.kind]
+        if values.dtype.kind == "i" and len(values) and (
+                values.min() < np.iinfo(dtype).min or values.max() > np.iinfo(dtype).max):
+            raise ValueError("integer column doesn't fit in int32; convert with compact=False")
+        return values.astype(dtype)
+    return values
+
+
+@contextmanager
+def _conversion_lock(path, timeout=LOCK_TIMEOUT):
+    # Only one process converts a store at a time; the others wait here
+    lock = path + ".lock"
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{lock} has been held for {timeout}s; "
+                                   f"delete it if no conversion is running")
+            time.sleep(0.1)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.remove(lock)
+
+
+def _swap_in(tmp, path):
+    # Moves the finished store into place. The old files are renamed away, not
+    # rewritten, so processes that have them memory-mapped keep valid data
+    old = None
+    if os.path.exists(path):
+        old = f"{path}.{os.getpid()}.old"
+        os.rename(path, old)
+    os.rename(tmp, path)
+    if old:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def _write_store(csv_path, path, compact, chunk_rows):
+    n_rows = count_rows(csv_path)
+    arrays = {}
+    row = 0
+    for chunk in pd.read_csv(csv_path, parse_dates=["Date"], chunksize=chunk_rows):
+        for col in chunk.columns:
+            values = _column_values(chunk[col].to_numpy(), compact)
+            if col not in arrays:
+                arrays[col] = np.lib.format.open_memmap(os.path.join(path, f"{col}.npy"), mode="w+",
+                                                        dtype=values.dtype, shape=(n_rows,))
+            elif values.dtype.kind != arrays[col].dtype.kind:
+                raise ValueError(f"column {col!r} changes type between chunks; "
+                                 f"convert with a larger chunk_rows")
+            arrays[col][row:row + len(chunk)] = values
+        row += len(chunk)
+    for values in arrays.values():
+        values.flush()
+
+    # Blank lines are counted but not parsed, so the store may be slightly
+    # longer than the data; meta records the real row count
+    meta = {"columns": list(arrays), "rows": row, "compact": compact, **_source_stamp(csv_path)}
+    with open(os.path.join(path, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+
+
+def _convert(csv_path, compact, chunk_rows):
+    # Caller holds the conversion lock
+    path = store_dir(csv_path, compact)
+    tmp = tempfile.mkdtemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                           dir=os.path.dirname(path) or ".")
+    try:
+        _write_store(csv_path, tmp, compact, chunk_rows)
+        _swap_in(tmp, path)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return path
+
+
+def convert_csv(csv_path, compact=False, chunk_rows=CHUNK_ROWS):
+    with _conversion_lock(store_dir(csv_path, compact)):
+        return _convert(csv_path, compact, chunk_rows)
+
+
+def _use_compact(csv_path):
+    for compact in (False, True):
+        if not is_stale(csv_path, compact):
+            return _read_meta(store_dir(csv_path, compact))["rows"] >= COMPACT_MIN_ROWS
+    return count_rows(csv_path) >= COMPACT_MIN_ROWS
+
+
+def load_columns(csv_path, compact=None):
+    # Memory-mapped, read-only column arrays; converts the CSV on first use.
+    # compact=None picks the compact store for files of COMPACT_MIN_ROWS or more.
+    if compact is None:
+        compact = _use_compact(csv_path)
+    if is_stale(csv_path, compact):
+        with _conversion_lock(store_dir(csv_path, compact)):
+            # Another process may have built it while this one waited
+            if is_stale(csv_path, compact):
+                _convert(csv_path, compact, CHUNK_ROWS)
+    path = store_dir(csv_path, compact)
+    meta = _read_meta(path)
+    return {col: np.load(os.path.join(path, f"{col}.npy"), mmap_mode="r")[:meta["rows"]]
+            for col in meta["columns"]}
+
+
+@profiled("load")
+def load_frame(csv_path, compact=None):
+    # Date-indexed DataFrame whose columns are views on the memory-mapped
+    # files. Existing columns are read-only; new columns can be added as usual.
+    columns = load_columns(csv_path, compact)
+    dates = columns.pop("Date")
+    index = pd.DatetimeIndex(dates.view("datetime64[ns]"), name="Date")
+    return pd.DataFrame(columns, index=index, copy=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the columnar stores for CSV datasets")
+    parser.add_argument("csv_paths", nargs="*", default=["dataset/nifty_data_clean.csv",
+                                                         "dataset/nifty_data_with_indicators.csv"])
+    parser.add_argument("--compact", action="store_true", help="store float32 / int32 columns")
+    args = parser.parse_args()
+    for csv_path in args.csv_paths:
+        print(f"{csv_path} -> {convert_csv(csv_path, compact=args.compact)}")
@@ -0,0 +1,58 @@
+import itertools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Common grid-search runner for the optimizers. The search space is cut into
+# chunks and fanned out over a process pool; the price data is handed to each
+# worker once through the pool initializer rather than with every task.
+
+_shared = None
+_evaluate = None
+
+
+def build_search_space(*ranges, where=None):
+    # Cartesian product of the parameter ranges, optionally filtered
+    space = itertools.product(*ranges)
+    if where is not None:
+        space = (combo for combo in space if where(*combo))
+    return list(space)
+
+
+def _init_worker(evaluate, shared):
+    global _shared, _evaluate
+    _evaluate = evaluate
+    _shared = shared
+
+
+def _run_chunk(chunk):
+    return _evaluate(_shared, chunk)
+
+
+def chunked(items, chunk_size):
+    return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+
+def run_grid(evaluate, search_space, shared=None, workers=None, chunk_size=None):
+    # evaluate(shared, chunk) -> list of result rows, one per combination in the
+    # chunk. It must be a module-level function so workers can import it.
+    # Results are yielded in search-space order as soon as each chunk is done.
+    search_space = list(search_space)
+    if not search_space:
+        return
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, len(search_space))
+    if chunk_size is None:
+        # A few chunks per worker keeps every core busy when some chunks are slower
+        chunk_size = max(1, math.ceil(len(search_space) / (workers * 4)))
+    chunks = chunked(search_space, chunk_size)
+
+    if workers == 1:
+        for chunk in chunks:
+            yield from evaluate(shared, chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(evaluate, shared)) as pool:
+        for rows in pool.map(_run_chunk, chunks):
+            yield from rows
@@ -0,0 +1,218 @@
+import hashlib
+import math
+from collections import OrderedDict
+
+import numpy as np
+
+import indicators
+from profiling import phase
+
+# Shared indicator cache for the optimizers. Entries are keyed by
+# (indicator, params, dataset fingerprint) so a series is built once per
+# unique key no matter how many thresholds / trade sizes reuse it.
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def dataset_fingerprint(df):
+    # Hash of the index and every column, so two loads of the same file share entries
+    digest = hashlib.sha1()
+    digest.update(np.ascontiguousarray(df.index.values).view(np.uint8))
+    for col in df.columns:
+        digest.update(str(col).encode())
+        digest.update(np.ascontiguousarray(df[col].to_numpy()).view(np.uint8))
+    return digest.hexdigest()
+
+
+def _nbytes(value):
+    if isinstance(value, tuple):
+        return sum(_nbytes(v) for v in value)
+    return value.nbytes
+
+
+def _freeze(value):
+    # Cached arrays are shared between callers, so they must not be mutated in place
+    if isinstance(value, tuple):
+        return tuple(_freeze(v) for v in value)
+    value = np.asarray(value)
+    value.flags.writeable = False
+    return value
+
+
+class IndicatorCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, indicator, params, fingerprint, compute):
+        return self.get_many(indicator, [params], fingerprint, lambda missing: [compute()])[0]
+
+    def get_many(self, indicator, params_list, fingerprint, compute_missing):
+        # compute_missing(list of params) -> list of values; every miss in the
+        # batch is computed in one call, so kernels can build them in one pass
+        params_list = [tuple(params) for params in params_list]
+        keys = [(indicator, params, fingerprint) for params in params_list]
+        values = [None] * len(keys)
+        missing = []
+        for i, key in enumerate(keys):
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                values[i] = self._entries[key]
+            else:
+                missing.append(i)
+
+        if missing:
+            self.misses += len(missing)
+            with phase("indicators"):
+                computed = compute_missing([params_list[i] for i in missing])
+            for i, value in zip(missing, computed):
+                values[i] = self._store(keys[i], _freeze(value))
+        return values
+
+    def _store(self, key, value):
+        self._entries[key] = value
+        self.nbytes += _nbytes(value)
+
+        # Least recently used entries go first; the newest entry always stays
+        while self.nbytes > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self.nbytes -= _nbytes(evicted)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
+
+
+INDICATOR_CACHE = IndicatorCache()
+
+
+class CachedIndicators:
+    # Indicator lookups for one dataset, all going through the shared cache
+
+    def __init__(self, df, cache=None):
+        self.df = df
+        self.cache = INDICATOR_CACHE if cache is None else cache
+        self.fingerprint = dataset_fingerprint(df)
+
+    def _get(self, indicator, params, compute):
+        return self.cache.get(indicator, params, self.fingerprint, compute)
+
+    def _get_many(self, indicator, params_list, compute_missing):
+        return self.cache.get_many(indicator, params_list, self.fingerprint, compute_missing)
+
+    def ema(self, span):
+        return self.ema_many([span])[0]
+
+    def ema_many(self, spans):
+        return self._get_many("ema", [(span,) for span in spans],
+                              lambda missing: indicators.ema(self.df["Close"].to_numpy(),
+                                                             [span for span, in missing]))
+
+    def macd(self, fast, slow, signal):
+        return self.macd_many([(fast, slow, signal)])[0]
+
+    def macd_many(self, triples):
+        # (macd, signal_line) per (fast, slow, signal) triple
+        def compute(missing):
+            fast, slow, signal = (np.array(col) for col in zip(*missing))
+            macd, signal_line, _ = indicators.macd(self.df["Close"].to_numpy(), fast, slow, signal)
+            return list(zip(macd, signal_line))
+        return self._get_many("macd", [tuple(t) for t in triples], compute)
+
+    def rsi(self, period, adjust=True):
+        return self.rsi_many([period], adjust=adjust)[0]
+
+    def rsi_many(self, periods, adjust=True):
+        # Wilder RSI; adjust=True matches the optimizers, adjust=False the phase 1 script
+        return self._get_many("rsi", [(period, adjust) for period in periods],
+                              lambda missing: indicators.wilder_rsi(self.df["Close"].to_numpy(),
+                                                                    [period for period, _ in missing],
+                                                                    adjust=adjust))
+
+    def obv(self):
+        return self._get("obv", (), lambda: indicators.obv(self.df["Close"].to_numpy(),
+                                                           self.df["Volume"].to_numpy()))
+
+    def obv_ma(self, window):
+        return self.obv_ma_many([window])[0]
+
+    def obv_ma_many(self, windows):
+        return self._get_many("obv_ma", [(window,) for window in windows],
+                              lambda missing: indicators.sma(self.obv(), [window for window, in missing]))
+
+    def bt_sma(self, period):
+        # Same arithmetic as Backtrader's SMA (math.fsum over the window), so
+        # comparisons against cached lines give the same signals as bt.indicators
+        return self._get("bt_sma", (period,), lambda: _bt_average(self.df["Close"].tolist(), period))
+
+    def bt_bollinger(self, period, devfactor):
+        # (mid, top, bot) as built by bt.indicators.BollingerBands
+        def compute():
+            close = self.df["Close"].tolist()
+            mid = self.bt_sma(period)
+            top = np.full(len(close), np.nan)
+            bot = np.full(len(close), np.nan)
+            for i in range(period - 1, len(close)):
+                meansq = math.fsum(x ** 2 for x in close[i - period + 1:i + 1]) / period
+                ma = float(mid[i])
+                stddev = devfactor * pow(abs(meansq - ma ** 2), 0.5)
+                top[i] = ma + stddev
+                bot[i] = ma - stddev
+            return mid, top, bot
+        return self._get("bt_bollinger", (period, devfactor), compute)
+
+    def bt_ema(self, period):
+        return self._get("bt_ema", (period,),
+                         lambda: _bt_smoothing(self.df["Close"].tolist(), period, 2.0 / (1.0 + period)))
+
+    def bt_macd(self, fast, slow, signal):
+        # (macd, signal_line) as built by bt.indicators.MACD
+        def compute():
+            macd = self.bt_ema(fast) - self.bt_ema(slow)
+            return macd, _bt_smoothing(macd.tolist(), signal, 2.0 / (1.0 + signal))
+        return self._get("bt_macd", (fast, slow, signal), compute)
+
+    def bt_rsi(self, period):
+        # bt.indicators.RSI: smoothed (alpha = 1 / period) up and down moves
+        def compute():
+            close = self.df["Close"].tolist()
+            up = [np.nan] + [max(b - a, 0.0) for a, b in zip(close, close[1:])]
+            down = [np.nan] + [max(a - b, 0.0) for a, b in zip(close, close[1:])]
+            rs = _bt_smoothing(up, period, 1.0 / period) / _bt_smoothing(down, period, 1.0 / period)
+            return 100.0 - 100.0 / (1.0 + rs)
+        return self._get("bt_rsi", (period,), compute)
+
+    def bt_obv_ma(self, window):
+        # Backtrader SMA over the OBV line of bt_indicators.OBV
+        return self._get("bt_obv_ma", (window,), lambda: _bt_average(self.obv().tolist(), window))
+
+
+def _bt_average(values, period):
+    # Backtrader's SMA: math.fsum over each full window from the first
+    # non-NaN value (a line's warm-up is NaN)
+    out = np.full(len(values), np.nan)
+    start = next((i for i, value in enumerate(values) if not math.isnan(value)), len(values))
+    for i in range(start + period - 1, len(values)):
+        out[i] = math.fsum(values[i - period + 1:i + 1]) / period
+    return out
+
+
+def _bt_smoothing(values, period, alpha):
+    # Backtrader's ExponentialSmoothing (EMA, SMMA): seeded with the SMA of
+    # the first full window, then prev * (1 - alpha) + value * alpha
+    out = _bt_average(values, period)
+    seeded = np.flatnonzero(~np.isnan(out))
+    if len(seeded):
+        alpha1 = 1.0 - alpha
+        prev = out[seeded[0]]
+        for i in range(seeded[0] + 1, len(values)):
+            out[i] = prev = prev * alpha1 + values[i] * alpha
+    return out
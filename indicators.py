@@ -1,5 +1,9 @@
+import numpy as np
 import pandas as pd
 
+from jit import HAVE_NUMBA, njit
+from profiling import profiled
+
 # Path to your manually cleaned dataset
 DATA_PATH = "C:/Projects/nifty50_mean_reversion_backtest/dataset/nifty_data_clean.csv"
 
@@ -21,14 +25,269 @@ def load_and_prepare_data():
 
     return df
 
+# === Vectorized indicator kernels ===
+# Each kernel takes a price (or volume) array and one period or a vector of
+# periods. With a vector the result is a 2-D (periods x bars) array built in a
+# single pass over the bars; with a scalar it is a 1-D array.
+
+def _as_periods(periods):
+    periods = np.asarray(periods)
+    return np.atleast_1d(periods), periods.ndim == 0
+
+
+def _shape_result(result, scalar):
+    return result[0] if scalar else result
+
+
+@njit(cache=True)
+def _ewm_row(values, alpha, adjust, minp, out):
+    # pandas' ewm(...).mean() recursion (ignore_na=False) for one series,
+    # one scalar step per bar
+    weighted = values[0]
+    nobs = 1 if weighted == weighted else 0
+    old_wt = 1.
+    new_wt = 1. if adjust else alpha
+    out[0] = weighted if nobs >= minp else np.nan
+    for i in range(1, len(values)):
+        cur = values[i]
+        is_obs = cur == cur
+        if is_obs:
+            nobs += 1
+        if weighted == weighted:
+            old_wt *= 1. - alpha
+            if is_obs:
+                if weighted != cur:
+                    weighted = (old_wt * weighted + new_wt * cur) / (old_wt + new_wt)
+                old_wt = old_wt + new_wt if adjust else 1.
+        elif is_obs:
+            weighted = cur
+        out[i] = weighted if nobs >= minp else np.nan
+
+
+def _ewm(values, alpha, adjust=False, min_periods=0):
+    # Exponentially weighted mean with pandas' ewm(...).mean() recursion
+    # (ignore_na=False), one row per alpha. values is 1-D (shared by every row)
+    # or 2-D (one series per row).
+    alpha = np.asarray(alpha, dtype=float)
+    values = np.asarray(values, dtype=float)
+    shared = values.ndim == 1
+    n_bars = values.shape[-1]
+    minp = max(min_periods, 1)
+
+    out = np.empty((len(alpha), n_bars))
+    if n_bars == 0:
+        return out
+
+    if HAVE_NUMBA or len(alpha) == 1:
+        # Compiled, or a single series: a scalar loop per row beats stepping
+        # every row together with NumPy calls on tiny arrays
+        for row in range(len(alpha)):
+            series = values if shared else values[row]
+            if HAVE_NUMBA:
+                _ewm_row(series, float(alpha[row]), adjust, minp, out[row])
+            else:
+                row_out = [0.] * n_bars
+                _ewm_row(series.tolist(), float(alpha[row]), adjust, minp, row_out)
+                out[row] = row_out
+        return out
+
+    old_wt_factor = 1. - alpha
+    new_wt = np.ones_like(alpha) if adjust else alpha
+
+    first = values[0] if shared else values[:, 0]
+    weighted = np.broadcast_to(first, alpha.shape).astype(float)
+    nobs = (weighted == weighted).astype(np.int64)
+    old_wt = np.ones_like(alpha)
+    out[:, 0] = np.where(nobs >= minp, weighted, np.nan)
+
+    for i in range(1, n_bars):
+        cur = values[i] if shared else values[:, i]
+        is_obs = cur == cur
+        nobs += is_obs
+        started = weighted == weighted
+
+        old_wt = np.where(started, old_wt * old_wt_factor, old_wt)
+        blend = started & is_obs & (weighted != cur)
+        with np.errstate(invalid='ignore'):
+            blended = (old_wt * weighted + new_wt * cur) / (old_wt + new_wt)
+        weighted = np.where(blend, blended, weighted)
+        if adjust:
+            old_wt = np.where(started & is_obs, old_wt + new_wt, old_wt)
+        else:
+            old_wt = np.where(started & is_obs, 1., old_wt)
+        weighted = np.where(~started & is_obs, cur, weighted)
+
+        out[:, i] = np.where(nobs >= minp, weighted, np.nan)
+    return out
+
+
+def span_alpha(spans):
+    # Smoothing factor for ewm(span=...), derived exactly as pandas does
+    com = (np.asarray(spans, dtype=float) - 1) / 2
+    return 1. / (1. + com)
+
+
+def wilder_alpha(periods):
+    # Smoothing factor for ewm(alpha=1/period), derived exactly as pandas does
+    alpha = 1. / np.asarray(periods, dtype=float)
+    com = (1 - alpha) / alpha
+    return 1. / (1. + com)
+
+
+# Prefix sums are restarted every PREFIX_BLOCK bars (or a multiple of it for
+# windows longer than that), so their size is bounded by one block.
+PREFIX_BLOCK = 4096
+
+
+def _prefix_rolling(values, windows, ddof=1, with_std=True):
+    # Rolling mean (and std) for every window from one cumulative-sum pass.
+    # Within each block the sums are taken on values shifted by the block's
+    # first value, which keeps them small and avoids the catastrophic
+    # cancellation of the naive E[x^2] - E[x]^2 formula at index-level prices.
+    # A window that straddles two blocks re-bases the older block's part onto
+    # the newer block's reference.
+    windows, scalar = _as_periods(windows)
+    values = np.asarray(values, dtype=float)
+    n_bars = len(values)
+    mean = np.full((len(windows), n_bars), np.nan)
+    std = np.full((len(windows), n_bars), np.nan) if with_std else None
+    if n_bars == 0:
+        return mean, std, scalar
+
+    block = PREFIX_BLOCK * -(-int(windows.max()) // PREFIX_BLOCK)
+    n_blocks = -(-n_bars // block)
+    starts = np.arange(n_blocks) * block
+    refs = values[starts]
+
+    padded = np.zeros(n_blocks * block)
+    padded[:n_bars] = values
+    dev = padded.reshape(n_blocks, block) - refs[:, None]
+    # Exclusive prefix sums per block: sum1[b, k] = sum of the first k deviations
+    sum1 = np.zeros((n_blocks, block + 1))
+    np.cumsum(dev, axis=1, out=sum1[:, 1:])
+    if with_std:
+        sum2 = np.zeros((n_blocks, block + 1))
+        np.cumsum(dev * dev, axis=1, out=sum2[:, 1:])
+
+    for row, window in enumerate(windows):
+        if window > n_bars:
+            continue
+        end = np.arange(window, n_bars + 1)          # exclusive window ends
+        begin = end - window
+        blk = (end - 1) // block
+        head_end = end - starts[blk]
+        same = begin >= starts[blk]
+        prev = np.maximum(blk - 1, 0)
+        head_begin = np.where(same, begin - starts[blk], 0)
+        tail_begin = np.where(same, 0, begin - starts[prev])
+
+        count = np.where(same, 0, starts[blk] - begin)
+        shift = refs[prev] - refs[blk]
+        tail1 = np.where(same, 0., sum1[prev, block] - sum1[prev, tail_begin])
+        win1 = sum1[blk, head_end] - sum1[blk, head_begin] + (tail1 + count * shift)
+        ref = refs[blk]
+        mean[row, window - 1:] = (ref * window + win1) / window
+
+        if with_std and window > ddof:
+            tail2 = np.where(same, 0., sum2[prev, block] - sum2[prev, tail_begin])
+            win2 = sum2[blk, head_end] - sum2[blk, head_begin] + (tail2 + (2 * shift) * tail1 + count * (shift * shift))
+            var = (win2 - win1 * win1 / window) / (window - ddof)
+            std[row, window - 1:] = np.sqrt(np.maximum(var, 0.))
+    return mean, std, scalar
+
+
+@profiled("indicators")
+def rolling_mean_std(values, windows, ddof=1):
+    # (mean, std) as contiguous (windows x bars) arrays; std is the sample
+    # standard deviation by default, like pandas' rolling().std()
+    mean, std, scalar = _prefix_rolling(values, windows, ddof=ddof)
+    return _shape_result(mean, scalar), _shape_result(std, scalar)
+
+
+@profiled("indicators")
+def sma(values, periods):
+    mean, _, scalar = _prefix_rolling(values, periods, with_std=False)
+    return _shape_result(mean, scalar)
+
+
+def rolling_std(values, periods):
+    return rolling_mean_std(values, periods)[1]
+
+
+@profiled("indicators")
+def ema(values, spans, adjust=False):
+    spans, scalar = _as_periods(spans)
+    return _shape_result(_ewm(values, span_alpha(spans), adjust=adjust), scalar)
+
+
+def bollinger_bands(values, periods, devfactor=2.0):
+    # (mid, upper, lower) bands
+    mid, std = rolling_mean_std(values, periods)
+    width = devfactor * std
+    return mid, mid + width, mid - width
+
+
+@profiled("indicators")
+def wilder_rsi(values, periods, adjust=False):
+    # RSI with Wilder's smoothing (alpha = 1/period, first value after `period` bars)
+    periods, scalar = _as_periods(periods)
+    values = np.asarray(values, dtype=float)
+    delta = np.empty_like(values)
+    if len(values):
+        delta[0] = np.nan
+    delta[1:] = np.diff(values)
+    gain = np.where(delta > 0, delta, np.where(np.isnan(delta), np.nan, 0.))
+    loss = np.where(delta < 0, -delta, np.where(np.isnan(delta), np.nan, 0.))
+
+    alpha = wilder_alpha(periods)
+    out = np.empty((len(periods), len(values)))
+    for row, period in enumerate(periods):
+        # min_periods differs per row, so smooth one period at a time
+        avg_gain = _ewm(gain, alpha[row:row + 1], adjust=adjust, min_periods=int(period))[0]
+        avg_loss = _ewm(loss, alpha[row:row + 1], adjust=adjust, min_periods=int(period))[0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rs = avg_gain / avg_loss
+            out[row] = 100 - (100 / (1 + rs))
+    return _shape_result(out, scalar)
+
+
+@profiled("indicators")
+def macd(values, fast, slow, signal):
+    # (macd, signal, histogram) for aligned vectors of fast / slow / signal spans
+    fast, scalar = _as_periods(fast)
+    slow = np.broadcast_to(np.asarray(slow), fast.shape)
+    signal = np.broadcast_to(np.asarray(signal), fast.shape)
+
+    spans = np.unique(np.concatenate([fast, slow]))
+    emas = ema(values, spans)
+    row_of = {span: row for row, span in enumerate(spans)}
+    macd_line = (emas[[row_of[s] for s in fast]] - emas[[row_of[s] for s in slow]])
+    signal_line = _ewm(macd_line, span_alpha(signal))
+    histogram = macd_line - signal_line
+    return (_shape_result(macd_line, scalar), _shape_result(signal_line, scalar),
+            _shape_result(histogram, scalar))
+
+
+@profiled("indicators")
+def obv(close, volume):
+    # On-balance volume starting at 0. Accumulates in at least 64 bits, so
+    # compact (int32 / float32) volume columns can't overflow or lose precision
+    close = np.asarray(close, dtype=float)
+    volume = np.asarray(volume)
+    dtype = np.result_type(volume.dtype, np.int64)
+    out = np.zeros(len(close), dtype=dtype)
+    out[1:] = np.cumsum(np.sign(np.diff(close)).astype(dtype) * volume[1:])
+    return out
+
+
 def add_indicators(df):
-    # Calculate 20-day and 90-day Simple Moving Averages
-    df['SMA_Fast'] = df['Close'].rolling(window=20).mean()
-    df['SMA_Slow'] = df['Close'].rolling(window=90).mean()
+    close = df['Close'].to_numpy()
+
+    # Calculate 20-day and 90-day Simple Moving Averages in one call
+    df['SMA_Fast'], df['SMA_Slow'] = sma(close, [20, 90])
 
     # Calculate Bollinger Bands using 20-day SMA and std dev
-    df['SMA_20'] = df['Close'].rolling(window=20).mean()
-    df['STD_20'] = df['Close'].rolling(window=20).std()
+    df['SMA_20'], df['STD_20'] = rolling_mean_std(close, 20)
     df['Upper_Band'] = df['SMA_20'] + 2 * df['STD_20']
     df['Lower_Band'] = df['SMA_20'] - 2 * df['STD_20']
 
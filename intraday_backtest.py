@@ -0,0 +1,133 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from dataset_store import load_frame
+from live_runner import INITIAL_CASH, Bar, SimBroker, default_strategies
+from metrics import bars_per_year, calendar_years, cagr
+
+try:
+    import resource
+except ImportError:   # Windows
+    resource = None
+
+# Backtests the five streaming strategies on minute-bar (or any frequency)
+# data too large to handle as a pandas frame of Python objects. The file is
+# loaded from the compact memory-mapped store, bars are materialized one block
+# at a time, and every indicator is updated incrementally, so memory stays
+# flat in the number of bars. CAGR is annualized from the bar frequency.
+# Note that holding periods (Bollinger max_hold_days, MACD min_days) count
+# bars, so on minute data they are minutes.
+
+DATA_PATH = "dataset/nifty_minute_synthetic.csv"
+BLOCK_BARS = 65_536
+SESSION_START = pd.Timedelta(hours=9, minutes=15)    # NSE session: 09:15-15:30
+SESSION_BARS = 375
+
+
+def iter_blocks(df, block_bars=BLOCK_BARS):
+    # Bars as Bar tuples of Python scalars, converted one block at a time
+    columns = [df[col].to_numpy() for col in ("Open", "High", "Low", "Close", "Volume")]
+    for start in range(0, len(df), block_bars):
+        stop = min(start + block_bars, len(df))
+        dates = df.index[start:stop].to_pydatetime().tolist()
+        block = [values[start:stop].astype(np.float64 if values.dtype.kind == "f" else np.int64).tolist()
+                 for values in columns]
+        yield [Bar(date, *values, 0) for date, *values in zip(dates, *block)]
+
+
+def run_strategy(df, strategy):
+    # Same per-bar sequence as live_runner.run_live, for one strategy
+    broker = SimBroker()
+    broker.open_account(strategy, commission=getattr(strategy, "commission", 0.0))
+    for bars in iter_blocks(df):
+        for bar in bars:
+            broker.on_bar_open(bar)
+            order = strategy.on_bar(bar)
+            if order is not None:
+                broker.submit(order, bar)
+            broker.on_bar_close(bar)
+    return broker.accounts[strategy.name]
+
+
+def peak_rss_mb():
+    # getrusage on Unix; on Windows the peak working set from psutil when it
+    # is installed, None otherwise
+    if resource is not None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    memory = psutil.Process().memory_info()
+    return getattr(memory, "peak_wset", memory.rss) / 2**20
+
+
+def write_synthetic_minutes(csv_path, n_bars, seed=0):
+    # Seeded random walk over weekday sessions of SESSION_BARS minute bars,
+    # written a block of sessions at a time
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range("2015-01-01", periods=-(-n_bars // SESSION_BARS))
+    offsets = SESSION_START + pd.to_timedelta(np.arange(SESSION_BARS), unit="min")
+    last_close = 8000.
+    written = 0
+    sessions_per_block = max(1, BLOCK_BARS // SESSION_BARS)
+    for first in range(0, len(days), sessions_per_block):
+        block_days = days[first:first + sessions_per_block]
+        index = pd.DatetimeIndex((block_days.values[:, None] + offsets.values[None, :]).ravel(), name="Date")
+        index = index[:n_bars - written]
+        n = len(index)
+        close = last_close * np.exp(np.cumsum(rng.normal(0.000002, 0.0006, n)))
+        open_ = np.concatenate(([last_close], close[:-1]))
+        high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.0002, n)))
+        low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.0002, n)))
+        volume = rng.lognormal(np.log(2_000), 0.5, n).astype(np.int64)
+        frame = pd.DataFrame({"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume},
+                             index=index)
+        frame.to_csv(csv_path, mode="w" if written == 0 else "a", header=written == 0,
+                     float_format="%.2f", date_format="%Y-%m-%d %H:%M:%S")
+        last_close = close[-1]
+        written += n
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the five strategies on large intraday files")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--generate", type=int, metavar="BARS",
+                        help="write a synthetic minute-bar file of this many bars to --data first")
+    parser.add_argument("--full-precision", action="store_true",
+                        help="use the float64 store instead of the compact float32 one")
+    args = parser.parse_args()
+
+    if args.generate:
+        start = time.perf_counter()
+        write_synthetic_minutes(args.data, args.generate)
+        print(f"Wrote {args.generate:,} bars to {args.data} in {time.perf_counter() - start:.1f}s")
+    elif not os.path.exists(args.data):
+        parser.error(f"{args.data} not found; create a synthetic file with --generate 1000000")
+
+    start = time.perf_counter()
+    df = load_frame(args.data, compact=False if args.full_precision else None)
+    per_year = bars_per_year(df.index)
+    years = len(df) / per_year
+    print(f"Loaded {len(df):,} bars in {time.perf_counter() - start:.1f}s "
+          f"({per_year:,.0f} bars/year, {years:.2f} trading years, "
+          f"{calendar_years(df.index):.2f} calendar years)\n")
+
+    print(f"{'Strategy':<14}{'Final Value':>16}{'Trades':>8}{'CAGR':>10}{'Time (s)':>10}{'Peak RSS (MB)':>15}")
+    for strategy in default_strategies():
+        start = time.perf_counter()
+        account = run_strategy(df, strategy)
+        elapsed = time.perf_counter() - start
+        growth = cagr(INITIAL_CASH, account.value, years)
+        peak = peak_rss_mb()
+        peak = f"{peak:.1f}" if peak is not None else "-"
+        print(f"{strategy.name:<14}{account.value:>16,.2f}{len(account.trades):>8}{growth * 100:>9.2f}%"
+              f"{elapsed:>10.2f}{peak:>15}")
+
+
+if __name__ == "__main__":
+    main()
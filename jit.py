@@ -0,0 +1,13 @@
+# Optional Numba compilation. Functions decorated with njit run compiled when
+# Numba is installed and as plain Python otherwise, with the same results.
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
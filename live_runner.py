@@ -0,0 +1,416 @@
+import argparse
+import asyncio
+import sys
+import time
+from abc import ABC, abstractmethod
+from collections import namedtuple
+
+import numpy as np
+
+from dataset_store import load_frame
+from native_backtest import STRATEGIES, PercentCommission, run_backtest
+from streaming_indicators import (StreamingBtBollinger, StreamingBtMACD, StreamingBtRSI,
+                                  StreamingBtSMA, StreamingCrossOver, StreamingOBV)
+
+# Live/paper runner for the five strategies. Bars come from a pluggable async
+# source (a replay of a local file, or a socket carrying the same CSV rows),
+# indicators are updated incrementally per bar, and orders go to a simulated
+# broker with native_backtest's (Backtrader's) fills and accounting: market
+# orders at the next bar's open once the cash covers them at the signal
+# bar's close, close orders at the current bar's close.
+#
+#   python live_runner.py --check    # compare each strategy with native_backtest
+
+DATA_PATH = "dataset/nifty_data_clean.csv"
+INITIAL_CASH = 1_000_000
+
+Bar = namedtuple("Bar", "date open high low close volume received_ns")
+Order = namedtuple("Order", "strategy side size exectype created_close")
+
+
+# ==== Bar sources ====
+class ReplaySource:
+    # Replays a dataset file bar by bar; delay > 0 paces it like a live feed
+    def __init__(self, csv_path=DATA_PATH, delay=0.0):
+        self.csv_path = csv_path
+        self.delay = delay
+
+    async def __aiter__(self):
+        df = load_frame(self.csv_path)
+        columns = [df.index.strftime("%Y-%m-%d").tolist()] + \
+                  [df[col].tolist() for col in ("Open", "High", "Low", "Close", "Volume")]
+        for date, open_, high, low, close, volume in zip(*columns):
+            yield Bar(date, open_, high, low, close, volume, time.perf_counter_ns())
+            await asyncio.sleep(self.delay)
+
+
+class SocketSource:
+    # Reads "Date,Open,High,Low,Close,Volume" lines from a TCP stream
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+
+    async def __aiter__(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            while line := await reader.readline():
+                received_ns = time.perf_counter_ns()
+                date, open_, high, low, close, volume = line.decode().strip().split(",")
+                if date == "Date":
+                    continue
+                yield Bar(date, float(open_), float(high), float(low), float(close),
+                          int(float(volume)), received_ns)
+        finally:
+            writer.close()
+            await writer.wait_closed()
+
+
+async def serve_replay(csv_path=DATA_PATH, host="127.0.0.1", port=0, delay=0.0):
+    # Stand-in for a market data socket: streams the CSV rows to each client
+    with open(csv_path, "rb") as f:
+        lines = f.readlines()
+
+    async def handle(reader, writer):
+        for line in lines:
+            writer.write(line)
+            await writer.drain()
+            if delay:
+                await asyncio.sleep(delay)
+        writer.close()
+        await writer.wait_closed()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+# ==== Simulated broker ====
+class Account:
+    def __init__(self, cash, commission):
+        self.cash = cash
+        self.commission = PercentCommission(commission)
+        self.position = 0
+        self.price = 0.0
+        self.value = cash
+        self.trades = []
+
+
+class SimBroker:
+    def __init__(self):
+        self.accounts = {}
+        self.pending = []
+
+    def open_account(self, strategy, cash=INITIAL_CASH, commission=0.0):
+        self.accounts[strategy.name] = Account(cash, commission)
+
+    def submit(self, order, bar):
+        if order.exectype == "close":
+            self._fill(order, bar, bar.close)
+        else:
+            self.pending.append(order)
+
+    def on_bar_open(self, bar):
+        # Market orders from the previous bar fill at this bar's open
+        pending, self.pending = self.pending, []
+        for order in pending:
+            self._fill(order, bar, bar.open)
+
+    def on_bar_close(self, bar):
+        for account in self.accounts.values():
+            account.value = account.cash + account.position * bar.close
+
+    def _fill(self, order, bar, price):
+        # Same steps (and float rounding) as native_backtest.Broker._execute
+        account = self.accounts[order.strategy.name]
+        comm = account.commission(order.size, price)
+        if order.side == "BUY":
+            check = order.created_close
+            if account.cash - order.size * check - account.commission(order.size, check) < 0.0:
+                order.strategy.notify_order(order, "Rejected", price)
+                return
+            account.cash -= order.size * price
+            account.cash -= comm
+            if account.position:
+                account.price = ((account.price * account.position + price * order.size)
+                                 / (account.position + order.size))
+            else:
+                account.price = price
+            account.position += order.size
+        else:
+            account.cash += order.size * account.price + order.size * (price - account.price)
+            account.cash -= comm
+            account.position -= order.size
+            if not account.position:
+                account.price = 0.0
+        account.trades.append({
+            'Date': bar.date,
+            'Action': order.side,
+            'Price': price,
+            'Size': order.size,
+            'Commission': comm,
+            'Cash': account.cash,
+        })
+        order.strategy.notify_order(order, "Completed", price)
+
+
+# ==== Streaming strategies ====
+class StreamingStrategy(ABC):
+    # The phase 2 strategies on Backtrader-identical streaming indicators,
+    # driven one bar at a time; replayed over the same bars they trade exactly
+    # like native_backtest (see check_native). on_bar returns an Order or None;
+    # at most one order is pending at a time.
+    name = None
+    # Whether a rejected order frees the strategy for a new one. The phase 2
+    # MA and Bollinger strategies clear their order on any notification; the
+    # MACD, RSI and OBV ones only on a fill, so a rejection blocks them for good
+    clear_rejected = True
+
+    def __init__(self):
+        self.order = None
+        self.position = 0
+        self.bars = 0
+
+    def on_bar(self, bar):
+        self.bars += 1
+        signal = self.next(bar)
+        if signal is None or self.order is not None:
+            return None
+        self.order = Order(self, *signal, bar.close)
+        return self.order
+
+    def notify_order(self, order, status, price):
+        if status == "Completed":
+            self.position += order.size if order.side == "BUY" else -order.size
+            self.order = None
+        elif self.clear_rejected:
+            self.order = None
+
+    @abstractmethod
+    def next(self, bar):
+        # (side, size) to place an order on this bar, None to do nothing
+        pass
+
+
+class MACDStrategy(StreamingStrategy):
+    name = "MACD"
+    clear_rejected = False
+
+    def __init__(self, fast=16, slow=70, signal=6, trade_size=21, min_days=2):
+        super().__init__()
+        self.macd = StreamingBtMACD(fast, slow, signal)
+        self.trade_size = trade_size
+        self.min_days = min_days
+        self.last_trade = -min_days
+        self.prev = (np.nan, np.nan)
+
+    def next(self, bar):
+        prev_macd, prev_signal = self.prev
+        macd, signal = self.macd.update(bar.close)
+        self.prev = (macd, signal)
+
+        if self.order or self.bars - self.last_trade < self.min_days:
+            return None
+        if not self.position:
+            if macd > signal and prev_macd < prev_signal:
+                self.last_trade = self.bars
+                return "BUY", self.trade_size, "close"
+        elif macd < signal and prev_macd > prev_signal:
+            self.last_trade = self.bars
+            return "SELL", self.trade_size, "close"
+        return None
+
+
+class RSIStrategy(StreamingStrategy):
+    name = "RSI"
+    clear_rejected = False
+
+    def __init__(self, rsi_period=21, buy_threshold=40, sell_threshold=80, trade_size=21):
+        super().__init__()
+        self.rsi = StreamingBtRSI(rsi_period)
+        self.buy_threshold = buy_threshold
+        self.sell_threshold = sell_threshold
+        self.trade_size = trade_size
+
+    def next(self, bar):
+        rsi = self.rsi.update(bar.close)
+        if not self.position:
+            if rsi < self.buy_threshold:
+                return "BUY", self.trade_size, "market"
+        elif rsi > self.sell_threshold:
+            return "SELL", self.trade_size, "market"
+        return None
+
+
+class OBVStrategy(StreamingStrategy):
+    name = "OBV"
+    clear_rejected = False
+
+    def __init__(self, ma_window=5, trade_size=21):
+        super().__init__()
+        self.obv = StreamingOBV()
+        self.obv_ma = StreamingBtSMA(ma_window)
+        self.trade_size = trade_size
+        self.prev = (np.nan, np.nan)
+
+    def next(self, bar):
+        prev_obv, prev_ma = self.prev
+        obv = self.obv.update(bar.close, bar.volume)
+        obv_ma = self.obv_ma.update(obv)
+        self.prev = (obv, obv_ma)
+
+        if not self.position:
+            if prev_obv < prev_ma and obv > obv_ma:
+                return "BUY", self.trade_size, "market"
+        elif prev_obv > prev_ma and obv < obv_ma:
+            return "SELL", self.trade_size, "market"
+        return None
+
+
+class BollingerBandStrategy(StreamingStrategy):
+    name = "Bollinger"
+    commission = 0.001
+
+    def __init__(self, sma_period=20, devfactor=2.0, profit_target=0.03, max_hold_days=15,
+                 position_size=40):
+        super().__init__()
+        self.boll = StreamingBtBollinger(sma_period, devfactor)
+        self.profit_target = profit_target
+        self.max_hold_days = max_hold_days
+        self.position_size = position_size
+        self.entry_price = None
+        self.entry_bar = None
+
+    def next(self, bar):
+        mid, _, lower = self.boll.update(bar.close)
+        if self.order:
+            return None
+
+        if not self.position:
+            if bar.close < lower:
+                self.entry_price = bar.close
+                self.entry_bar = self.bars
+                return "BUY", self.position_size, "market"
+        else:
+            holding_days = self.bars - self.entry_bar
+            gain_pct = (bar.close - self.entry_price) / self.entry_price
+            if (bar.close > mid or
+                    gain_pct >= self.profit_target or
+                    holding_days >= self.max_hold_days):
+                return "SELL", self.position_size, "market"
+        return None
+
+
+class MACrossoverStrategy(StreamingStrategy):
+    name = "MA Crossover"
+    commission = 0.001
+
+    def __init__(self, fast_period=20, slow_period=90, position_size=35):
+        super().__init__()
+        self.fast_ma = StreamingBtSMA(fast_period)
+        self.slow_ma = StreamingBtSMA(slow_period)
+        self.crossover = StreamingCrossOver()
+        self.position_size = position_size
+
+    def next(self, bar):
+        cross = self.crossover.update(self.fast_ma.update(bar.close), self.slow_ma.update(bar.close))
+        if not self.position and cross > 0:
+            return "BUY", self.position_size, "market"
+        if self.position and cross < 0:
+            return "SELL", self.position_size, "market"
+        return None
+
+
+def default_strategies():
+    return [MACDStrategy(), RSIStrategy(), OBVStrategy(), BollingerBandStrategy(), MACrossoverStrategy()]
+
+
+# Keys of native_backtest.STRATEGIES
+LIVE_STRATEGIES = {"ma": MACrossoverStrategy, "bb": BollingerBandStrategy, "macd": MACDStrategy,
+                   "rsi": RSIStrategy, "obv": OBVStrategy}
+
+
+# ==== Runner ====
+async def run_live(source, strategies, broker=None):
+    # Latency is measured per bar, from the moment the source has the bar to
+    # the moment every strategy has made its decision and submitted its order
+    broker = SimBroker() if broker is None else broker
+    for strategy in strategies:
+        broker.open_account(strategy, commission=getattr(strategy, "commission", 0.0))
+
+    latencies = []
+    async for bar in source:
+        broker.on_bar_open(bar)
+        for strategy in strategies:
+            order = strategy.on_bar(bar)
+            if order is not None:
+                broker.submit(order, bar)
+        latencies.append(time.perf_counter_ns() - bar.received_ns)
+        broker.on_bar_close(bar)
+    return broker, np.array(latencies)
+
+
+def report(broker, latencies, elapsed):
+    print(f"{'Strategy':<14}{'Final Value':>16}{'Trades':>8}")
+    for name, account in broker.accounts.items():
+        print(f"{name:<14}{account.value:>16,.2f}{len(account.trades):>8}")
+
+    if len(latencies) == 0:
+        print("No bars received")
+        return
+    p50, p99 = np.percentile(latencies, [50, 99]) / 1000
+    print(f"\nBars: {len(latencies)}  ({len(latencies) / elapsed:,.0f} bars/sec)")
+    print(f"Bar-to-decision latency: p50 {p50:.1f} us, p99 {p99:.1f} us, "
+          f"max {latencies.max() / 1000:.1f} us")
+
+
+def check_native():
+    # Replays each strategy's native_backtest dataset through the live runner
+    # and compares the final value and every fill with run_backtest. MA and
+    # Bollinger use nifty_data_with_indicators.csv, which starts later than
+    # the default replay file, so a default run ends on different values.
+    all_equal = True
+    print(f"{'Strategy':<10}{'Live':>16}{'Native':>16}  Fills")
+    for key, strategy in LIVE_STRATEGIES.items():
+        native_strategy, data_path, rate = STRATEGIES[key]
+        native = run_backtest(native_strategy, load_frame(data_path), commission=PercentCommission(rate))
+        broker, _ = asyncio.run(run_live(ReplaySource(data_path), [strategy()]))
+        account = broker.accounts[strategy.name]
+        fills = [(t['Date'], t['Action'], t['Price'], t['Commission']) for t in account.trades]
+        native_fills = [(str(t['Date']), t['Action'], t['Price'], t['Commission']) for t in native['trades']]
+        equal = account.value == native['final_value'] and fills == native_fills
+        all_equal &= equal
+        print(f"{key:<10}{account.value:>16,.2f}{native['final_value']:>16,.2f}  "
+              f"{len(fills)} {'identical' if equal else 'DIFFERENT'}")
+    return all_equal
+
+
+async def main(args):
+    server = None
+    if args.source == "replay":
+        source = ReplaySource(args.data, delay=args.delay)
+    elif args.connect:
+        host, port = args.connect.rsplit(":", 1)
+        source = SocketSource(host, int(port))
+    else:
+        server = await serve_replay(args.data, delay=args.delay)
+        host, port = server.sockets[0].getsockname()[:2]
+        source = SocketSource(host, port)
+
+    start = time.perf_counter()
+    broker, latencies = await run_live(source, default_strategies())
+    elapsed = time.perf_counter() - start
+    if server is not None:
+        server.close()
+        await server.wait_closed()
+    report(broker, latencies, elapsed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run all five strategies on a live bar stream")
+    parser.add_argument("--source", choices=["replay", "socket"], default="replay")
+    parser.add_argument("--data", default=DATA_PATH, help="file to replay (or to serve in socket mode)")
+    parser.add_argument("--connect", help="HOST:PORT of a bar stream; socket mode serves --data locally if omitted")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds between bars")
+    parser.add_argument("--check", action="store_true", help="compare every strategy with native_backtest")
+    args = parser.parse_args()
+    if args.check:
+        sys.exit(0 if check_native() else 1)
+    asyncio.run(main(args))
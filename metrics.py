@@ -0,0 +1,257 @@
+import numpy as np
+
+from jit import HAVE_NUMBA, njit
+from profiling import profiled
+
+# Performance metrics shared by the scripts and optimizers.
+#
+# Annualization works for any bar frequency: calendar time comes from the
+# timestamps themselves (fractional days, so intraday spans are exact) and
+# bars per year are inferred from the bar spacing, instead of assuming 252
+# daily bars.
+
+TRADING_DAYS_PER_YEAR = 252
+DAYS_PER_YEAR = 365.25
+NS_PER_DAY = 86_400 * 10**9
+
+
+def _stamps(index):
+    # Nanoseconds since the epoch, whatever resolution the index is stored in
+    return np.asarray(index, dtype="datetime64[ns]").view(np.int64)
+
+
+def calendar_years(index):
+    # Same as (index[-1] - index[0]).days / 365.25 for daily bars, without
+    # truncating to whole days
+    stamps = _stamps(index)
+    if len(stamps) < 2:
+        return 0.
+    return (stamps[-1] - stamps[0]) / NS_PER_DAY / DAYS_PER_YEAR
+
+
+def bars_per_year(index):
+    # Monthly, weekly and daily bars map to 12 / 52 / 252 (365 if the data
+    # trades on weekends). Intraday bars are bars per session times sessions
+    # per year, with the session length taken from the data.
+    stamps = _stamps(index)
+    if len(stamps) < 2:
+        return float(TRADING_DAYS_PER_YEAR)
+    spacing = np.median(np.diff(stamps)) / NS_PER_DAY
+    if spacing >= 28:
+        return 12
+    if spacing >= 7:
+        return 52
+
+    days, bars_per_day = np.unique(stamps // NS_PER_DAY, return_counts=True)
+    weekday = (days + 3) % 7            # 1970-01-01 was a Thursday; Monday is 0
+    sessions = DAYS_PER_YEAR if np.mean(weekday >= 5) > 0.05 else TRADING_DAYS_PER_YEAR
+    if spacing >= 0.5:
+        return sessions
+    return sessions * float(np.median(bars_per_day))
+
+
+def trading_years(index):
+    # Length of the data in trading years: bars / bars per year
+    return len(index) / bars_per_year(index)
+
+
+@profiled("metrics")
+def cagr(start_value, end_value, years):
+    if years <= 0:
+        return np.nan
+    return (end_value / start_value) ** (1 / years) - 1
+
+
+# ==== Equity metrics ====
+# Every function below works on the last axis, so it takes one equity curve
+# or a (params x bars) matrix and returns a scalar or one value per row. Rows
+# containing NaN (pruned combinations) give NaN.
+
+def bar_returns(equity):
+    equity = np.asarray(equity, dtype=float)
+    return equity[..., 1:] / equity[..., :-1] - 1
+
+
+def drawdowns(equity):
+    # Fraction below the running peak, 0 at new highs and negative below them
+    equity = np.asarray(equity, dtype=float)
+    return equity / np.maximum.accumulate(equity, axis=-1) - 1
+
+
+@profiled("metrics")
+def max_drawdown(equity):
+    # Deepest drawdown as a negative fraction, like drawdown.min() in the scripts
+    return drawdowns(equity).min(axis=-1)
+
+
+def max_drawdown_bars(equity):
+    # Longest stretch, in bars, spent below a previous peak
+    equity = np.asarray(equity, dtype=float)
+    return _drawdown_bars(equity, np.maximum.accumulate(equity, axis=-1))
+
+
+def _drawdown_bars(equity, peak):
+    bars = np.arange(equity.shape[-1], dtype=np.int32)
+    last_peak = np.maximum.accumulate(np.where(equity >= peak, bars, 0), axis=-1)
+    duration = (bars - last_peak).max(axis=-1)
+    return np.where(np.isnan(equity).any(axis=-1), np.nan, duration)
+
+
+@profiled("metrics")
+def sharpe(equity, periods_per_year=TRADING_DAYS_PER_YEAR):
+    # Annualized mean over standard deviation of bar returns, risk-free rate 0
+    return _sharpe(bar_returns(equity), periods_per_year)
+
+
+@profiled("metrics")
+def sortino(equity, periods_per_year=TRADING_DAYS_PER_YEAR):
+    # As sharpe, but only losing bars count toward the deviation
+    return _sortino(bar_returns(equity), periods_per_year)
+
+
+def _row_dot(a):
+    # Sum of squares along the last axis in one pass
+    return np.einsum("...i,...i->...", a, a)
+
+
+def _annualized(mean, deviation, periods_per_year):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = mean / deviation
+    return np.where(np.isfinite(ratio), ratio * np.sqrt(periods_per_year), np.nan)
+
+
+def _sharpe(returns, periods_per_year):
+    n = returns.shape[-1]
+    mean = returns.mean(axis=-1)
+    deviation = np.sqrt(_row_dot(returns - mean[..., None]) / (n - 1)) if n > 1 else np.nan
+    return _annualized(mean, deviation, periods_per_year)
+
+
+def _sortino(returns, periods_per_year):
+    deviation = np.sqrt(_row_dot(np.minimum(returns, 0)) / returns.shape[-1])
+    return _annualized(returns.mean(axis=-1), deviation, periods_per_year)
+
+
+def exposure(held):
+    # Share of bars with a position open; held is a boolean (or position)
+    # array per bar
+    return np.mean(np.asarray(held) != 0, axis=-1)
+
+
+@njit(cache=True)
+def _equity_rows(equity, out):
+    # Per row: max drawdown, longest drawdown in bars, mean bar return, its
+    # standard deviation and the downside deviation, in two passes
+    n_rows, n_bars = equity.shape
+    for row in range(n_rows):
+        values = equity[row]
+        peak = values[0]
+        last_peak = 0
+        worst = 0.
+        longest = 0
+        total = 0.
+        has_nan = False
+        for t in range(n_bars):
+            value = values[t]
+            if np.isnan(value):
+                has_nan = True
+                break
+            if value >= peak:
+                peak = value
+                last_peak = t
+            else:
+                worst = min(worst, value / peak - 1)
+                longest = max(longest, t - last_peak)
+            if t:
+                total += value / values[t - 1] - 1
+        if has_nan or n_bars < 2:
+            out[row, :] = np.nan
+            out[row, 0] = np.nan if has_nan else worst
+            out[row, 1] = np.nan if has_nan else longest
+            continue
+        n = n_bars - 1
+        mean = total / n
+        squares = 0.
+        downside = 0.
+        for t in range(1, n_bars):
+            ret = values[t] / values[t - 1] - 1
+            squares += (ret - mean) ** 2
+            if ret < 0:
+                downside += ret * ret
+        out[row, 0] = worst
+        out[row, 1] = longest
+        out[row, 2] = mean
+        out[row, 3] = np.sqrt(squares / (n - 1)) if n > 1 else np.nan
+        out[row, 4] = np.sqrt(downside / n)
+
+
+@profiled("metrics")
+def equity_metrics(equity, index, start_value=None, held_bars=None):
+    # Every equity metric for one curve or a (params x bars) matrix over the
+    # bars of index. start_value defaults to the first bar's equity;
+    # held_bars, bars with a position open per row, adds exposure.
+    equity = np.asarray(equity, dtype=float)
+    start_value = equity[..., 0] if start_value is None else start_value
+    periods = bars_per_year(index)
+    metrics = {"cagr": cagr(start_value, equity[..., -1], calendar_years(index))}
+    if HAVE_NUMBA:
+        # One compiled pass per row instead of a NumPy pass per metric
+        rows = np.empty((int(np.prod(equity.shape[:-1])), 5))
+        _equity_rows(np.ascontiguousarray(equity.reshape(-1, equity.shape[-1])), rows)
+        rows = rows.reshape(equity.shape[:-1] + (5,))
+        metrics.update({
+            "max_drawdown": rows[..., 0],
+            "max_drawdown_bars": rows[..., 1],
+            "sharpe": _annualized(rows[..., 2], rows[..., 3], periods),
+            "sortino": _annualized(rows[..., 2], rows[..., 4], periods),
+        })
+    else:
+        # Running peak and returns shared between the metrics
+        peak = np.maximum.accumulate(equity, axis=-1)
+        returns = bar_returns(equity)
+        metrics.update({
+            "max_drawdown": (equity / peak).min(axis=-1) - 1,
+            "max_drawdown_bars": _drawdown_bars(equity, peak),
+            "sharpe": _sharpe(returns, periods),
+            "sortino": _sortino(returns, periods),
+        })
+    if held_bars is not None:
+        metrics["exposure"] = np.where(np.isnan(equity).any(axis=-1), np.nan,
+                                       np.asarray(held_bars) / equity.shape[-1])
+    return metrics
+
+
+# ==== Trade metrics ====
+@profiled("metrics")
+def round_trips(actions, prices):
+    # (entry, exit) prices of each closed trade in a BUY / SELL log. A SELL
+    # closes the position opened by the latest BUY, and SELLs with nothing
+    # open are skipped, as in the scripts' win-rate loops.
+    actions = np.asarray(actions)
+    prices = np.asarray(prices, dtype=float)
+    rows = np.arange(len(actions))
+    is_buy = actions == "BUY"
+    is_sell = actions == "SELL"
+    last_buy = np.maximum.accumulate(np.where(is_buy, rows, -1))
+    # Latest SELL strictly before each row
+    last_sell = np.empty(len(actions), dtype=np.int64)
+    last_sell[:1] = -1
+    last_sell[1:] = np.maximum.accumulate(np.where(is_sell, rows, -1))[:-1]
+    closes = is_sell & (last_buy > last_sell)
+    return prices[last_buy[closes]], prices[closes]
+
+
+@profiled("metrics")
+def trade_stats(pnl):
+    # Win rate (in %) and profit factor of per-trade P&L; a trade that
+    # breaks even counts as a loss, as in the scripts
+    pnl = np.asarray(pnl, dtype=float)
+    wins = int(np.count_nonzero(pnl > 0))
+    gross_loss = -pnl[pnl <= 0].sum()
+    return {
+        "trades": len(pnl),
+        "wins": wins,
+        "losses": len(pnl) - wins,
+        "win_rate": wins / len(pnl) * 100 if len(pnl) else 0.0,
+        "profit_factor": pnl[pnl > 0].sum() / gross_loss if gross_loss > 0 else np.nan,
+    }
@@ -0,0 +1,471 @@
+import argparse
+import os
+import sys
+import time
+from abc import ABC, abstractmethod
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from dataset_store import load_frame
+from indicator_cache import CachedIndicators
+from profiling import loop
+from trade_ledger import ledger_equity
+
+# Minimal single-asset backtest core for the fixed-size strategies, a light
+# stand-in for Cerebro. Bars are one list per column, orders and the position
+# are __slots__ objects, and indicators are the Backtrader-identical series
+# from CachedIndicators (bt_sma, bt_macd, bt_rsi, ...). Fills follow
+# Backtrader's broker so a run reproduces its result:
+#   - market orders fill at the next bar's open, once the cash covers them at
+#     the price they were created at (plus commission)
+#   - close orders fill at the signal bar's close (phase 1 / cheat-on-close)
+#   - the strategy hears about an order before next() on the bar after it
+#     fills, and next() starts once its indicators are warm
+# Positions are long only: sells close (part of) the open position.
+#
+#   python native_backtest.py    # time the strategies here and in Cerebro
+
+MARKET = "market"
+CLOSE = "close"
+
+BUY = "BUY"
+SELL = "SELL"
+
+COMPLETED = "Completed"
+MARGIN = "Margin"   # not enough cash, as Backtrader's Order.Margin
+
+
+class PercentCommission:
+    # Backtrader's setcommission(commission=rate) for stocks
+    __slots__ = ("rate",)
+
+    def __init__(self, rate=0.001):
+        self.rate = rate
+
+    def __call__(self, size, price):
+        return abs(size) * self.rate * price
+
+
+class MinimumCommission:
+    # Phase 1 brokerage: max(₹20, 0.1%) of the traded value
+    __slots__ = ("minimum", "rate")
+
+    def __init__(self, minimum=20, rate=0.001):
+        self.minimum = minimum
+        self.rate = rate
+
+    def __call__(self, size, price):
+        return max(self.minimum, self.rate * (price * abs(size)))
+
+
+class Bars:
+    # Lists index faster than NumPy arrays one scalar at a time
+    __slots__ = ("index", "open", "high", "low", "close", "volume")
+
+    def __init__(self, df):
+        self.index = df.index
+        self.open = df["Open"].tolist()
+        self.high = df["High"].tolist()
+        self.low = df["Low"].tolist()
+        self.close = df["Close"].tolist()
+        self.volume = df["Volume"].tolist()
+
+    def __len__(self):
+        return len(self.close)
+
+
+class Order:
+    __slots__ = ("side", "size", "exectype", "created", "status", "price", "value", "commission")
+
+    def __init__(self, side, size, exectype, created):
+        self.side = side
+        self.size = size
+        self.exectype = exectype
+        self.created = created
+        self.status = None
+        self.price = None
+        self.value = None
+        self.commission = None
+
+    def isbuy(self):
+        return self.side == BUY
+
+
+class Position:
+    __slots__ = ("size", "price")
+
+    def __init__(self):
+        self.size = 0
+        self.price = 0.0
+
+    def __bool__(self):
+        return self.size != 0
+
+
+class Broker:
+    __slots__ = ("bars", "cash", "commission", "position", "pending", "notifications", "trades")
+
+    def __init__(self, bars, cash, commission):
+        self.bars = bars
+        self.cash = cash
+        self.commission = commission
+        self.position = Position()
+        self.pending = []
+        self.notifications = []
+        self.trades = []
+
+    def value(self, bar):
+        return self.cash + self.position.size * self.bars.close[bar]
+
+    def submit(self, order):
+        if order.exectype == CLOSE:
+            price = self.bars.close[order.created]
+            self._execute(order, order.created, price, price)
+        else:
+            self.pending.append(order)
+        return order
+
+    def next(self, bar):
+        # Market orders from the previous bar fill at this bar's open
+        pending, self.pending = self.pending, []
+        for order in pending:
+            self._execute(order, bar, self.bars.open[bar], self.bars.close[order.created])
+
+    def _execute(self, order, bar, price, check_price):
+        position = self.position
+        if order.side == BUY:
+            if self.cash - order.size * check_price - self.commission(order.size, check_price) < 0.0:
+                order.status = MARGIN
+                self.notifications.append(order)
+                return
+            order.value = order.size * price
+            order.commission = self.commission(order.size, price)
+            self.cash -= order.value
+            self.cash -= order.commission
+            if position.size:
+                position.price = (position.price * position.size + price * order.size) / (position.size + order.size)
+            else:
+                position.price = price
+            position.size += order.size
+        else:
+            # Cash gets back the cost basis plus the PnL, as Backtrader books it
+            order.value = order.size * position.price
+            order.commission = self.commission(order.size, price)
+            self.cash += order.value + order.size * (price - position.price)
+            self.cash -= order.commission
+            position.size -= order.size
+            if not position.size:
+                position.price = 0.0
+
+        order.status = COMPLETED
+        order.price = price
+        self.notifications.append(order)
+        # Same columns as the phase 2 trade logs
+        self.trades.append({
+            'Date': self.bars.index[bar].date(),
+            'Action': order.side,
+            'Price': price,
+            'Cost': order.value,
+            'Commission': order.commission,
+            'Portfolio Value': self.value(bar),
+        })
+
+
+class Strategy(ABC):
+    # Subclasses set params, build their indicator lists in init() (calling
+    # warmup() with them) and trade in next(bar)
+    params = {}
+
+    def __init__(self, bars, broker, indicators, **params):
+        unknown = set(params) - set(self.params)
+        if unknown:
+            raise TypeError(f"{type(self).__name__} got unexpected parameters: {sorted(unknown)}")
+        self.p = SimpleNamespace(**{**self.params, **params})
+        self.bars = bars
+        self.broker = broker
+        self.indicators = indicators
+        self.position = broker.position
+        self.order = None
+        self.bar = 0
+        self.minperiod = 1
+        self.init()
+
+    def init(self):
+        pass
+
+    def warmup(self, *lines):
+        # next() starts on the first bar where every line has a value
+        for line in lines:
+            valid = np.flatnonzero(~np.isnan(line))
+            self.minperiod = max(self.minperiod, valid[0] + 1 if len(valid) else len(line) + 1)
+
+    def buy(self, size, exectype=MARKET):
+        return self.broker.submit(Order(BUY, size, exectype, self.bar))
+
+    def sell(self, size, exectype=MARKET):
+        return self.broker.submit(Order(SELL, size, exectype, self.bar))
+
+    def notify_order(self, order):
+        pass
+
+    @abstractmethod
+    def next(self, bar):
+        # Called once per bar from minperiod on; trades through buy() / sell()
+        pass
+
+
+def crossover(fast, slow):
+    # bt.indicators.CrossOver: +1 when fast closes above slow, -1 below,
+    # measured against the last non-zero difference so touching bars don't
+    # count as a cross. NaN while either line warms up.
+    diff = np.asarray(fast, dtype=float) - np.asarray(slow, dtype=float)
+    out = np.full(len(diff), np.nan)
+    valid = np.flatnonzero(~np.isnan(diff))
+    if len(valid) < 2:
+        return out
+    start = valid[0]
+    bars = np.arange(len(diff))
+    marked = np.where((bars > start) & (diff != 0), bars, start)
+    before = diff[np.maximum.accumulate(marked)][start:-1]
+    after = diff[start + 1:]
+    out[start + 1:] = ((before < 0) & (after > 0)).astype(float) - ((before > 0) & (after < 0))
+    return out
+
+
+def run_backtest(strategy, df, cash=1_000_000, commission=None, indicators=None, **params):
+    # {'final_value', 'trades', 'equity'}; equity is the value at every bar's close
+    bars = Bars(df)
+    broker = Broker(bars, cash, commission or PercentCommission(0.0))
+    strat = strategy(bars, broker, indicators or CachedIndicators(df), **params)
+    close = bars.close
+    position = broker.position
+    equity = np.empty(len(bars))
+
+    for bar in loop("bar_loop", range(len(bars)), bars=len(bars)):
+        if broker.pending:
+            broker.next(bar)
+        if broker.notifications:
+            notifications, broker.notifications = broker.notifications, []
+            for order in notifications:
+                strat.notify_order(order)
+        if bar + 1 >= strat.minperiod:
+            strat.bar = bar
+            strat.next(bar)
+        equity[bar] = broker.cash + position.size * close[bar]
+
+    return {'final_value': float(equity[-1]), 'trades': broker.trades, 'equity': equity}
+
+
+# ==== Strategies (the phase 2 Backtrader strategies) ====
+class MACrossoverStrategy(Strategy):
+    params = dict(fast_period=20, slow_period=90, position_size=35)
+
+    def init(self):
+        cross = crossover(self.indicators.bt_sma(self.p.fast_period), self.indicators.bt_sma(self.p.slow_period))
+        self.warmup(cross)
+        self.crossover = cross.tolist()
+
+    def notify_order(self, order):
+        self.order = None
+
+    def next(self, bar):
+        if self.order:
+            return
+        if not self.position and self.crossover[bar] > 0:
+            self.order = self.buy(self.p.position_size)
+        elif self.position and self.crossover[bar] < 0:
+            self.order = self.sell(self.p.position_size)
+
+
+class BollingerBandStrategy(Strategy):
+    params = dict(sma_period=20, devfactor=2.0, profit_target=0.03, max_hold_days=15, position_size=40)
+
+    def init(self):
+        mid, _, bot = self.indicators.bt_bollinger(self.p.sma_period, self.p.devfactor)
+        self.warmup(mid, bot)
+        self.sma = mid.tolist()
+        self.boll_bot = bot.tolist()
+        self.close = self.bars.close
+        self.entry_price = None
+        self.entry_bar = None
+
+    def notify_order(self, order):
+        self.order = None
+
+    def next(self, bar):
+        if self.order:
+            return
+
+        close = self.close[bar]
+        if not self.position:
+            if close < self.boll_bot[bar]:
+                self.order = self.buy(self.p.position_size)
+                self.entry_price = close
+                self.entry_bar = bar
+        else:
+            holding_days = bar - self.entry_bar
+            gain_pct = (close - self.entry_price) / self.entry_price
+            if (close > self.sma[bar] or
+                    gain_pct >= self.p.profit_target or
+                    holding_days >= self.p.max_hold_days):
+                self.order = self.sell(self.p.position_size)
+
+
+class MACDStrategy(Strategy):
+    params = dict(fast=16, slow=70, signal=6, trade_size=21, min_days=2)
+
+    def init(self):
+        macd, signal = self.indicators.bt_macd(self.p.fast, self.p.slow, self.p.signal)
+        self.warmup(macd, signal)
+        self.macd = macd.tolist()
+        self.signal = signal.tolist()
+        self.last_trade = -self.p.min_days
+
+    def notify_order(self, order):
+        if order.status == COMPLETED:
+            self.order = None
+
+    def next(self, bar):
+        if self.order or bar - self.last_trade < self.p.min_days:
+            return
+        macd, signal = self.macd, self.signal
+        if not self.position:
+            if macd[bar] > signal[bar] and macd[bar - 1] < signal[bar - 1]:
+                self.order = self.buy(self.p.trade_size, CLOSE)
+                self.last_trade = bar
+        elif macd[bar] < signal[bar] and macd[bar - 1] > signal[bar - 1]:
+            self.order = self.sell(self.p.trade_size, CLOSE)
+            self.last_trade = bar
+
+
+class RSIStrategy(Strategy):
+    params = dict(rsi_period=21, buy_threshold=40, sell_threshold=80, trade_size=21)
+
+    def init(self):
+        rsi = self.indicators.bt_rsi(self.p.rsi_period)
+        self.warmup(rsi)
+        self.rsi = rsi.tolist()
+
+    def notify_order(self, order):
+        if order.status == COMPLETED:
+            self.order = None
+
+    def next(self, bar):
+        if self.order:
+            return
+        if not self.position:
+            if self.rsi[bar] < self.p.buy_threshold:
+                self.order = self.buy(self.p.trade_size)
+        elif self.rsi[bar] > self.p.sell_threshold:
+            self.order = self.sell(self.p.trade_size)
+
+
+class OBVStrategy(Strategy):
+    params = dict(ma_window=5, trade_size=21)
+
+    def init(self):
+        obv_ma = self.indicators.bt_obv_ma(self.p.ma_window)
+        self.warmup(obv_ma)
+        self.obv = self.indicators.obv().tolist()
+        self.obv_ma = obv_ma.tolist()
+
+    def notify_order(self, order):
+        if order.status == COMPLETED:
+            self.order = None
+
+    def next(self, bar):
+        if self.order:
+            return
+        obv, obv_ma = self.obv, self.obv_ma
+        if not self.position:
+            if obv[bar - 1] < obv_ma[bar - 1] and obv[bar] > obv_ma[bar]:
+                self.order = self.buy(self.p.trade_size)
+        elif obv[bar - 1] > obv_ma[bar - 1] and obv[bar] < obv_ma[bar]:
+            self.order = self.sell(self.p.trade_size)
+
+
+STRATEGIES = {
+    # name -> (native strategy, dataset, commission rate the phase 2 script uses)
+    "ma": (MACrossoverStrategy, "dataset/nifty_data_with_indicators.csv", 0.001),
+    "bb": (BollingerBandStrategy, "dataset/nifty_data_with_indicators.csv", 0.001),
+    "macd": (MACDStrategy, "dataset/nifty_data_clean.csv", 0.0),
+    "rsi": (RSIStrategy, "dataset/nifty_data_clean.csv", 0.0),
+    "obv": (OBVStrategy, "dataset/nifty_data_clean.csv", 0.0),
+}
+
+
+def best_time(run, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = run()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def cerebro_run(strategy, df, commission):
+    import backtrader as bt
+
+    class Fills(bt.Analyzer):
+        # (date, side, price) of every completed order, as the native trades record them
+        def start(self):
+            self.fills = []
+
+        def notify_order(self, order):
+            if order.status == order.Completed:
+                self.fills.append((bt.num2date(order.executed.dt).date(), BUY if order.isbuy() else SELL,
+                                   order.executed.price))
+
+        def get_analysis(self):
+            return self.fills
+
+    cerebro = bt.Cerebro(stdstats=False)
+    cerebro.adddata(bt.feeds.PandasData(dataname=df))
+    cerebro.addstrategy(strategy)
+    cerebro.addanalyzer(Fills, _name='fills')
+    cerebro.broker.setcash(1_000_000)
+    cerebro.broker.setcommission(commission=commission)
+    strat = cerebro.run()[0]
+    return {'final_value': cerebro.broker.getvalue(), 'fills': strat.analyzers.fills.get_analysis(),
+            'strategy': strat}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the strategies on the native core and compare with Cerebro")
+    parser.add_argument("--strategy", choices=list(STRATEGIES), nargs="+", default=list(STRATEGIES))
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    # Every ported strategy is checked against its phase 2 original
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "phase_2_Backtrader_implementation"))
+    from bollinger_band_bt_final import BollingerBandStrategy as BollingerBandBT
+    from ma_crossover_bt import MACrossoverStrategy as MACrossoverBT
+    from macd_bt_final_optimizer_aligned import MACDStrategy as MACDBT
+    from obv_bt_fixed_equity import OBVStrategy as OBVBT
+    from rsi_bt import RSIStrategy as RSIBT
+    backtrader_strategies = {"ma": MACrossoverBT, "bb": BollingerBandBT, "macd": MACDBT, "rsi": RSIBT, "obv": OBVBT}
+
+    print(f"{'Strategy':<10}{'Native (s)':>12}{'Final Value':>16}{'Cerebro (s)':>13}{'Final Value':>16}{'Speedup':>9}  Fills")
+    for name in args.strategy:
+        strategy, data_path, rate = STRATEGIES[name]
+        df = load_frame(data_path)
+        indicators = CachedIndicators(df)
+        native_time, native = best_time(lambda: run_backtest(strategy, df, commission=PercentCommission(rate),
+                                                             indicators=indicators), args.repeats)
+        bt_time, reference = best_time(lambda: cerebro_run(backtrader_strategies[name], df, rate), args.repeats)
+        if name == "macd":
+            # Backtrader fills the script's close orders a bar late; what it reports
+            # is its trade log replayed at the signal bar's close, as the port fills
+            log = pd.DataFrame(reference['strategy'].trade_log)
+            reference['fills'] = list(zip(pd.to_datetime(log['date']).dt.date, log['action'], log['price']))
+            reference['final_value'] = ledger_equity(df.index, df['Close'], log['date'], log['action'],
+                                                     log['price'], log['size'], 1_000_000)[-1]
+        same = [(t['Date'], t['Action'], t['Price']) for t in native['trades']] == reference['fills']
+        print(f"{name:<10}{native_time:>12.4f}{native['final_value']:>16,.2f}"
+              f"{bt_time:>13.4f}{reference['final_value']:>16,.2f}{bt_time / native_time:>8.0f}x"
+              f"  {'identical' if same else 'DIFFERENT'}")
+
+if __name__ == "__main__":
+    main()
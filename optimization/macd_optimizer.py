@@ -1,12 +1,17 @@
+import argparse
+import json
+import os
+import sys
 import pandas as pd
 import numpy as np
-from itertools import product
-from datetime import timedelta
-from tqdm import tqdm
 
-# Load dataset
-df = pd.read_csv("dataset/nifty_data_clean.csv", parse_dates=["Date"])
-df.set_index("Date", inplace=True)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from batch_engine import run_macd_batch
+from dataset_store import load_frame
+from grid_search import build_search_space
+from metrics import equity_metrics
+from pruning import REASONS, add_pruning_args, pruning_from_args, pruning_stats, storable
+from result_store import STORE_PATH, ResultStore, add_store_args, data_signature, run_resumable
 
 # Define optimization ranges
 fast_ema_range = range(8, 19,2)
@@ -16,70 +21,70 @@ min_days_range = range(2, 11,2)
 trade_size_range = range(1, 51, 10)
 
 initial_cash = 1_000_000
+DATA_PATH = "dataset/nifty_data_clean.csv"
 
-best_config = {}
-best_cagr = -np.inf
 
-results = []
+def evaluate_chunk(shared, chunk):
+    # Workers map the columnar store instead of receiving a parsed frame
+    data_path, pruning = shared
+    return evaluate_frame(load_frame(data_path), chunk, pruning)
 
-# Optimization loop
-search_space = list(product(fast_ema_range, slow_ema_range, signal_ema_range, min_days_range, trade_size_range))
-for fast, slow, signal, min_days, trade_size in tqdm(search_space, desc="Optimizing MACD"):
 
-    if slow <= fast:
-        continue
+def evaluate_frame(df, chunk, pruning=None):
+    # Every combination in the chunk is simulated in one batched pass
+    params = np.array(chunk)
+    pruned = np.zeros((len(params), 2), dtype=np.int64) if pruning else None
+    held_bars = np.zeros(len(params), dtype=np.int64)
+    final_values, equity = run_macd_batch(df, params, initial_cash=initial_cash, keep_equity=True,
+                                          pruning=pruning, pruned=pruned, held_bars=held_bars)
+    # Every metric for the whole chunk at once, from its equity matrix
+    metrics = equity_metrics(equity, df.index, initial_cash, held_bars)
 
-    data = df.copy()
-    data['EMA_fast'] = data['Close'].ewm(span=fast, adjust=False).mean()
-    data['EMA_slow'] = data['Close'].ewm(span=slow, adjust=False).mean()
-    data['MACD'] = data['EMA_fast'] - data['EMA_slow']
-    data['Signal'] = data['MACD'].ewm(span=signal, adjust=False).mean()
-
-    data['Buy_Signal'] = (data['MACD'] > data['Signal']) & (data['MACD'].shift(1) <= data['Signal'].shift(1))
-    data['Sell_Signal'] = (data['MACD'] < data['Signal']) & (data['MACD'].shift(1) >= data['Signal'].shift(1))
-
-    cash = initial_cash
-    shares = 0
-    last_trade_date = data.index[0] - timedelta(days=min_days)
-    portfolio_values = []
-
-    for date, row in data.iterrows():
-        price = row['Close']
-
-        if row['Buy_Signal'] and (date - last_trade_date).days >= min_days:
-            cost = trade_size * price
-            if cash >= cost:
-                shares += trade_size
-                cash -= cost
-                last_trade_date = date
-
-        elif row['Sell_Signal'] and (date - last_trade_date).days >= min_days:
-            if shares >= trade_size:
-                cash += trade_size * price
-                shares -= trade_size
-                last_trade_date = date
-
-        portfolio_value = cash + shares * price
-        portfolio_values.append(portfolio_value)
-
-    if len(portfolio_values) == 0:
-        continue
-
-    final_value = portfolio_values[-1]
-    duration_years = (data.index[-1] - data.index[0]).days / 365.25
-    cagr = ((final_value / initial_cash) ** (1 / duration_years)) - 1
-
-    results.append({
+    results = [{
         'fast_ema': fast,
         'slow_ema': slow,
         'signal_ema': signal,
         'min_days_between_trades': min_days,
         'trade_size': trade_size,
         'final_value': final_value,
-        'cagr': cagr
-    })
-
-# Save all results to CSV
-results_df = pd.DataFrame(results)
-results_df.to_csv("optimization/optimization_results_macd.csv", index=False)
-print("All optimization results saved to optimization/optimization_results_macd.csv")
+        'cagr': cagr,
+        'max_drawdown': max_dd,
+        'max_drawdown_bars': dd_bars,
+        'sharpe': sharpe,
+        'sortino': sortino,
+        'exposure': exposure,
+    } for (fast, slow, signal, min_days, trade_size), final_value, cagr, max_dd, dd_bars, sharpe, sortino, exposure
+        in zip(chunk, final_values, metrics['cagr'], metrics['max_drawdown'], metrics['max_drawdown_bars'],
+               metrics['sharpe'], metrics['sortino'], metrics['exposure'])]
+    if pruning:
+        for row, (reason, bars) in zip(results, pruned.tolist()):
+            row.update(PRUNED=REASONS[reason], BARS_SIMULATED=bars)
+    return results
+
+
+def main(pruning=None, store_path=STORE_PATH, fresh=False):
+    search_space = build_search_space(fast_ema_range, slow_ema_range, signal_ema_range,
+                                      min_days_range, trade_size_range,
+                                      where=lambda fast, slow, *_: slow > fast)
+    context = {"data": data_signature(DATA_PATH), "initial_cash": initial_cash,
+               "pruning": pruning and pruning.settings()}
+    with ResultStore("macd", context, store_path, fresh) as store:
+        # The batched engine is fastest on large chunks, and the whole grid
+        # only takes seconds
+        results = run_resumable(store, evaluate_chunk, search_space, shared=(DATA_PATH, pruning),
+                                chunks_per_worker=4, persist=storable)
+
+    # Save all results to CSV
+    results_df = pd.DataFrame(results)
+    results_df.to_csv("optimization/optimization_results_macd.csv", index=False)
+    print("All optimization results saved to optimization/optimization_results_macd.csv")
+    if pruning:
+        print(json.dumps(pruning_stats(results, len(load_frame(DATA_PATH)))))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    add_pruning_args(parser)
+    add_store_args(parser)
+    args = parser.parse_args()
+    main(pruning_from_args(args), args.store, args.fresh)
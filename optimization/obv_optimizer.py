@@ -1,78 +1,155 @@
 
+import argparse
+import json
+import math
 import pandas as pd
 import numpy as np
-import itertools
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dataset_store import load_frame
+from grid_search import build_search_space
+from indicator_cache import CachedIndicators
+from metrics import equity_metrics
+from pruning import add_pruning_args, pruning_from_args, pruning_stats, remaining_moves, storable
+from result_store import STORE_PATH, ResultStore, add_store_args, data_signature, run_resumable
 
 # Configuration
 INITIAL_CASH = 1_000_000
 TRADE_SIZE = 21
 DATA_PATH = "dataset/nifty_data_clean.csv"
 RESULTS_PATH = "optimization/optimization_results_obv.csv"
-os.makedirs("results", exist_ok=True)
-
-# Load and prepare data
-df = pd.read_csv(DATA_PATH, parse_dates=["Date"])
-df.set_index("Date", inplace=True)
 
 # Optimization ranges
 ma_windows = range(5, 31, 5)  # OBV MA from 5 to 30
 
-# Run optimization
-results = []
-
-for ma_window in ma_windows:
-    data = df.copy()
-
-    # Calculate OBV
-    obv = [0]
-    for i in range(1, len(data)):
-        if data["Close"].iloc[i] > data["Close"].iloc[i - 1]:
-            obv.append(obv[-1] + data["Volume"].iloc[i])
-        elif data["Close"].iloc[i] < data["Close"].iloc[i - 1]:
-            obv.append(obv[-1] - data["Volume"].iloc[i])
-        else:
-            obv.append(obv[-1])
-    data["OBV"] = obv
-    data["OBV_MA"] = data["OBV"].rolling(window=ma_window).mean()
-
-    # Strategy
-    cash = INITIAL_CASH
-    position = 0
-    portfolio_values = []
-
-    for i in range(1, len(data)):
-        price = data["Close"].iloc[i]
-        if np.isnan(data["OBV_MA"].iloc[i]):
+
+def evaluate_chunk(shared, chunk):
+    # Workers map the columnar store instead of receiving a parsed frame
+    data_path, pruning = shared
+    return evaluate_frame(load_frame(data_path), chunk, pruning)
+
+
+def remaining_crosses(obv, obv_ma):
+    # crosses[i]: OBV / MA crossings after bar i, each of which can move the
+    # position by TRADE_SIZE
+    with np.errstate(invalid="ignore"):
+        above = obv > obv_ma
+        below = obv < obv_ma
+    cross = np.zeros(len(obv), dtype=np.int64)
+    cross[1:] = (below[:-1] & above[1:]) | (above[:-1] & below[1:])
+    crosses = np.zeros(len(obv), dtype=np.int64)
+    crosses[:-1] = np.cumsum(cross[::-1])[::-1][1:]
+    return crosses
+
+
+def evaluate_frame(df, chunk, pruning=None):
+    indicators = CachedIndicators(df)
+    indicators.obv_ma_many([ma_window for ma_window, in chunk])
+    runs = []
+    # Equity per combination (NaN when pruned), for the metrics. Trading
+    # starts on the second bar, so the first holds the initial cash.
+    equity = np.full((len(chunk), len(df)), np.nan)
+    held_bars = np.zeros(len(chunk), dtype=np.int64)
+
+    for combo, (ma_window,) in enumerate(chunk):
+        data = df.copy()
+
+        # OBV is built once; only its moving average depends on the window
+        data["OBV"] = indicators.obv()
+        data["OBV_MA"] = indicators.obv_ma(ma_window)
+
+        # Strategy
+        cash = INITIAL_CASH
+        position = 0
+        portfolio_values = []
+        peak = INITIAL_CASH
+        pruned = ""
+        if pruning:
+            # The position can go short and stack, so the most the rest of the
+            # run can add is every absolute move times the largest position
+            # the remaining crossings allow
+            moves = remaining_moves(data["Close"].to_numpy())
+            crosses = remaining_crosses(data["OBV"].to_numpy(), data["OBV_MA"].to_numpy())
+
+        for i in range(1, len(data)):
+            price = data["Close"].iloc[i]
+            if np.isnan(data["OBV_MA"].iloc[i]):
+                pass  # MA still warming up
+
+            # Buy
+            elif data["OBV"].iloc[i - 1] < data["OBV_MA"].iloc[i - 1] and data["OBV"].iloc[i] > data["OBV_MA"].iloc[i]:
+                cost = TRADE_SIZE * price
+                if cash >= cost:
+                    cash -= cost
+                    position += TRADE_SIZE
+
+            # Sell
+            elif data["OBV"].iloc[i - 1] > data["OBV_MA"].iloc[i - 1] and data["OBV"].iloc[i] < data["OBV_MA"].iloc[i]:
+                proceeds = TRADE_SIZE * price
+                cash += proceeds
+                position -= TRADE_SIZE
+
             portfolio_values.append(cash + position * price)
-            continue
-
-        # Buy
-        if data["OBV"].iloc[i - 1] < data["OBV_MA"].iloc[i - 1] and data["OBV"].iloc[i] > data["OBV_MA"].iloc[i]:
-            cost = TRADE_SIZE * price
-            if cash >= cost:
-                cash -= cost
-                position += TRADE_SIZE
-
-        # Sell
-        elif data["OBV"].iloc[i - 1] > data["OBV_MA"].iloc[i - 1] and data["OBV"].iloc[i] < data["OBV_MA"].iloc[i]:
-            proceeds = TRADE_SIZE * price
-            cash += proceeds
-            position -= TRADE_SIZE
-
-        portfolio_values.append(cash + position * price)
-
-    # Calculate final metrics
-    end_value = portfolio_values[-1]
-    n_years = (data.index[-1] - data.index[0]).days / 365.25
-    cagr = ((end_value / INITIAL_CASH) ** (1 / n_years)) - 1
-
-    results.append({
-        "OBV_MA_WINDOW": ma_window,
-        "FINAL_VALUE": round(end_value, 2),
-        "CAGR": round(cagr * 100, 2)
-    })
-
-# Save results
-pd.DataFrame(results).to_csv(RESULTS_PATH, index=False)
-print(f"Optimization complete. Results saved to {RESULTS_PATH}")
+            held_bars[combo] += position != 0
+
+            if pruning:
+                peak = max(peak, portfolio_values[-1])
+                upside = (abs(position) + TRADE_SIZE * crosses[i]) * moves[i]
+                pruned = pruning.check(portfolio_values[-1], peak, upside)
+                if pruned:
+                    break
+
+        # Calculate final metrics
+        end_value = math.nan if pruned else portfolio_values[-1]
+        if not pruned:
+            equity[combo, 0] = INITIAL_CASH
+            equity[combo, 1:] = portfolio_values
+        runs.append((end_value, pruned, len(portfolio_values)))
+        if pruning:
+            pruning.completed([end_value])
+
+    # CAGR, drawdown, Sharpe, Sortino and exposure for the whole chunk at once
+    metrics = equity_metrics(equity, df.index, INITIAL_CASH, held_bars)
+    results = []
+    for combo, ((ma_window,), (end_value, pruned, bars)) in enumerate(zip(chunk, runs)):
+        results.append({
+            "OBV_MA_WINDOW": ma_window,
+            "FINAL_VALUE": round(end_value, 2),
+            "CAGR": round(metrics["cagr"][combo] * 100, 2),
+            "MAX_DRAWDOWN": round(metrics["max_drawdown"][combo] * 100, 2),
+            "MAX_DRAWDOWN_BARS": metrics["max_drawdown_bars"][combo],
+            "SHARPE": round(metrics["sharpe"][combo], 2),
+            "SORTINO": round(metrics["sortino"][combo], 2),
+            "EXPOSURE": round(metrics["exposure"][combo] * 100, 2),
+        })
+        if pruning:
+            results[-1].update(PRUNED=pruned, BARS_SIMULATED=bars)
+    return results
+
+
+def main(pruning=None, store_path=STORE_PATH, fresh=False):
+    os.makedirs("results", exist_ok=True)
+
+    # Run optimization
+    search_space = build_search_space(ma_windows)
+    context = {"data": data_signature(DATA_PATH), "initial_cash": INITIAL_CASH, "trade_size": TRADE_SIZE,
+               "pruning": pruning and pruning.settings()}
+    with ResultStore("obv", context, store_path, fresh) as store:
+        results = run_resumable(store, evaluate_chunk, search_space, shared=(DATA_PATH, pruning),
+                                persist=storable)
+
+    # Save results
+    pd.DataFrame(results).to_csv(RESULTS_PATH, index=False)
+    print(f"Optimization complete. Results saved to {RESULTS_PATH}")
+    if pruning:
+        print(json.dumps(pruning_stats(results, len(load_frame(DATA_PATH)) - 1)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    add_pruning_args(parser)
+    add_store_args(parser)
+    args = parser.parse_args()
+    main(pruning_from_args(args), args.store, args.fresh)
@@ -1,7 +1,27 @@
+import argparse
 import backtrader as bt
 import pandas as pd
 import itertools
 import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bollinger_kernel import FILL_NEXT_OPEN, run_bollinger
+from bt_feeds import FastPandasData
+from bt_indicators import FinalValue, PrecomputedLine
+from dataset_store import load_frame
+from grid_search import build_search_space
+from indicator_cache import CachedIndicators
+from metrics import cagr, calendar_years
+from native_backtest import BollingerBandStrategy, PercentCommission, run_backtest
+from result_store import STORE_PATH, ResultStore, add_store_args, data_signature, run_resumable
+
+SMA_PERIODS = [15, 20, 25]
+DEVFACTORS = [1.5, 2.0, 2.5]
+PROFIT_TARGETS = [0.02, 0.03, 0.04]
+HOLD_DAYS = [10, 15, 20]
+DATA_PATH = 'dataset/nifty_data_with_indicators.csv'
 
 class BollingerBandOpt(bt.Strategy):
     params = (
@@ -10,11 +30,14 @@ class BollingerBandOpt(bt.Strategy):
         ('profit_target', 0.03),
         ('max_hold_days', 10),
         ('position_size', 35),
+        ('indicators', None),
     )
 
     def __init__(self):
-        self.sma = bt.indicators.SimpleMovingAverage(self.data.close, period=self.p.sma_period)
-        self.boll = bt.indicators.BollingerBands(self.data.close, period=self.p.sma_period, devfactor=self.p.devfactor)
+        # SMA and bands come from the shared cache, built once per (period, devfactor)
+        mid, _, bot = self.p.indicators.bt_bollinger(self.p.sma_period, self.p.devfactor)
+        self.sma = PrecomputedLine(self.data, values=mid, period=self.p.sma_period)
+        self.boll_bot = PrecomputedLine(self.data, values=bot, period=self.p.sma_period)
         self.order = None
         self.entry_price = None
         self.entry_bar = None
@@ -24,7 +47,7 @@ class BollingerBandOpt(bt.Strategy):
             return
 
         if not self.position:
-            if self.data.close[0] < self.boll.lines.bot[0]:
+            if self.data.close[0] < self.boll_bot[0]:
                 self.order = self.buy(size=self.p.position_size)
                 self.entry_price = self.data.close[0]
                 self.entry_bar = len(self)
@@ -39,27 +62,52 @@ class BollingerBandOpt(bt.Strategy):
             ):
                 self.order = self.sell(size=self.p.position_size)
 
-def run_bb_optimization():
+class NativeBollingerOpt(BollingerBandStrategy):
+    # BollingerBandOpt on the native core. Like it, the pending order is never
+    # cleared, so only the first entry is taken
+    def notify_order(self, order):
+        pass
+
+def load_data():
+    return load_frame(DATA_PATH)
+
+def result_row(sma, dev, pt, hold, start_value, end_value, df):
+    pnl = end_value - start_value
+    growth = cagr(start_value, end_value, calendar_years(df.index))
+    return {
+        'sma_period': sma,
+        'devfactor': dev,
+        'profit_target': pt,
+        'max_hold_days': hold,
+        'Net PnL': round(pnl, 2),
+        'Final Value': round(end_value, 2),
+        'CAGR': f"{growth * 100:.2f}%"
+    }
+
+def evaluate_chunk(shared, chunk):
+    # Workers map the columnar store instead of receiving a parsed frame
+    return evaluate_frame(load_frame(shared), chunk)
+
+def evaluate_frame(df, chunk):
+    # Default engine: one Cerebro per combination. With the feed preloaded
+    # from NumPy this is as fast as optstrategy, and it resumes and spreads
+    # over workers per combination
+    indicators = CachedIndicators(df)
     results = []
-    sma_periods = [15, 20, 25]
-    devfactors = [1.5, 2.0, 2.5]
-    profit_targets = [0.02, 0.03, 0.04]
-    hold_days = [10, 15, 20]
 
-    for sma, dev, pt, hold in itertools.product(sma_periods, devfactors, profit_targets, hold_days):
+    for sma, dev, pt, hold in chunk:
+        data = FastPandasData(dataname=df)
+
         cerebro = bt.Cerebro()
         cerebro.addstrategy(
             BollingerBandOpt,
             sma_period=sma,
             devfactor=dev,
             profit_target=pt,
-            max_hold_days=hold
+            max_hold_days=hold,
+            indicators=indicators
         )
 
-        df = pd.read_csv('dataset/nifty_data_with_indicators.csv', parse_dates=['Date'])
-        df.set_index('Date', inplace=True)
-        data = bt.feeds.PandasData(dataname=df)
-
         cerebro.adddata(data)
         cerebro.broker.setcash(1000000)
         cerebro.broker.setcommission(commission=0.001)
@@ -67,21 +115,125 @@ def run_bb_optimization():
         start_value = cerebro.broker.getvalue()
         cerebro.run()
         end_value = cerebro.broker.getvalue()
+        results.append(result_row(sma, dev, pt, hold, start_value, end_value, df))
+
+    return results
+
+def run_optstrategy(df, maxcpus=None):
+    # Single load, single Cerebro: the feed is preloaded once and every
+    # combination runs as an optstrategy variant over it. Saves nothing over
+    # evaluate_frame now that FastPandasData preloads in milliseconds, and
+    # shipping every variant to Backtrader's pool costs extra
+    indicators = CachedIndicators(df)
+    for sma, dev in itertools.product(SMA_PERIODS, DEVFACTORS):
+        # Warm the cache before Cerebro ships the strategy kwargs to its workers
+        indicators.bt_bollinger(sma, dev)
+
+    cerebro = bt.Cerebro(maxcpus=maxcpus, preload=True, optdatas=True, optreturn=True)
+    cerebro.optstrategy(
+        BollingerBandOpt,
+        sma_period=SMA_PERIODS,
+        devfactor=DEVFACTORS,
+        profit_target=PROFIT_TARGETS,
+        max_hold_days=HOLD_DAYS,
+        indicators=indicators
+    )
+    cerebro.adddata(FastPandasData(dataname=df))
+    cerebro.broker.setcash(1000000)
+    cerebro.broker.setcommission(commission=0.001)
+    cerebro.addanalyzer(FinalValue, _name='final_value')
+
+    start_value = cerebro.broker.getvalue()
+    results = []
+    for run in cerebro.run():
+        strat = run[0]
+        end_value = strat.analyzers.final_value.get_analysis()
+        results.append(result_row(strat.params.sma_period, strat.params.devfactor,
+                                  strat.params.profit_target, strat.params.max_hold_days,
+                                  start_value, end_value, df))
+    return results
 
-        pnl = end_value - start_value
-        days_held = (df.index[-1] - df.index[0]).days
-        years = days_held / 365.25
-        cagr = (end_value / start_value) ** (1 / years) - 1
-
-        results.append({
-            'sma_period': sma,
-            'devfactor': dev,
-            'profit_target': pt,
-            'max_hold_days': hold,
-            'Net PnL': round(pnl, 2),
-            'Final Value': round(end_value, 2),
-            'CAGR': f"{cagr * 100:.2f}%"
-        })
+def run_kernel(df):
+    # Whole grid through the compiled Bollinger kernel, no Cerebro
+    return evaluate_kernel(df, build_search_space(SMA_PERIODS, DEVFACTORS, PROFIT_TARGETS, HOLD_DAYS))
+
+def evaluate_kernel(df, chunk):
+    # Same cached bands and Backtrader's fill model (market orders at the next
+    # bar's open, holding time in bars), and like BollingerBandOpt the first
+    # order stays pending for good, so the rows match the Cerebro engines
+    indicators = CachedIndicators(df)
+    open_ = df['Open'].to_numpy()
+    close = df['Close'].to_numpy()
+
+    results = []
+    for sma, dev, pt, hold in chunk:
+        mid, _, bot = indicators.bt_bollinger(sma, dev)
+        _, equity = run_bollinger(close, bot, mid, open_=open_, initial_capital=1000000,
+                                  position_size=35, profit_target=pt, max_hold_days=hold,
+                                  commission=0.001, fill_mode=FILL_NEXT_OPEN, keep_pending=True)
+        results.append(result_row(sma, dev, pt, hold, 1000000, equity[-1], df))
+    return results
+
+def evaluate_native(df, chunk):
+    # Same strategy and fills as the Cerebro paths, on the native backtest core
+    indicators = CachedIndicators(df)
+    results = []
+    for sma, dev, pt, hold in chunk:
+        result = run_backtest(NativeBollingerOpt, df, cash=1000000, commission=PercentCommission(0.001),
+                              indicators=indicators, sma_period=sma, devfactor=dev, profit_target=pt,
+                              max_hold_days=hold, position_size=35)
+        results.append(result_row(sma, dev, pt, hold, 1000000, result['final_value'], df))
+    return results
+
+def benchmark(df):
+    search_space = build_search_space(SMA_PERIODS, DEVFACTORS, PROFIT_TARGETS, HOLD_DAYS)
+
+    start = time.perf_counter()
+    loop_results = evaluate_frame(df, search_space)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    opt_results = run_optstrategy(df)
+    opt_time = time.perf_counter() - start
+
+    print(f"Per-combination Cerebro loop : {loop_time:.2f}s ({loop_time / len(search_space) * 1000:.1f} ms/combination)")
+    print(f"optstrategy single load      : {opt_time:.2f}s ({opt_time / len(search_space) * 1000:.1f} ms/combination)")
+    print(f"optstrategy vs loop          : {loop_time / opt_time:.2f}x")
+    print(f"Identical results            : {loop_results == opt_results}")
+
+    run_kernel(df)  # compile outside the timed run
+    start = time.perf_counter()
+    kernel_results = run_kernel(df)
+    kernel_time = time.perf_counter() - start
+    print(f"Compiled kernel              : {kernel_time:.4f}s ({kernel_time / len(search_space) * 1000:.3f} ms/combination)")
+    print(f"Speedup vs optstrategy       : {opt_time / kernel_time:.0f}x")
+    print(f"Identical results            : {kernel_results == opt_results}")
+
+    start = time.perf_counter()
+    native_results = evaluate_native(df, search_space)
+    native_time = time.perf_counter() - start
+    print(f"Native backtest core         : {native_time:.2f}s ({native_time / len(search_space) * 1000:.1f} ms/combination)")
+    print(f"Speedup vs optstrategy       : {opt_time / native_time:.1f}x")
+    print(f"Identical results            : {native_results == opt_results}")
+
+def run_bb_optimization(maxcpus=None, engine='cerebro', store_path=STORE_PATH, fresh=False):
+    df = load_data()
+    search_space = build_search_space(SMA_PERIODS, DEVFACTORS, PROFIT_TARGETS, HOLD_DAYS)
+    context = {'data': data_signature(DATA_PATH), 'engine': engine}
+    with ResultStore('bb', context, store_path, fresh) as store:
+        if engine == 'kernel':
+            results = run_resumable(store, evaluate_kernel, search_space, shared=df, workers=1)
+        elif engine == 'native':
+            results = run_resumable(store, evaluate_native, search_space, shared=df, workers=1)
+        elif engine == 'optstrategy':
+            # optstrategy always runs the full product, so only a complete
+            # grid in the store saves the rerun
+            if store.missing(search_space):
+                for row in run_optstrategy(df, maxcpus=maxcpus):
+                    store.add((row['sma_period'], row['devfactor'], row['profit_target'], row['max_hold_days']), row)
+            results = store.rows(search_space)
+        else:
+            results = run_resumable(store, evaluate_chunk, search_space, shared=DATA_PATH, workers=maxcpus)
 
     results_df = pd.DataFrame(results)
     os.makedirs("optimization", exist_ok=True)
@@ -89,4 +241,18 @@ def run_bb_optimization():
     print("BB Optimization completed. Results saved to optimization_results_bb.csv")
 
 if __name__ == '__main__':
-    run_bb_optimization()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--maxcpus', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--engine', choices=['cerebro', 'optstrategy', 'kernel', 'native'], default='cerebro',
+                        help='cerebro runs one Cerebro per combination, optstrategy the whole grid in one '
+                             'Cerebro, kernel the compiled Bollinger kernel and native the native backtest core')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='time optstrategy against the per-combination Cerebro loop, the kernel '
+                             'and the native core')
+    add_store_args(parser)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(load_data())
+    else:
+        run_bb_optimization(maxcpus=args.maxcpus, engine=args.engine, store_path=args.store, fresh=args.fresh)
@@ -1,18 +1,38 @@
+import argparse
 import backtrader as bt
 import pandas as pd
-import itertools
 import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bt_feeds import FastPandasData
+from bt_indicators import FinalValue, PrecomputedLine
+from dataset_store import load_frame
+from grid_search import build_search_space
+from indicator_cache import CachedIndicators
+from metrics import cagr, trading_years
+from native_backtest import MACrossoverStrategy, PercentCommission, run_backtest
+from result_store import STORE_PATH, ResultStore, add_store_args, data_signature, run_resumable
+
+FAST_RANGE = range(5, 21, 5)       # fast_ma = 5, 10, 15, 20
+SLOW_RANGE = range(30, 101, 10)    # slow_ma = 30, 40, ..., 100
+DATA_PATH = 'dataset/nifty_data_with_indicators.csv'
 
 class MACrossoverOpt(bt.Strategy):
     params = (
         ('fast_ma', 10),
         ('slow_ma', 50),
         ('position_size', 35),
+        ('indicators', None),
     )
 
     def __init__(self):
-        self.fast = bt.indicators.SimpleMovingAverage(self.data.close, period=self.p.fast_ma)
-        self.slow = bt.indicators.SimpleMovingAverage(self.data.close, period=self.p.slow_ma)
+        # Each SMA period is computed once and shared through the indicator cache
+        self.fast = PrecomputedLine(self.data, values=self.p.indicators.bt_sma(self.p.fast_ma),
+                                    period=self.p.fast_ma)
+        self.slow = PrecomputedLine(self.data, values=self.p.indicators.bt_sma(self.p.slow_ma),
+                                    period=self.p.slow_ma)
         self.crossover = bt.indicators.CrossOver(self.fast, self.slow)
         self.order = None
         self.entry_price = None
@@ -29,21 +49,43 @@ class MACrossoverOpt(bt.Strategy):
             if self.crossover < 0:
                 self.order = self.sell(size=self.p.position_size)
 
-def run_optimization():
+class NativeMACrossoverOpt(MACrossoverStrategy):
+    # MACrossoverOpt on the native core. Like it, the pending order is never
+    # cleared, so only the first entry is taken
+    def notify_order(self, order):
+        pass
+
+def load_data():
+    return load_frame(DATA_PATH)
+
+def result_row(fast, slow, start_value, end_value, df):
+    pnl = end_value - start_value
+    growth = cagr(start_value, end_value, trading_years(df.index))
+    return {
+        'fast_ma': fast,
+        'slow_ma': slow,
+        'Net PnL': round(pnl, 2),
+        'Final Value': round(end_value, 2),
+        'CAGR': f"{growth * 100:.2f}%"
+    }
+
+def evaluate_chunk(shared, chunk):
+    # Workers map the columnar store instead of receiving a parsed frame
+    return evaluate_frame(load_frame(shared), chunk)
+
+def evaluate_frame(df, chunk):
+    # Default engine: one Cerebro per combination. With the feed preloaded
+    # from NumPy this is as fast as optstrategy, and it resumes and spreads
+    # over workers per combination
+    indicators = CachedIndicators(df)
     results = []
-    fast_range = range(5, 21, 5)       # fast_ma = 5, 10, 15, 20
-    slow_range = range(30, 101, 10)    # slow_ma = 30, 40, ..., 100
 
-    for fast, slow in itertools.product(fast_range, slow_range):
-        if fast >= slow:
-            continue  # skip invalid combinations
+    for fast, slow in chunk:
+        data = FastPandasData(dataname=df)
 
         cerebro = bt.Cerebro()
-        cerebro.addstrategy(MACrossoverOpt, fast_ma=fast, slow_ma=slow)
-
-        df = pd.read_csv('dataset/nifty_data_with_indicators.csv', parse_dates=['Date'])
-        df.set_index('Date', inplace=True)
-        data = bt.feeds.PandasData(dataname=df)
+        cerebro.addstrategy(MACrossoverOpt, fast_ma=fast, slow_ma=slow,
+                            indicators=indicators)
 
         cerebro.adddata(data)
         cerebro.broker.setcash(1000000)
@@ -52,17 +94,87 @@ def run_optimization():
         start_value = cerebro.broker.getvalue()
         cerebro.run()
         end_value = cerebro.broker.getvalue()
+        results.append(result_row(fast, slow, start_value, end_value, df))
+
+    return results
+
+def evaluate_native(df, chunk):
+    # Same strategy and fills as the Cerebro paths, on the native backtest core
+    indicators = CachedIndicators(df)
+    results = []
+    for fast, slow in chunk:
+        result = run_backtest(NativeMACrossoverOpt, df, cash=1000000, commission=PercentCommission(0.001),
+                              indicators=indicators, fast_period=fast, slow_period=slow, position_size=35)
+        results.append(result_row(fast, slow, 1000000, result['final_value'], df))
+    return results
 
-        pnl = end_value - start_value
-        cagr = (end_value / start_value) ** (1 / (len(df)/252)) - 1  # Approximate trading years
+def run_optstrategy(df, maxcpus=None):
+    # Single load, single Cerebro: the feed is preloaded once and every
+    # combination runs as an optstrategy variant over it. optstrategy takes the
+    # full product, so the ranges must keep every fast period below every slow one.
+    # Saves nothing over evaluate_frame now that FastPandasData preloads in
+    # milliseconds, and shipping every variant to Backtrader's pool costs extra
+    indicators = CachedIndicators(df)
+    for period in list(FAST_RANGE) + list(SLOW_RANGE):
+        # Warm the cache before Cerebro ships the strategy kwargs to its workers
+        indicators.bt_sma(period)
 
-        results.append({
-            'fast_ma': fast,
-            'slow_ma': slow,
-            'Net PnL': round(pnl, 2),
-            'Final Value': round(end_value, 2),
-            'CAGR': f"{cagr * 100:.2f}%"
-        })
+    cerebro = bt.Cerebro(maxcpus=maxcpus, preload=True, optdatas=True, optreturn=True)
+    cerebro.optstrategy(MACrossoverOpt, fast_ma=FAST_RANGE, slow_ma=SLOW_RANGE,
+                        indicators=indicators)
+    cerebro.adddata(FastPandasData(dataname=df))
+    cerebro.broker.setcash(1000000)
+    cerebro.broker.setcommission(commission=0.001)
+    cerebro.addanalyzer(FinalValue, _name='final_value')
+
+    start_value = cerebro.broker.getvalue()
+    results = []
+    for run in cerebro.run():
+        strat = run[0]
+        end_value = strat.analyzers.final_value.get_analysis()
+        results.append(result_row(strat.params.fast_ma, strat.params.slow_ma,
+                                  start_value, end_value, df))
+    return results
+
+def benchmark(df):
+    search_space = build_search_space(FAST_RANGE, SLOW_RANGE)
+
+    start = time.perf_counter()
+    loop_results = evaluate_frame(df, search_space)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    opt_results = run_optstrategy(df)
+    opt_time = time.perf_counter() - start
+
+    print(f"Per-combination Cerebro loop : {loop_time:.2f}s ({loop_time / len(search_space) * 1000:.1f} ms/combination)")
+    print(f"optstrategy single load      : {opt_time:.2f}s ({opt_time / len(search_space) * 1000:.1f} ms/combination)")
+    print(f"optstrategy vs loop          : {loop_time / opt_time:.2f}x")
+    print(f"Identical results            : {loop_results == opt_results}")
+
+    start = time.perf_counter()
+    native_results = evaluate_native(df, search_space)
+    native_time = time.perf_counter() - start
+    print(f"Native backtest core         : {native_time:.2f}s ({native_time / len(search_space) * 1000:.1f} ms/combination)")
+    print(f"Speedup vs optstrategy       : {opt_time / native_time:.1f}x")
+    print(f"Identical results            : {native_results == opt_results}")
+
+def run_optimization(maxcpus=None, engine='cerebro', store_path=STORE_PATH, fresh=False):
+    df = load_data()
+    search_space = build_search_space(FAST_RANGE, SLOW_RANGE)
+    context = {'data': data_signature(DATA_PATH), 'engine': engine}
+    with ResultStore('ma', context, store_path, fresh) as store:
+        if engine == 'native':
+            results = run_resumable(store, evaluate_native, search_space, shared=df, workers=1)
+        elif engine == 'optstrategy':
+            # optstrategy always runs the full product, so only a complete
+            # grid in the store saves the rerun
+            if store.missing(search_space):
+                for row in run_optstrategy(df, maxcpus=maxcpus):
+                    store.add((row['fast_ma'], row['slow_ma']), row)
+            results = store.rows(search_space)
+        else:
+            results = run_resumable(store, evaluate_chunk, search_space, shared=DATA_PATH, workers=maxcpus)
 
     results_df = pd.DataFrame(results)
     os.makedirs("optimization", exist_ok=True)
@@ -70,4 +182,17 @@ def run_optimization():
     print("Optimization completed. Results saved to optimization_results_ma.csv")
 
 if __name__ == '__main__':
-    run_optimization()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--maxcpus', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--engine', choices=['cerebro', 'optstrategy', 'native'], default='cerebro',
+                        help='cerebro runs one Cerebro per combination, optstrategy the whole grid in one '
+                             'Cerebro and native the native backtest core')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='time optstrategy against the per-combination Cerebro loop and the native core')
+    add_store_args(parser)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(load_data())
+    else:
+        run_optimization(maxcpus=args.maxcpus, engine=args.engine, store_path=args.store, fresh=args.fresh)
@@ -1,84 +1,143 @@
 
+import argparse
+import json
+import math
 import pandas as pd
 import numpy as np
-import itertools
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dataset_store import load_frame
+from grid_search import build_search_space
+from indicator_cache import CachedIndicators
+from metrics import equity_metrics
+from pruning import add_pruning_args, pruning_from_args, pruning_stats, remaining_gains, storable
+from result_store import STORE_PATH, ResultStore, add_store_args, data_signature, run_resumable
 
 # === Config ===
 INITIAL_CASH = 1_000_000
 TRADE_SIZE = 21
 DATA_PATH = "dataset/nifty_data_clean.csv"
 RESULTS_PATH = "optimization/optimization_results_rsi.csv"
-os.makedirs("results", exist_ok=True)
-
-# === Load and prepare data ===
-df = pd.read_csv(DATA_PATH, parse_dates=["Date"])
-df.set_index("Date", inplace=True)
 
 # === Optimization ranges ===
 rsi_periods = range(7, 22, 2)           # 7 to 21
 buy_thresholds = range(20, 41, 5)       # 20 to 40
 sell_thresholds = range(60, 81, 5)      # 60 to 80
 
-# === Run Optimization ===
-results = []
-
-for period, buy_thres, sell_thres in itertools.product(rsi_periods, buy_thresholds, sell_thresholds):
-    data = df.copy()
-
-    # Calculate RSI using Wilder's method
-    delta = data["Close"].diff()
-    gain = delta.clip(lower=0)
-    loss = -delta.clip(upper=0)
-    avg_gain = gain.ewm(alpha=1/period, min_periods=period).mean()
-    avg_loss = loss.ewm(alpha=1/period, min_periods=period).mean()
-    rs = avg_gain / avg_loss
-    data["RSI"] = 100 - (100 / (1 + rs))
-
-    cash = INITIAL_CASH
-    position = 0
-    in_position = False
-    portfolio_values = []
-
-    for date, row in data.iterrows():
-        price = row["Close"]
-        rsi = row["RSI"]
-        if np.isnan(rsi):
+
+def evaluate_chunk(shared, chunk):
+    # Workers map the columnar store instead of receiving a parsed frame
+    data_path, pruning = shared
+    return evaluate_frame(load_frame(data_path), chunk, pruning)
+
+
+def evaluate_frame(df, chunk, pruning=None):
+    indicators = CachedIndicators(df)
+    # Every RSI period this chunk needs, built together in one kernel pass
+    indicators.rsi_many(sorted({period for period, _, _ in chunk}))
+    # At most TRADE_SIZE shares are ever held, long only
+    gains = TRADE_SIZE * remaining_gains(df["Close"].to_numpy()) if pruning else None
+    runs = []
+    # Equity per combination (NaN when pruned), for the metrics
+    equity = np.full((len(chunk), len(df)), np.nan)
+    held_bars = np.zeros(len(chunk), dtype=np.int64)
+
+    for combo, (period, buy_thres, sell_thres) in enumerate(chunk):
+        data = df.copy()
+
+        # Wilder's RSI, built once per period and shared by every threshold pair
+        data["RSI"] = indicators.rsi(period)
+
+        cash = INITIAL_CASH
+        position = 0
+        in_position = False
+        portfolio_values = []
+        peak = INITIAL_CASH
+        pruned = ""
+
+        for i, (date, row) in enumerate(data.iterrows()):
+            price = row["Close"]
+            rsi = row["RSI"]
+            if np.isnan(rsi):
+                # No signal before the RSI warm-up, but the bar still counts
+                # toward the equity curve and pruning
+                pass
+
+            elif not in_position and rsi <= buy_thres:
+                cost = TRADE_SIZE * price
+                if cash >= cost:
+                    cash -= cost
+                    position += TRADE_SIZE
+                    in_position = True
+
+            elif in_position and rsi >= sell_thres:
+                proceeds = TRADE_SIZE * price
+                cash += proceeds
+                position -= TRADE_SIZE
+                in_position = False
+
             portfolio_values.append(cash + position * price)
-            continue
-
-        if not in_position and rsi <= buy_thres:
-            cost = TRADE_SIZE * price
-            if cash >= cost:
-                cash -= cost
-                position += TRADE_SIZE
-                in_position = True
-
-        elif in_position and rsi >= sell_thres:
-            proceeds = TRADE_SIZE * price
-            cash += proceeds
-            position -= TRADE_SIZE
-            in_position = False
-
-        portfolio_values.append(cash + position * price)
-
-    # Final stats
-    start_value = INITIAL_CASH
-    end_value = portfolio_values[-1]
-    start_date = data.index[0]
-    end_date = data.index[-1]
-    n_years = (end_date - start_date).days / 365.25
-    cagr = ((end_value / start_value) ** (1 / n_years)) - 1
-
-    results.append({
-        "RSI_PERIOD": period,
-        "BUY_THRESHOLD": buy_thres,
-        "SELL_THRESHOLD": sell_thres,
-        "FINAL_VALUE": round(end_value, 2),
-        "CAGR": round(cagr * 100, 2)
-    })
-
-# Save to CSV
-results_df = pd.DataFrame(results)
-results_df.to_csv(RESULTS_PATH, index=False)
-print(f"Optimization complete. Results saved to {RESULTS_PATH}")
+            held_bars[combo] += in_position
+
+            if pruning:
+                peak = max(peak, portfolio_values[-1])
+                pruned = pruning.check(portfolio_values[-1], peak, gains[i])
+                if pruned:
+                    break
+
+        # Final stats
+        end_value = math.nan if pruned else portfolio_values[-1]
+        if not pruned:
+            equity[combo] = portfolio_values
+        runs.append((end_value, pruned, len(portfolio_values)))
+        if pruning:
+            pruning.completed([end_value])
+
+    # CAGR, drawdown, Sharpe, Sortino and exposure for the whole chunk at once
+    metrics = equity_metrics(equity, df.index, INITIAL_CASH, held_bars)
+    results = []
+    for combo, ((period, buy_thres, sell_thres), (end_value, pruned, bars)) in enumerate(zip(chunk, runs)):
+        results.append({
+            "RSI_PERIOD": period,
+            "BUY_THRESHOLD": buy_thres,
+            "SELL_THRESHOLD": sell_thres,
+            "FINAL_VALUE": round(end_value, 2),
+            "CAGR": round(metrics["cagr"][combo] * 100, 2),
+            "MAX_DRAWDOWN": round(metrics["max_drawdown"][combo] * 100, 2),
+            "MAX_DRAWDOWN_BARS": metrics["max_drawdown_bars"][combo],
+            "SHARPE": round(metrics["sharpe"][combo], 2),
+            "SORTINO": round(metrics["sortino"][combo], 2),
+            "EXPOSURE": round(metrics["exposure"][combo] * 100, 2),
+        })
+        if pruning:
+            results[-1].update(PRUNED=pruned, BARS_SIMULATED=bars)
+    return results
+
+
+def main(pruning=None, store_path=STORE_PATH, fresh=False):
+    os.makedirs("results", exist_ok=True)
+
+    # === Run Optimization ===
+    search_space = build_search_space(rsi_periods, buy_thresholds, sell_thresholds)
+    context = {"data": data_signature(DATA_PATH), "initial_cash": INITIAL_CASH, "trade_size": TRADE_SIZE,
+               "pruning": pruning and pruning.settings()}
+    with ResultStore("rsi", context, store_path, fresh) as store:
+        results = run_resumable(store, evaluate_chunk, search_space, shared=(DATA_PATH, pruning),
+                                persist=storable)
+
+    # Save to CSV
+    results_df = pd.DataFrame(results)
+    results_df.to_csv(RESULTS_PATH, index=False)
+    print(f"Optimization complete. Results saved to {RESULTS_PATH}")
+    if pruning:
+        print(json.dumps(pruning_stats(results, len(load_frame(DATA_PATH)))))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    add_pruning_args(parser)
+    add_store_args(parser)
+    args = parser.parse_args()
+    main(pruning_from_args(args), args.store, args.fresh)
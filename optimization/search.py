@@ -0,0 +1,110 @@
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import macd_optimizer
+import obv_optimizer
+import optimize_bb
+import optimize_ma
+import rsi_optimizer
+from dataset_store import load_frame
+from search_drivers import DRIVERS, Continuous, SearchSpace, frame_objective, run_search
+
+# Budgeted search over the optimizers' parameter spaces with the drivers in
+# search_drivers.py. Every optimizer is scored with its own evaluation code on
+# the first `fraction` of its dataset, so a full-history trial reproduces the
+# corresponding row of the grid results. bb is scored on the compiled kernel,
+# which keeps BollingerBandOpt's pending order and gives the Cerebro grid's
+# rows to the cent (optimize_bb.py --benchmark checks this).
+
+OPTIMIZERS = {
+    # name -> (load frame, evaluate(df, chunk), score column, search space)
+    "macd": (lambda: load_frame(macd_optimizer.DATA_PATH), macd_optimizer.evaluate_frame, "final_value",
+             SearchSpace({"fast_ema": macd_optimizer.fast_ema_range,
+                          "slow_ema": macd_optimizer.slow_ema_range,
+                          "signal_ema": macd_optimizer.signal_ema_range,
+                          "min_days_between_trades": macd_optimizer.min_days_range,
+                          "trade_size": macd_optimizer.trade_size_range},
+                         where=lambda fast, slow, *_: slow > fast)),
+    "rsi": (lambda: load_frame(rsi_optimizer.DATA_PATH), rsi_optimizer.evaluate_frame, "FINAL_VALUE",
+            SearchSpace({"RSI_PERIOD": rsi_optimizer.rsi_periods,
+                         "BUY_THRESHOLD": rsi_optimizer.buy_thresholds,
+                         "SELL_THRESHOLD": rsi_optimizer.sell_thresholds})),
+    "obv": (lambda: load_frame(obv_optimizer.DATA_PATH), obv_optimizer.evaluate_frame, "FINAL_VALUE",
+            SearchSpace({"OBV_MA_WINDOW": obv_optimizer.ma_windows})),
+    "bb": (optimize_bb.load_data, optimize_bb.evaluate_kernel, "Final Value",
+           SearchSpace({"sma_period": optimize_bb.SMA_PERIODS, "devfactor": optimize_bb.DEVFACTORS,
+                        "profit_target": optimize_bb.PROFIT_TARGETS, "max_hold_days": optimize_bb.HOLD_DAYS})),
+    "ma": (optimize_ma.load_data, optimize_ma.evaluate_frame, "Final Value",
+           SearchSpace({"fast_ma": optimize_ma.FAST_RANGE, "slow_ma": optimize_ma.SLOW_RANGE},
+                       where=lambda fast, slow: fast < slow)),
+}
+
+# Bollinger space with devfactor and profit target searched as real numbers
+BB_CONTINUOUS = SearchSpace({"sma_period": range(10, 41), "devfactor": Continuous(1.0, 3.0),
+                             "profit_target": Continuous(0.01, 0.06), "max_hold_days": range(5, 31)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Budgeted parameter search for the optimizers")
+    parser.add_argument("optimizer", choices=list(OPTIMIZERS))
+    parser.add_argument("--driver", choices=list(DRIVERS), default="tpe")
+    parser.add_argument("--budget", type=float, default=100, help="full-history evaluations to spend")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--continuous", action="store_true",
+                        help="bb only: search devfactor and profit_target over continuous ranges")
+    parser.add_argument("--compare", action="store_true",
+                        help="also evaluate the whole grid and report how close the search got")
+    args = parser.parse_args()
+
+    if args.budget < 1:
+        parser.error("--budget must cover at least one full-history evaluation")
+
+    load, evaluate, score_key, space = OPTIMIZERS[args.optimizer]
+    if args.continuous:
+        if args.optimizer != "bb":
+            parser.error("--continuous is only available for bb")
+        space = BB_CONTINUOUS
+    df = load()
+    objective = frame_objective(evaluate, df, score_key)
+
+    start = time.perf_counter()
+    best, trials = run_search(args.driver, space, objective, args.budget, seed=args.seed)
+    elapsed = time.perf_counter() - start
+    cost = sum(trial.fraction for trial in trials)
+
+    results_path = f"optimization/search_results_{args.optimizer}_{args.driver}.csv"
+    pd.DataFrame([{**dict(zip(space.names, trial.params)), "fraction": round(trial.fraction, 4),
+                   "score": trial.score} for trial in trials]).to_csv(results_path, index=False)
+
+    grid_size = space.size()
+    print(f"{args.driver}: {len(trials)} trials, {cost:.1f} full-history evaluations "
+          f"(grid: {grid_size}), {elapsed:.1f}s")
+    # A driver can spend the budget on partial-history trials without
+    # promoting any of them to the full history
+    if best is None:
+        print("Best: no full-history trial within the budget")
+    else:
+        print(f"Best: {dict(zip(space.names, best.params))} -> {score_key} {best.score:,.2f}")
+    print(f"Trials saved to {results_path}")
+
+    if args.compare:
+        if not space.finite:
+            parser.error("--compare needs a finite space")
+        start = time.perf_counter()
+        scores = objective(space.grid(), 1.)
+        grid_time = time.perf_counter() - start
+        if best is None:
+            placed = "search found no full-history trial"
+        else:
+            placed = f"search best ranks {int((scores > best.score).sum()) + 1} of {len(scores)}"
+        print(f"Grid best: {dict(zip(space.names, space.grid()[scores.argmax()]))} -> "
+              f"{scores.max():,.2f} ({grid_time:.1f}s); {placed}")
+
+
+if __name__ == "__main__":
+    main()
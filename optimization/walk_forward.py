@@ -0,0 +1,224 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import macd_optimizer
+import optimize_bb
+import rsi_optimizer
+from batch_engine import crossover_signals, day_numbers, macd_lines, simulate_fixed_size
+from bollinger_kernel import FILL_NEXT_OPEN, run_bollinger
+from dataset_store import load_frame
+from grid_search import build_search_space, run_grid
+from indicator_cache import CachedIndicators
+from metrics import calendar_years, cagr
+
+# Walk-forward optimization: roll train/test windows over the history, pick
+# the best grid point on each train slice and run it on the following test
+# slice. The test slices' equity curves are stitched into one out-of-sample
+# curve.
+#
+# Indicators only look back, so every series is built once on the full
+# history through the shared indicator cache and each fold slices it; the
+# overlapping windows never recompute a moving average or EWM. Folds run in
+# parallel on the grid_search pool. Each test fold starts from the initial
+# capital and the stitched curve chains their returns, so folds are
+# independent of each other.
+
+INITIAL_CASH = 1_000_000
+TRAIN_BARS = 756      # ~3 years of daily bars
+TEST_BARS = 252       # ~1 year
+
+
+# ==== Strategies ====
+# Each strategy has the grid of its optimizer and a simulate(df, indicators,
+# params, start, stop) returning (final values, equity curves) for a batch of
+# parameter rows over bars [start, stop).
+
+def macd_grid():
+    return build_search_space(macd_optimizer.fast_ema_range, macd_optimizer.slow_ema_range,
+                              macd_optimizer.signal_ema_range, macd_optimizer.min_days_range,
+                              macd_optimizer.trade_size_range,
+                              where=lambda fast, slow, *_: slow > fast)
+
+
+def macd_simulate(df, indicators, params, start, stop):
+    params = np.asarray(params, dtype=np.int64)
+    triples, row_of = np.unique(params[:, :3], axis=0, return_inverse=True)
+    macd, signal_line = macd_lines(indicators, triples[:, 0], triples[:, 1], triples[:, 2])
+    buy, sell = crossover_signals(macd, signal_line)
+    close = df["Close"].to_numpy(dtype=float)
+    return simulate_fixed_size(close[start:stop], day_numbers(df.index)[start:stop],
+                               buy[row_of, start:stop], sell[row_of, start:stop],
+                               params[:, 3], params[:, 4], INITIAL_CASH, keep_equity=True)
+
+
+def rsi_grid():
+    return build_search_space(rsi_optimizer.rsi_periods, rsi_optimizer.buy_thresholds,
+                              rsi_optimizer.sell_thresholds)
+
+
+def rsi_simulate(df, indicators, params, start, stop):
+    params = np.asarray(params, dtype=np.int64)
+    rsi = np.array(indicators.rsi_many(params[:, 0].tolist()))[:, start:stop]
+    with np.errstate(invalid="ignore"):
+        buy = rsi <= params[:, 1:2]
+        sell = rsi >= params[:, 2:3]
+    close = df["Close"].to_numpy(dtype=float)
+    return simulate_fixed_size(close[start:stop], day_numbers(df.index)[start:stop], buy, sell,
+                               0, rsi_optimizer.TRADE_SIZE, INITIAL_CASH, keep_equity=True,
+                               single_position=True)
+
+
+def bb_grid():
+    return build_search_space(optimize_bb.SMA_PERIODS, optimize_bb.DEVFACTORS,
+                              optimize_bb.PROFIT_TARGETS, optimize_bb.HOLD_DAYS)
+
+
+def bb_simulate(df, indicators, params, start, stop):
+    # The Bollinger kernel with next-open fills, 35 shares and 0.1% commission,
+    # clearing the order once it fills (see WARNINGS)
+    open_ = df["Open"].to_numpy()[start:stop]
+    close = df["Close"].to_numpy()[start:stop]
+    equity = np.empty((len(params), stop - start))
+    for row, (sma, dev, pt, hold) in enumerate(params):
+        mid, _, bot = indicators.bt_bollinger(int(sma), float(dev))
+        _, equity[row] = run_bollinger(close, bot[start:stop], mid[start:stop], open_=open_,
+                                       initial_capital=INITIAL_CASH, position_size=35,
+                                       profit_target=pt, max_hold_days=int(hold),
+                                       commission=0.001, fill_mode=FILL_NEXT_OPEN)
+    return equity[:, -1], equity
+
+
+STRATEGIES = {
+    # name -> (data path, grid, simulate, parameter names)
+    "macd": (macd_optimizer.DATA_PATH, macd_grid, macd_simulate,
+             ("fast_ema", "slow_ema", "signal_ema", "min_days_between_trades", "trade_size")),
+    "rsi": (rsi_optimizer.DATA_PATH, rsi_grid, rsi_simulate,
+            ("RSI_PERIOD", "BUY_THRESHOLD", "SELL_THRESHOLD")),
+    "bb": (optimize_bb.DATA_PATH, bb_grid, bb_simulate,
+           ("sma_period", "devfactor", "profit_target", "max_hold_days")),
+}
+
+# Printed with the results of strategies whose folds don't trade exactly like
+# their optimizer or phase 2 script
+WARNINGS = {
+    "bb": "bb folds trade every signal (the order is cleared once it fills) with 35 shares. "
+          "optimize_bb's engines keep the first order pending and trade once, and the phase 2 "
+          "script (and its cached backtests) holds 40 shares, so neither reproduces these values.",
+}
+
+
+# ==== Folds ====
+def make_folds(n_bars, train_bars=TRAIN_BARS, test_bars=TEST_BARS, anchored=False):
+    # (train_start, train_stop, test_stop) per fold; anchored folds all train
+    # from the first bar, rolling ones keep a fixed train length
+    folds = []
+    train_stop = train_bars
+    while train_stop < n_bars:
+        test_stop = min(train_stop + test_bars, n_bars)
+        folds.append((0 if anchored else train_stop - train_bars, train_stop, test_stop))
+        train_stop = test_stop
+    return folds
+
+
+def evaluate_folds(shared, folds, batch_size=2048):
+    name = shared
+    data_path, grid, simulate, _ = STRATEGIES[name]
+    df = load_frame(data_path)
+    # The process-wide cache keeps every series across this worker's folds
+    indicators = CachedIndicators(df)
+    space = grid()
+
+    results = []
+    for train_start, train_stop, test_stop in folds:
+        best_value, best_params = -np.inf, None
+        for batch_start in range(0, len(space), batch_size):
+            batch = space[batch_start:batch_start + batch_size]
+            final_values, _ = simulate(df, indicators, batch, train_start, train_stop)
+            row = int(np.argmax(final_values))
+            if final_values[row] > best_value:
+                best_value, best_params = final_values[row], batch[row]
+
+        _, equity = simulate(df, indicators, [best_params], train_stop, test_stop)
+        results.append({
+            "train": (train_start, train_stop),
+            "test": (train_stop, test_stop),
+            "params": best_params,
+            "train_value": float(best_value),
+            "test_equity": equity[0],
+        })
+    return results
+
+
+def stitch(df, folds):
+    # Chains each test fold's returns onto the previous fold's end value
+    equity, fold_ids = [], []
+    value = INITIAL_CASH
+    for fold_id, fold in enumerate(folds):
+        curve = value * fold["test_equity"] / INITIAL_CASH
+        equity.append(curve)
+        fold_ids.append(np.full(len(curve), fold_id))
+        value = curve[-1]
+    start, stop = folds[0]["test"][0], folds[-1]["test"][1]
+    return pd.DataFrame({"Equity": np.concatenate(equity), "Fold": np.concatenate(fold_ids)},
+                        index=df.index[start:stop])
+
+
+def run_walk_forward(name, train_bars=TRAIN_BARS, test_bars=TEST_BARS, anchored=False, workers=None):
+    data_path, _, _, param_names = STRATEGIES[name]
+    df = load_frame(data_path)
+    folds = make_folds(len(df), train_bars, test_bars, anchored)
+    if not folds:
+        raise ValueError(f"{len(df)} bars is not enough for a {train_bars}-bar train window")
+
+    results = list(run_grid(evaluate_folds, folds, shared=name,
+                            workers=workers, chunk_size=1))
+    curve = stitch(df, results)
+    summary = pd.DataFrame([{
+        "fold": fold_id,
+        "train_start": df.index[fold["train"][0]].date(),
+        "train_end": df.index[fold["train"][1] - 1].date(),
+        "test_start": df.index[fold["test"][0]].date(),
+        "test_end": df.index[fold["test"][1] - 1].date(),
+        **dict(zip(param_names, fold["params"])),
+        "train_final_value": round(fold["train_value"], 2),
+        "test_return_pct": round((fold["test_equity"][-1] / INITIAL_CASH - 1) * 100, 2),
+    } for fold_id, fold in enumerate(results)])
+    return curve, summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Walk-forward optimization with stitched out-of-sample equity")
+    parser.add_argument("strategy", choices=list(STRATEGIES))
+    parser.add_argument("--train-bars", type=int, default=TRAIN_BARS)
+    parser.add_argument("--test-bars", type=int, default=TEST_BARS)
+    parser.add_argument("--anchored", action="store_true", help="grow the train window from the first bar")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    curve, summary = run_walk_forward(args.strategy, args.train_bars, args.test_bars,
+                                      args.anchored, args.workers)
+    elapsed = time.perf_counter() - start
+
+    curve_path = f"optimization/walk_forward_{args.strategy}_equity.csv"
+    summary_path = f"optimization/walk_forward_{args.strategy}_folds.csv"
+    curve.to_csv(curve_path)
+    summary.to_csv(summary_path, index=False)
+
+    print(summary.to_string(index=False))
+    growth = cagr(INITIAL_CASH, curve["Equity"].iloc[-1], calendar_years(curve.index))
+    print(f"\nOut-of-sample: {len(curve)} bars, final value {curve['Equity'].iloc[-1]:,.2f}, "
+          f"CAGR {growth * 100:.2f}%  ({elapsed:.1f}s)")
+    print(f"Saved {curve_path} and {summary_path}")
+    if args.strategy in WARNINGS:
+        print(f"\nWarning: {WARNINGS[args.strategy]}")
+
+
+if __name__ == "__main__":
+    main()
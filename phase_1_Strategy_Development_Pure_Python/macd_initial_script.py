@@ -1,16 +1,18 @@
-import pandas as pd
 import numpy as np
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bar_iter import iter_bars
+from dataset_store import load_frame
+from indicators import ema, macd
 
 # Load your NIFTY50 data
-df = pd.read_csv("dataset/nifty_data_clean.csv", parse_dates=['Date'])
-df.set_index('Date', inplace=True)
+df = load_frame("dataset/nifty_data_clean.csv")
 
 # --- MACD Calculations ---
-df['EMA_12'] = df['Close'].ewm(span=16, adjust=False).mean()
-df['EMA_26'] = df['Close'].ewm(span=70, adjust=False).mean()
-df['MACD_Line'] = df['EMA_12'] - df['EMA_26']
-df['Signal_Line'] = df['MACD_Line'].ewm(span=6, adjust=False).mean()
-df['MACD_Histogram'] = df['MACD_Line'] - df['Signal_Line']
+df['EMA_12'], df['EMA_26'] = ema(df['Close'].to_numpy(), [16, 70])
+df['MACD_Line'], df['Signal_Line'], df['MACD_Histogram'] = macd(df['Close'].to_numpy(), 16, 70, 6)
 
 # --- Generate Buy/Sell Signals ---
 df['Signal'] = 0
@@ -23,9 +25,9 @@ cash = initial_cash
 shares = 0
 portfolio_values = []
 
-for i in range(1, len(df)):
-    price = df['Close'].iloc[i]
-    signal = df['Position'].iloc[i]
+for bar in iter_bars(df, ['Close', 'Position'], start=1):
+    price = bar.Close
+    signal = bar.Position
 
     # Buy signal
     if signal == 1:
@@ -1,47 +1,51 @@
 
-import pandas as pd
-import numpy as np
+import math
+import os
+import sys
+from itertools import pairwise
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bar_iter import iter_bars
+from dataset_store import load_frame
+from indicators import obv, sma
 
 # Configuration
 INITIAL_CASH = 1_000_000
 TRADE_SIZE = 21
 
 # Load data
-df = pd.read_csv("dataset/nifty_data_clean.csv", parse_dates=["Date"])
-df.set_index("Date", inplace=True)
+df = load_frame("dataset/nifty_data_clean.csv")
 
 # Calculate OBV
-df["OBV"] = 0
-df["OBV"][1:] = np.where(df["Close"].diff()[1:] > 0, df["Volume"][1:], 
-                         np.where(df["Close"].diff()[1:] < 0, -df["Volume"][1:], 0)).cumsum()
+df["OBV"] = obv(df["Close"].to_numpy(), df["Volume"].to_numpy())
 
 # Calculate OBV Moving Average (Signal Line)
-df["OBV_MA"] = df["OBV"].rolling(window=20).mean()
+df["OBV_MA"] = sma(df["OBV"].to_numpy(), 20)
 
 # Trading Logic
 cash = INITIAL_CASH
 position = 0
 portfolio_values = []
 
-for i in range(1, len(df)):
-    price = df["Close"].iloc[i]
-    obv = df["OBV"].iloc[i]
-    obv_ma = df["OBV_MA"].iloc[i]
+for prev, bar in pairwise(iter_bars(df, ["Close", "OBV", "OBV_MA"])):
+    price = bar.Close
+    obv = bar.OBV
+    obv_ma = bar.OBV_MA
 
     # Skip if MA not ready
-    if np.isnan(obv_ma):
+    if math.isnan(obv_ma):
         portfolio_values.append(cash + position * price)
         continue
 
     # Buy condition: OBV crosses above OBV_MA
-    if df["OBV"].iloc[i - 1] < df["OBV_MA"].iloc[i - 1] and obv > obv_ma:
+    if prev.OBV < prev.OBV_MA and obv > obv_ma:
         cost = TRADE_SIZE * price
         if cash >= cost:
             cash -= cost
             position += TRADE_SIZE
 
     # Sell condition: OBV crosses below OBV_MA
-    elif df["OBV"].iloc[i - 1] > df["OBV_MA"].iloc[i - 1] and obv < obv_ma:
+    elif prev.OBV > prev.OBV_MA and obv < obv_ma:
         proceeds = TRADE_SIZE * price
         cash += proceeds
         position -= TRADE_SIZE
@@ -1,5 +1,11 @@
-import pandas as pd
-import numpy as np
+import math
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bar_iter import iter_bars
+from dataset_store import load_frame
+from indicators import wilder_rsi
 
 # Config
 INITIAL_CASH = 1_000_000
@@ -9,17 +15,10 @@ RSI_OVERSOLD = 30
 RSI_OVERBOUGHT = 70
 
 # Load data
-df = pd.read_csv("dataset/nifty_data_clean.csv", parse_dates=["Date"])
-df.set_index("Date", inplace=True)
+df = load_frame("dataset/nifty_data_clean.csv")
 
 # Calculate RSI using Wilder's smoothing
-delta = df["Close"].diff()
-gain = delta.clip(lower=0)
-loss = -delta.clip(upper=0)
-avg_gain = gain.ewm(alpha=1/RSI_PERIOD, min_periods=RSI_PERIOD, adjust=False).mean()
-avg_loss = loss.ewm(alpha=1/RSI_PERIOD, min_periods=RSI_PERIOD, adjust=False).mean()
-rs = avg_gain / avg_loss
-df["RSI"] = 100 - (100 / (1 + rs))
+df["RSI"] = wilder_rsi(df["Close"].to_numpy(), RSI_PERIOD, adjust=False)
 
 # Strategy logic
 cash = INITIAL_CASH
@@ -27,11 +26,11 @@ position = 0
 portfolio_values = []
 in_position = False
 
-for date, row in df.iterrows():
-    price = row["Close"]
-    rsi = row["RSI"]
+for bar in iter_bars(df, ["Close", "RSI"], native=True):
+    price = bar.Close
+    rsi = bar.RSI
 
-    if np.isnan(rsi):
+    if math.isnan(rsi):
         portfolio_values.append(cash + position * price)
         continue
 
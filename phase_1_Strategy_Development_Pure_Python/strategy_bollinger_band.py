@@ -1,9 +1,12 @@
-import pandas as pd
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bar_iter import iter_bars
+from dataset_store import load_frame
 
 # Load dataset with indicators
-df = pd.read_csv("dataset/nifty_data_with_indicators.csv")
-df['Date'] = pd.to_datetime(df['Date'])
-df.set_index('Date', inplace=True)
+df = load_frame("dataset/nifty_data_with_indicators.csv")
 
 # Strategy settings
 initial_capital = 1000000
@@ -20,13 +23,11 @@ def calculate_brokerage(value):
     return max(20, 0.001 * value)
 
 # Strategy logic
-for i in range(1, len(df)):
-    row = df.iloc[i]
-    price = row['Close']
-    date = row.name
+for row in iter_bars(df, ['Close', 'Lower_Band', 'Upper_Band'], start=1):
+    price = row.Close
 
     # BUY when price < Lower Band
-    if not in_position and price < row['Lower_Band']:
+    if not in_position and price < row.Lower_Band:
         cost = price * position_size
         brokerage = calculate_brokerage(cost)
 
@@ -38,7 +39,7 @@ for i in range(1, len(df)):
             total_brokerage += brokerage
 
             trades.append({
-                'Date': date,
+                'Date': row.date,
                 'Action': 'BUY',
                 'Price': price,
                 'Qty': position_size,
@@ -47,7 +48,7 @@ for i in range(1, len(df)):
             })
 
     # SELL when price > Upper Band
-    elif in_position and price > row['Upper_Band']:
+    elif in_position and price > row.Upper_Band:
         sell_value = price * quantity_held
         brokerage = calculate_brokerage(sell_value)
         pnl = (price - buy_price) * quantity_held - brokerage
@@ -57,7 +58,7 @@ for i in range(1, len(df)):
         total_brokerage += brokerage
 
         trades.append({
-            'Date': date,
+            'Date': row.date,
             'Action': 'SELL',
             'Price': price,
             'Qty': position_size,
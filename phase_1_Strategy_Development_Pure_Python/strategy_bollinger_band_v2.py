@@ -1,4 +1,9 @@
-import pandas as pd
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bollinger_kernel import BUY, run_bollinger_frame
+from dataset_store import load_frame
 
 # === CONFIGURABLE PARAMETERS ===
 initial_capital = 1000000      # Starting capital
@@ -7,79 +12,42 @@ max_holding_days = 20            # Max number of days to hold
 profit_target_pct = 0.03        # 2% profit target (0.02 = 2%)
 
 # === Load Dataset ===
-df = pd.read_csv("dataset/nifty_data_with_indicators.csv")
-df['Date'] = pd.to_datetime(df['Date'])
-df.set_index('Date', inplace=True)
-
+df = load_frame("dataset/nifty_data_with_indicators.csv")
 
 
-# === Initialize Strategy State ===
-capital = initial_capital
-in_position = False
-buy_price = 0
-buy_date = None
-quantity_held = 0
-total_brokerage = 0
-trades = []
-
-def calculate_brokerage(value):
-    return 0.001 * value 
 
 # === Run Strategy ===
-for i in range(1, len(df)):
-    row = df.iloc[i]
-    date = row.name
-    price = row['Close']
-
-    # --- BUY CONDITION ---
-    if not in_position and price < row['Lower_Band']:
-        cost = price * position_size
-        brokerage = calculate_brokerage(cost)
+# Lower-band entry, SMA / profit-target / max-hold exits and 0.1% brokerage
+# run in the compiled kernel; holding time is measured in calendar days
+result, equity = run_bollinger_frame(
+    df,
+    initial_capital=initial_capital,
+    position_size=position_size,
+    profit_target=profit_target_pct,
+    max_hold_days=max_holding_days,
+    commission=0.001,
+)
 
-        if capital >= (cost + brokerage):
-            capital -= (cost + brokerage)
-            buy_price = price
-            buy_date = date
-            quantity_held = position_size
-            in_position = True
-            total_brokerage += brokerage
-
-            trades.append({
-                'Date': date,
-                'Action': 'BUY',
-                'Price': price,
-                'Qty': position_size,
-                'Brokerage': brokerage,
-                'Capital_After': capital
-            })
-
-    # --- SELL CONDITION ---
-    elif in_position:
-        holding_days = (date - buy_date).days
-        gain_pct = (price - buy_price) / buy_price
-
-        if (
-            price > row['SMA_20'] or
-            gain_pct >= profit_target_pct or
-            holding_days >= max_holding_days
-        ):
-            sell_value = price * quantity_held
-            brokerage = calculate_brokerage(sell_value)
-            pnl = (price - buy_price) * quantity_held - brokerage
-            capital += (sell_value - brokerage)
-            in_position = False
-            quantity_held = 0
-            total_brokerage += brokerage
-
-            trades.append({
-                'Date': date,
-                'Action': 'SELL',
-                'Price': price,
-                'Qty': position_size,
-                'Brokerage': brokerage,
-                'PnL': pnl,
-                'Capital_After': capital
-            })
+trades = []
+for bar, side, price, brokerage, pnl, capital_after in zip(
+        result['bar'], result['side'], result['price'], result['brokerage'],
+        result['pnl'], result['capital_after']):
+    trade = {
+        'Date': df.index[bar],
+        'Action': 'BUY' if side == BUY else 'SELL',
+        'Price': price,
+        'Qty': position_size,
+        'Brokerage': brokerage,
+    }
+    if side != BUY:
+        trade['PnL'] = pnl
+    trade['Capital_After'] = capital_after
+    trades.append(trade)
+
+capital = trades[-1]['Capital_After'] if trades else initial_capital
+in_position = bool(trades) and trades[-1]['Action'] == 'BUY'
+quantity_held = position_size if in_position else 0
+total_brokerage = sum(result['brokerage'].tolist())
 
 # === Final Net Worth ===
 realized_pnl = capital - initial_capital
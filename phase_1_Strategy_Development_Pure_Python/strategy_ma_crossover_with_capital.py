@@ -1,9 +1,13 @@
-import pandas as pd
+import os
+import sys
+from itertools import pairwise
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bar_iter import iter_bars
+from dataset_store import load_frame
 
 # Load dataset with indicators
-df = pd.read_csv("dataset/nifty_data_with_indicators.csv")
-df['Date'] = pd.to_datetime(df['Date'])
-df.set_index('Date', inplace=True)
+df = load_frame("dataset/nifty_data_with_indicators.csv")
 
 # --- Strategy Settings ---
 initial_capital = 1000000
@@ -20,14 +24,11 @@ def calculate_brokerage(value):
     return max(20, 0.001 * value)
 
 # Backtest logic
-for i in range(1, len(df)):
-    row = df.iloc[i]
-    prev = df.iloc[i - 1]
-    price = row['Close']
-    date = row.name
+for prev, row in pairwise(iter_bars(df, ['Close', 'SMA_Fast', 'SMA_Slow'])):
+    price = row.Close
 
     # BUY CONDITION
-    if not in_position and row['SMA_Fast'] > row['SMA_Slow'] and prev['SMA_Fast'] <= prev['SMA_Slow']:
+    if not in_position and row.SMA_Fast > row.SMA_Slow and prev.SMA_Fast <= prev.SMA_Slow:
         cost = price * position_size
         brokerage = calculate_brokerage(cost)
 
@@ -39,7 +40,7 @@ for i in range(1, len(df)):
             total_brokerage += brokerage
 
             trades.append({
-                'Date': date,
+                'Date': row.date,
                 'Action': 'BUY',
                 'Price': price,
                 'Qty': position_size,
@@ -48,7 +49,7 @@ for i in range(1, len(df)):
             })
 
     # SELL CONDITION
-    elif in_position and row['SMA_Fast'] < row['SMA_Slow'] and prev['SMA_Fast'] >= prev['SMA_Slow']:
+    elif in_position and row.SMA_Fast < row.SMA_Slow and prev.SMA_Fast >= prev.SMA_Slow:
         sell_value = price * quantity_held
         brokerage = calculate_brokerage(sell_value)
         pnl = (price - buy_price) * quantity_held - brokerage
@@ -58,7 +59,7 @@ for i in range(1, len(df)):
         total_brokerage += brokerage
 
         trades.append({
-            'Date': date,
+            'Date': row.date,
             'Action': 'SELL',
             'Price': price,
             'Qty': position_size,
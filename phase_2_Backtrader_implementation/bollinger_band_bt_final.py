@@ -1,6 +1,19 @@
 import backtrader as bt
 import pandas as pd
 import matplotlib.pyplot as plt
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backtest_memo import memoized
+from bt_feeds import BAND_DEVFACTOR, BAND_PERIOD, IndicatorPandasData
+from bt_indicators import WarmupLine
+from dataset_store import load_frame
+from metrics import cagr, calendar_years, max_drawdown, round_trips, trade_stats
+
+DATA_PATH = 'dataset/nifty_data_with_indicators.csv'
+INITIAL_CASH = 1000000
+COMMISSION = 0.001
 
 class BollingerBandStrategy(bt.Strategy):
     params = (
@@ -9,12 +22,20 @@ class BollingerBandStrategy(bt.Strategy):
         ('profit_target', 0.03),         # 3% profit target
         ('max_hold_days', 15),           # Max holding period
         ('position_size', 40),           # Units per trade
+        ('feed_lines', False),           # read IndicatorPandasData's sma_20 / lower_band (20, 2.0) lines
     )
 
     def __init__(self):
-        self.sma = bt.indicators.SimpleMovingAverage(self.data.close, period=self.p.sma_period)
-        self.boll = bt.indicators.BollingerBands(
-            self.data.close, period=self.p.sma_period, devfactor=self.p.devfactor)
+        if self.p.feed_lines:
+            if (self.p.sma_period, self.p.devfactor) != (BAND_PERIOD, BAND_DEVFACTOR):
+                raise ValueError(f"feed_lines carries {BAND_PERIOD}-bar, {BAND_DEVFACTOR} std bands, not "
+                                 f"sma_period={self.p.sma_period}, devfactor={self.p.devfactor}")
+            self.sma = WarmupLine(self.data.sma_20, period=self.p.sma_period)
+            self.boll_bot = WarmupLine(self.data.lower_band, period=self.p.sma_period)
+        else:
+            self.sma = bt.indicators.SimpleMovingAverage(self.data.close, period=self.p.sma_period)
+            self.boll_bot = bt.indicators.BollingerBands(
+                self.data.close, period=self.p.sma_period, devfactor=self.p.devfactor).lines.bot
         self.order = None
         self.entry_price = None
         self.entry_bar = None
@@ -43,7 +64,7 @@ class BollingerBandStrategy(bt.Strategy):
             return
 
         if not self.position:
-            if self.data.close[0] < self.boll.lines.bot[0]:
+            if self.data.close[0] < self.boll_bot[0]:
                 self.order = self.buy(size=self.p.position_size)
                 self.entry_price = self.data.close[0]
                 self.entry_bar = len(self)
@@ -56,27 +77,33 @@ class BollingerBandStrategy(bt.Strategy):
                 holding_days >= self.p.max_hold_days):
                 self.order = self.sell(size=self.p.position_size)
 
-if __name__ == '__main__':
+def run_backtest():
     cerebro = bt.Cerebro()
     cerebro.addstrategy(BollingerBandStrategy)
 
     # Load CSV
-    df = pd.read_csv('dataset/nifty_data_with_indicators.csv', parse_dates=['Date'])
-    df.set_index('Date', inplace=True)
-    data = bt.feeds.PandasData(dataname=df)
+    df = load_frame(DATA_PATH)
+    data = IndicatorPandasData(dataname=df)
 
     cerebro.adddata(data)
-    cerebro.broker.setcash(1000000)
-    cerebro.broker.setcommission(commission=0.001)
+    cerebro.broker.setcash(INITIAL_CASH)
+    cerebro.broker.setcommission(commission=COMMISSION)
 
-    print(f"Starting Portfolio Value: ₹{cerebro.broker.getvalue():,.2f}")
     results = cerebro.run()
-    final_value = cerebro.broker.getvalue()
+    strategy = results[0]
+    return {'final_value': cerebro.broker.getvalue(), 'trades': strategy.trades,
+            'equity_curve': strategy.equity_curve}
+
+if __name__ == '__main__':
+    print(f"Starting Portfolio Value: ₹{INITIAL_CASH:,.2f}")
+    # Served from the backtest cache when the data, strategy and settings are unchanged
+    result = memoized(run_backtest, DATA_PATH, BollingerBandStrategy,
+                      settings={'cash': INITIAL_CASH, 'commission': COMMISSION})
+    final_value = result['final_value']
     print(f"Final Portfolio Value: ₹{final_value:,.2f}")
 
-    strategy = results[0]
-    trades_df = pd.DataFrame(strategy.trades)
-    equity_df = pd.DataFrame(strategy.equity_curve)
+    trades_df = pd.DataFrame(result['trades'])
+    equity_df = pd.DataFrame(result['equity_curve'])
     equity_df['Date'] = pd.to_datetime(equity_df['Date'])
     equity_df.set_index('Date', inplace=True)
     equity_df = equity_df[~equity_df.index.duplicated(keep='first')]
@@ -94,42 +121,22 @@ if __name__ == '__main__':
     trades_df.to_csv("results/bollinger_band_trades_log.csv", index=False)
 
     # Performance Metrics
-    start_val = equity_df['Portfolio Value'].iloc[0]
-    end_val = equity_df['Portfolio Value'].iloc[-1]
-    duration_years = (equity_df.index[-1] - equity_df.index[0]).days / 365.25
-    cagr = (end_val / start_val) ** (1 / duration_years) - 1
-    rolling_max = equity_df['Portfolio Value'].cummax()
-    drawdown = equity_df['Portfolio Value'] / rolling_max - 1
-    max_drawdown = drawdown.min()
+    values = equity_df['Portfolio Value'].to_numpy()
+    start_val = values[0]
+    end_val = values[-1]
+    growth = cagr(start_val, end_val, calendar_years(equity_df.index))
+    max_dd = max_drawdown(values)
 
     print("\n--- Strategy Performance Summary ---")
     print(f"Starting Capital      : ₹{start_val:,.2f}")
     print(f"Final Portfolio Value : ₹{end_val:,.2f}")
     print(f"Net Profit/Loss       : ₹{end_val - start_val:,.2f}")
-    print(f"CAGR                  : {cagr * 100:.2f}%")
-    print(f"Max Drawdown          : {max_drawdown * 100:.2f}%")
+    print(f"CAGR                  : {growth * 100:.2f}%")
+    print(f"Max Drawdown          : {max_dd * 100:.2f}%")
     print(f"Total Trades Executed : {len(trades_df)}")
-    wins = 0
-    losses = 0
-    position_open = False
-    entry_price = 0.0
-
-    for i, row in trades_df.iterrows():
-        if row['Action'] == 'BUY':
-            entry_price = row['Price']
-            position_open = True
-        elif row['Action'] == 'SELL' and position_open:
-            exit_price = row['Price']
-            pnl = exit_price - entry_price
-            if pnl > 0:
-                wins += 1
-            else:
-                losses += 1
-            position_open = False
-
-    total_closed_trades = wins + losses
-    win_rate = (wins / total_closed_trades) * 100 if total_closed_trades > 0 else 0.0
-
-    print(f"Winning Trades         : {wins}")
-    print(f"Losing Trades          : {losses}")
-    print(f"Win Rate               : {win_rate:.2f}%")
\ No newline at end of file
+    entries, exits = round_trips(trades_df['Action'].to_numpy(), trades_df['Price'].to_numpy())
+    stats = trade_stats(exits - entries)
+
+    print(f"Winning Trades         : {stats['wins']}")
+    print(f"Losing Trades          : {stats['losses']}")
+    print(f"Win Rate               : {stats['win_rate']:.2f}%")
\ No newline at end of file
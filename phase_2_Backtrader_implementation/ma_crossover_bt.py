@@ -1,18 +1,39 @@
 import backtrader as bt
 import pandas as pd
 import matplotlib.pyplot as plt
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backtest_memo import memoized
+from bt_feeds import SMA_FAST_PERIOD, SMA_SLOW_PERIOD, IndicatorPandasData
+from bt_indicators import WarmupLine
+from dataset_store import load_frame
+from metrics import cagr, calendar_years, max_drawdown, round_trips, trade_stats
+
+DATA_PATH = 'dataset/nifty_data_with_indicators.csv'
+INITIAL_CASH = 1000000
+COMMISSION = 0.001
 
 class MACrossoverStrategy(bt.Strategy):
     params = (
         ('fast_period', 20),
         ('slow_period', 90),
         ('position_size', 35),
+        ('feed_lines', False),   # read IndicatorPandasData's sma_fast / sma_slow (20 / 90) lines
     )
 
     def __init__(self):
         self.order = None
-        self.fast_ma = bt.indicators.SimpleMovingAverage(self.data.close, period=self.p.fast_period)
-        self.slow_ma = bt.indicators.SimpleMovingAverage(self.data.close, period=self.p.slow_period)
+        if self.p.feed_lines:
+            if (self.p.fast_period, self.p.slow_period) != (SMA_FAST_PERIOD, SMA_SLOW_PERIOD):
+                raise ValueError(f"feed_lines carries the {SMA_FAST_PERIOD} / {SMA_SLOW_PERIOD} SMAs, not "
+                                 f"fast_period={self.p.fast_period}, slow_period={self.p.slow_period}")
+            self.fast_ma = WarmupLine(self.data.sma_fast, period=self.p.fast_period)
+            self.slow_ma = WarmupLine(self.data.sma_slow, period=self.p.slow_period)
+        else:
+            self.fast_ma = bt.indicators.SimpleMovingAverage(self.data.close, period=self.p.fast_period)
+            self.slow_ma = bt.indicators.SimpleMovingAverage(self.data.close, period=self.p.slow_period)
         self.crossover = bt.indicators.CrossOver(self.fast_ma, self.slow_ma)
         self.trades = []
 
@@ -37,25 +58,29 @@ class MACrossoverStrategy(bt.Strategy):
         elif self.position and self.crossover < 0:
             self.order = self.sell(size=self.p.position_size)
 
-if __name__ == '__main__':
+def run_backtest():
     cerebro = bt.Cerebro()
     cerebro.addstrategy(MACrossoverStrategy)
 
-    df = pd.read_csv('dataset/nifty_data_with_indicators.csv', parse_dates=['Date'])
-    df.set_index('Date', inplace=True)
-    data = bt.feeds.PandasData(dataname=df)
+    df = load_frame(DATA_PATH)
+    data = IndicatorPandasData(dataname=df)
 
     cerebro.adddata(data)
-    cerebro.broker.setcash(1000000)
-    cerebro.broker.setcommission(commission=0.001)
+    cerebro.broker.setcash(INITIAL_CASH)
+    cerebro.broker.setcommission(commission=COMMISSION)
 
-    print(f"Starting Capital: ₹{cerebro.broker.getvalue():.2f}")
     results = cerebro.run()
-    final_value = cerebro.broker.getvalue()
+    return {'final_value': cerebro.broker.getvalue(), 'trades': results[0].trades}
+
+if __name__ == '__main__':
+    print(f"Starting Capital: ₹{INITIAL_CASH:.2f}")
+    # Served from the backtest cache when the data, strategy and settings are unchanged
+    result = memoized(run_backtest, DATA_PATH, MACrossoverStrategy,
+                      settings={'cash': INITIAL_CASH, 'commission': COMMISSION})
+    final_value = result['final_value']
     print(f"Final Portfolio Value: ₹{final_value:.2f}")
 
-    strategy = results[0]
-    trades_df = pd.DataFrame(strategy.trades)
+    trades_df = pd.DataFrame(result['trades'])
     trades_df.to_csv("results/ma_crossover_trades_log.csv", index=False)
 
     # Create Equity Curve
@@ -66,54 +91,35 @@ if __name__ == '__main__':
 
     # === Calculate Metrics ===
     if not equity_df.empty:
-        start_val = equity_df['Portfolio Value'].iloc[0]
-        end_val = equity_df['Portfolio Value'].iloc[-1]
-        years = (equity_df.index[-1] - equity_df.index[0]).days / 365.25
+        values = equity_df['Portfolio Value'].to_numpy()
+        start_val = values[0]
+        end_val = values[-1]
+        years = calendar_years(equity_df.index)
 
         # CAGR
-        cagr = (end_val / start_val) ** (1 / years) - 1 if years > 0 else 0
+        growth = cagr(start_val, end_val, years) if years > 0 else 0
 
         # Max Drawdown
-        rolling_max = equity_df['Portfolio Value'].cummax()
-        drawdown = equity_df['Portfolio Value'] / rolling_max - 1
-        max_drawdown = drawdown.min()
+        max_dd = max_drawdown(values)
 
         # Print Summary
         print("\n--- Strategy Performance Summary ---")
         print(f"Starting Capital      : ₹{start_val:,.2f}")
         print(f"Final Portfolio Value : ₹{end_val:,.2f}")
         print(f"Net Profit/Loss       : ₹{end_val - start_val:,.2f}")
-        print(f"CAGR                  : {cagr * 100:.2f}%")
-        print(f"Max Drawdown          : {max_drawdown * 100:.2f}%")
+        print(f"CAGR                  : {growth * 100:.2f}%")
+        print(f"Max Drawdown          : {max_dd * 100:.2f}%")
         print(f"Total Trades Executed : {len(trades_df)}")
 
         pnl = end_val - start_val
         print(f"Net PnL: ₹{pnl:.2f}")
         print(f"Total Trades: {len(trades_df)}")
-        wins = 0
-        losses = 0
-        position_open = False
-        entry_price = 0.0
-
-        for i, row in trades_df.iterrows():
-            if row['Action'] == 'BUY':
-                entry_price = row['Price']
-                position_open = True
-            elif row['Action'] == 'SELL' and position_open:
-                exit_price = row['Price']
-                pnl = exit_price - entry_price
-                if pnl > 0:
-                    wins += 1
-                else:
-                    losses += 1
-                position_open = False
-
-        total_closed_trades = wins + losses
-        win_rate = (wins / total_closed_trades) * 100 if total_closed_trades > 0 else 0.0
-
-        print(f"Winning Trades         : {wins}")
-        print(f"Losing Trades          : {losses}")
-        print(f"Win Rate               : {win_rate:.2f}%")
+        entries, exits = round_trips(trades_df['Action'].to_numpy(), trades_df['Price'].to_numpy())
+        stats = trade_stats(exits - entries)
+
+        print(f"Winning Trades         : {stats['wins']}")
+        print(f"Losing Trades          : {stats['losses']}")
+        print(f"Win Rate               : {stats['win_rate']:.2f}%")
         # Equity curve
         equity_df['Portfolio Value'].plot(figsize=(12, 6), title='Equity Curve - MA Crossover')
         plt.xlabel("Date")
@@ -3,6 +3,13 @@ import backtrader as bt
 import pandas as pd
 import matplotlib.pyplot as plt
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backtest_memo import memoized
+from dataset_store import load_frame
+from metrics import cagr, calendar_years
+from trade_ledger import ledger_equity
 
 # ==== Configuration ====
 FAST = 16
@@ -12,9 +19,7 @@ TRADE_SIZE = 21
 MIN_DAYS_BETWEEN_TRADES = 2
 INITIAL_CASH = 1_000_000
 RESULTS_DIR = "results"
-
-# Ensure results folder exists
-os.makedirs(RESULTS_DIR, exist_ok=True)
+DATA_PATH = "dataset/nifty_data_clean.csv"
 
 # ==== Define Strategy ====
 class MACDStrategy(bt.Strategy):
@@ -67,67 +72,52 @@ class MACDStrategy(bt.Strategy):
         if order.status in [order.Completed, order.Canceled, order.Rejected]:
             self.order = None
 
-    def stop(self):
-        df = pd.DataFrame(self.trade_log)
-        df.to_csv(f"{RESULTS_DIR}/macd_trades_log.csv", index=False)
-        print(f"Trade log saved to {RESULTS_DIR}/macd_trades_log.csv")
-
-# ==== Load Data ====
-data = pd.read_csv("dataset/nifty_data_clean.csv", parse_dates=["Date"])
-data.set_index("Date", inplace=True)
-datafeed = bt.feeds.PandasData(dataname=data)
-
 # ==== Run Backtest ====
-cerebro = bt.Cerebro()
-cerebro.broker.setcash(INITIAL_CASH)
-cerebro.broker.set_coc(True)  # Cheat-on-close enabled
-cerebro.adddata(datafeed)
-cerebro.addstrategy(MACDStrategy)
-results = cerebro.run()
-strat = results[0]
-
-# ==== Recalculate Final Value Optimizer Style ====
-price_series = data['Close']
-cash = INITIAL_CASH
-position = 0
-equity_curve = []
-
-for date, price in price_series.items():
-    trades_today = [t for t in strat.trade_log if t['date'] == date.date().isoformat()]
-    for trade in trades_today:
-        if trade['action'] == "BUY":
-            cost = trade['price'] * trade['size']
-            if cash >= cost:
-                cash -= cost
-                position += trade['size']
-        elif trade['action'] == "SELL":
-            proceeds = trade['price'] * trade['size']
-            cash += proceeds
-            position -= trade['size']
-    portfolio_value = cash + position * price
-    equity_curve.append((date, portfolio_value))
-
-# ==== Compute CAGR ====
-start_value = INITIAL_CASH
-end_value = equity_curve[-1][1]
-n_years = (equity_curve[-1][0] - equity_curve[0][0]).days / 365.25
-cagr = ((end_value / start_value) ** (1 / n_years)) - 1
-
-print(f"Initial Capital      : ₹{INITIAL_CASH:,.2f}")
-print(f"Final Portfolio Value: ₹{end_value:,.2f}")
-print(f"CAGR                 : {cagr*100:.2f}%")
-
-# ==== Save Equity Curve ====
-df_equity = pd.DataFrame(equity_curve, columns=["Date", "PortfolioValue"])
-df_equity.set_index("Date", inplace=True)
-plt.figure(figsize=(12, 6))
-plt.plot(df_equity.index, df_equity["PortfolioValue"], label="MACD Optimized Strategy")
-plt.title("Equity Curve - Optimizer Aligned MACD Strategy")
-plt.xlabel("Date")
-plt.ylabel("Portfolio Value (INR)")
-plt.grid(True)
-plt.legend()
-plt.tight_layout()
-plt.savefig(f"{RESULTS_DIR}/macd_equity_curve.png")
-plt.close()
-print(f"Equity curve saved to {RESULTS_DIR}/macd_equity_curve.png")
+def run_backtest():
+    data = load_frame(DATA_PATH)
+    cerebro = bt.Cerebro()
+    cerebro.broker.setcash(INITIAL_CASH)
+    cerebro.broker.set_coc(True)  # Cheat-on-close enabled
+    cerebro.adddata(bt.feeds.PandasData(dataname=data))
+    cerebro.addstrategy(MACDStrategy)
+    results = cerebro.run()
+    return results[0].trade_log
+
+if __name__ == '__main__':
+    # Ensure results folder exists
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    data = load_frame(DATA_PATH)
+
+    # Served from the backtest cache when the data, strategy and settings are unchanged
+    trade_log = memoized(run_backtest, DATA_PATH, MACDStrategy, settings={'cash': INITIAL_CASH, 'coc': True})
+    pd.DataFrame(trade_log).to_csv(f"{RESULTS_DIR}/macd_trades_log.csv", index=False)
+    print(f"Trade log saved to {RESULTS_DIR}/macd_trades_log.csv")
+
+    # ==== Recalculate Final Value Optimizer Style ====
+    # Replays the trade log at the logged prices, without commission
+    trades = pd.DataFrame(trade_log, columns=['date', 'action', 'price', 'size'])
+    equity_curve = ledger_equity(data.index, data['Close'], trades['date'], trades['action'],
+                                 trades['price'], trades['size'], INITIAL_CASH)
+
+    # ==== Compute CAGR ====
+    start_value = INITIAL_CASH
+    end_value = equity_curve[-1]
+    growth = cagr(start_value, end_value, calendar_years(data.index))
+
+    print(f"Initial Capital      : ₹{INITIAL_CASH:,.2f}")
+    print(f"Final Portfolio Value: ₹{end_value:,.2f}")
+    print(f"CAGR                 : {growth*100:.2f}%")
+
+    # ==== Save Equity Curve ====
+    df_equity = pd.DataFrame({"PortfolioValue": equity_curve}, index=data.index)
+    plt.figure(figsize=(12, 6))
+    plt.plot(df_equity.index, df_equity["PortfolioValue"], label="MACD Optimized Strategy")
+    plt.title("Equity Curve - Optimizer Aligned MACD Strategy")
+    plt.xlabel("Date")
+    plt.ylabel("Portfolio Value (INR)")
+    plt.grid(True)
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(f"{RESULTS_DIR}/macd_equity_curve.png")
+    plt.close()
+    print(f"Equity curve saved to {RESULTS_DIR}/macd_equity_curve.png")
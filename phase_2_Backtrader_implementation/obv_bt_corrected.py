@@ -3,19 +3,12 @@ import backtrader as bt
 import pandas as pd
 import matplotlib.pyplot as plt
 import os
+import sys
 
-# === Custom OBV Indicator ===
-class OBV(bt.Indicator):
-    lines = ('obv',)
-    plotinfo = dict(subplot=True)
-
-    def __init__(self):
-        self.lines.obv = bt.If(self.data.close > self.data.close(-1),
-                               self.data.volume,
-                               bt.If(self.data.close < self.data.close(-1),
-                                     -self.data.volume,
-                                     0))
-        self.lines.obv = bt.indicators.SumN(self.lines.obv, period=len(self.data))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bt_indicators import OBV
+from dataset_store import load_frame
+from metrics import cagr, calendar_years
 
 # === OBV Strategy ===
 class OBVStrategy(bt.Strategy):
@@ -66,8 +59,7 @@ cerebro = bt.Cerebro()
 cerebro.broker.setcash(1_000_000)
 
 # Load data
-df = pd.read_csv("dataset/nifty_data_clean.csv", parse_dates=["Date"])
-df.set_index("Date", inplace=True)
+df = load_frame("dataset/nifty_data_clean.csv")
 data = bt.feeds.PandasData(dataname=df)
 
 cerebro.adddata(data)
@@ -80,15 +72,12 @@ final_value = cerebro.broker.getvalue()
 
 # Calculate CAGR
 start_value = 1_000_000
-start_date = df.index[0]
-end_date = df.index[-1]
-n_years = (end_date - start_date).days / 365.25
-cagr = ((final_value / start_value) ** (1 / n_years)) - 1
+growth = cagr(start_value, final_value, calendar_years(df.index))
 
 # Output results
 print(f"Initial Capital      : ₹{start_value:,.2f}")
 print(f"Final Portfolio Value: ₹{final_value:,.2f}")
-print(f"CAGR                 : {cagr * 100:.2f}%")
+print(f"CAGR                 : {growth * 100:.2f}%")
 
 # Save results
 os.makedirs("results", exist_ok=True)
@@ -3,19 +3,15 @@ import backtrader as bt
 import pandas as pd
 import matplotlib.pyplot as plt
 import os
+import sys
 
-# === Custom OBV Indicator ===
-class OBV(bt.Indicator):
-    lines = ('obv',)
-    plotinfo = dict(subplot=True)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backtest_memo import memoized
+from bt_indicators import OBV
+from dataset_store import load_frame
+from metrics import cagr, calendar_years
 
-    def __init__(self):
-        self.lines.obv = bt.If(self.data.close > self.data.close(-1),
-                               self.data.volume,
-                               bt.If(self.data.close < self.data.close(-1),
-                                     -self.data.volume,
-                                     0))
-        self.lines.obv = bt.indicators.SumN(self.lines.obv, period=len(self.data))
+DATA_PATH = "dataset/nifty_data_clean.csv"
 
 # === OBV Strategy with Equity Tracking ===
 class OBVStrategy(bt.Strategy):
@@ -65,44 +61,45 @@ class TradeLogger(bt.Analyzer):
         return self.trades
 
 # Backtest Setup
-cerebro = bt.Cerebro()
-cerebro.broker.setcash(1_000_000)
-
-# Load data
-df = pd.read_csv("dataset/nifty_data_clean.csv", parse_dates=["Date"])
-df.set_index("Date", inplace=True)
-data = bt.feeds.PandasData(dataname=df)
-
-cerebro.adddata(data)
-cerebro.addstrategy(OBVStrategy)
-cerebro.addanalyzer(TradeLogger, _name='trade_logger')
-
-results = cerebro.run()
-strat = results[0]
-final_value = cerebro.broker.getvalue()
-
-# Calculate CAGR
-start_value = 1_000_000
-start_date = df.index[0]
-end_date = df.index[-1]
-n_years = (end_date - start_date).days / 365.25
-cagr = ((final_value / start_value) ** (1 / n_years)) - 1
-
-# Output results
-print(f"Initial Capital      : ₹{start_value:,.2f}")
-print(f"Final Portfolio Value: ₹{final_value:,.2f}")
-print(f"CAGR                 : {cagr * 100:.2f}%")
-
-# Save results
-os.makedirs("results", exist_ok=True)
-pd.DataFrame(strat.analyzers.trade_logger.get_analysis()).to_csv("results/obv_trades_log.csv", index=False)
-
-# Plot equity curve manually
-plt.figure(figsize=(10, 5))
-plt.plot(strat.portfolio_values)
-plt.title("Equity Curve - OBV Strategy (Manual Tracking)")
-plt.xlabel("Time Step")
-plt.ylabel("Portfolio Value")
-plt.grid(True)
-plt.savefig("results/obv_equity_curve.png")
-plt.close()
+def run_backtest():
+    df = load_frame(DATA_PATH)
+    cerebro = bt.Cerebro()
+    cerebro.broker.setcash(1_000_000)
+    cerebro.adddata(bt.feeds.PandasData(dataname=df))
+    cerebro.addstrategy(OBVStrategy)
+    cerebro.addanalyzer(TradeLogger, _name='trade_logger')
+
+    results = cerebro.run()
+    strat = results[0]
+    return {'final_value': cerebro.broker.getvalue(), 'trades': strat.analyzers.trade_logger.get_analysis(),
+            'portfolio_values': strat.portfolio_values}
+
+if __name__ == '__main__':
+    df = load_frame(DATA_PATH)
+
+    # Run, or reuse the cached result when the data, strategy and settings are unchanged
+    result = memoized(run_backtest, DATA_PATH, OBVStrategy, settings={'cash': 1_000_000})
+    final_value = result['final_value']
+
+    # Calculate CAGR
+    start_value = 1_000_000
+    growth = cagr(start_value, final_value, calendar_years(df.index))
+
+    # Output results
+    print(f"Initial Capital      : ₹{start_value:,.2f}")
+    print(f"Final Portfolio Value: ₹{final_value:,.2f}")
+    print(f"CAGR                 : {growth * 100:.2f}%")
+
+    # Save results
+    os.makedirs("results", exist_ok=True)
+    pd.DataFrame(result['trades']).to_csv("results/obv_trades_log.csv", index=False)
+
+    # Plot equity curve manually
+    plt.figure(figsize=(10, 5))
+    plt.plot(result['portfolio_values'])
+    plt.title("Equity Curve - OBV Strategy (Manual Tracking)")
+    plt.xlabel("Time Step")
+    plt.ylabel("Portfolio Value")
+    plt.grid(True)
+    plt.savefig("results/obv_equity_curve.png")
+    plt.close()
@@ -2,6 +2,14 @@ import backtrader as bt
 import pandas as pd
 import os
 import matplotlib.pyplot as plt
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backtest_memo import memoized
+from dataset_store import load_frame
+from metrics import cagr, calendar_years
+
+DATA_PATH = "dataset/nifty_data_clean.csv"
 
 # === Strategy ===
 class RSIStrategy(bt.Strategy):
@@ -51,45 +59,45 @@ class TradeLogger(bt.Analyzer):
         return self.trades
 
 # === Backtest Setup ===
-cerebro = bt.Cerebro()
-cerebro.broker.setcash(1_000_000)
-
-# Load data
-df = pd.read_csv("dataset/nifty_data_clean.csv", parse_dates=["Date"])
-df.set_index("Date", inplace=True)
-data = bt.feeds.PandasData(dataname=df)
-
-cerebro.adddata(data)
-cerebro.addstrategy(RSIStrategy)
-cerebro.addanalyzer(TradeLogger, _name='trade_logger')
-
-# Run
-results = cerebro.run()
-strat = results[0]
-final_value = cerebro.broker.getvalue()
-
-# Calculate CAGR
-start_value = 1_000_000
-start_date = df.index[0]
-end_date = df.index[-1]
-n_years = (end_date - start_date).days / 365.25
-cagr = ((final_value / start_value) ** (1 / n_years)) - 1
-
-# Print Results
-print(f"Initial Capital      : ₹{start_value:,.2f}")
-print(f"Final Portfolio Value: ₹{final_value:,.2f}")
-print(f"CAGR                 : {cagr * 100:.2f}%")
-
-# Save trade log
-os.makedirs("results", exist_ok=True)
-pd.DataFrame(strat.analyzers.trade_logger.get_analysis()).to_csv("results/rsi_trades_log.csv", index=False)
-
-# Save equity curve
-plt.figure(figsize=(10, 5))
-plt.plot(strat.equity_curve)
-plt.title("Equity Curve - RSI Strategy")
-plt.xlabel("Time Step")
-plt.ylabel("Portfolio Value")
-plt.grid(True)
-plt.savefig("results/rsi_equity_curve.png")
-plt.close()
+def run_backtest():
+    df = load_frame(DATA_PATH)
+    cerebro = bt.Cerebro()
+    cerebro.broker.setcash(1_000_000)
+    cerebro.adddata(bt.feeds.PandasData(dataname=df))
+    cerebro.addstrategy(RSIStrategy)
+    cerebro.addanalyzer(TradeLogger, _name='trade_logger')
+
+    results = cerebro.run()
+    strat = results[0]
+    return {'final_value': cerebro.broker.getvalue(), 'trades': strat.analyzers.trade_logger.get_analysis(),
+            'equity_curve': strat.equity_curve}
+
+if __name__ == '__main__':
+    df = load_frame(DATA_PATH)
+
+    # Run, or reuse the cached result when the data, strategy and settings are unchanged
+    result = memoized(run_backtest, DATA_PATH, RSIStrategy, settings={'cash': 1_000_000})
+    final_value = result['final_value']
+
+    # Calculate CAGR
+    start_value = 1_000_000
+    growth = cagr(start_value, final_value, calendar_years(df.index))
+
+    # Print Results
+    print(f"Initial Capital      : ₹{start_value:,.2f}")
+    print(f"Final Portfolio Value: ₹{final_value:,.2f}")
+    print(f"CAGR                 : {growth * 100:.2f}%")
+
+    # Save trade log
+    os.makedirs("results", exist_ok=True)
+    pd.DataFrame(result['trades']).to_csv("results/rsi_trades_log.csv", index=False)
+
+    # Save equity curve
+    plt.figure(figsize=(10, 5))
+    plt.plot(result['equity_curve'])
+    plt.title("Equity Curve - RSI Strategy")
+    plt.xlabel("Time Step")
+    plt.ylabel("Portfolio Value")
+    plt.grid(True)
+    plt.savefig("results/rsi_equity_curve.png")
+    plt.close()
@@ -0,0 +1,238 @@
+import argparse
+import glob
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from dataset_store import load_frame
+from indicators import rolling_mean_std, wilder_rsi
+from metrics import calendar_years, cagr
+
+# Multi-symbol backtest with one shared cash pool. Prices are held as
+# (symbols x bars) panels, and each bar is one vectorized step across all
+# symbols: pending orders fill at the open, then the rule's entries and exits
+# are evaluated on the close, as Backtrader market orders behave. New entries
+# compete for cash in order of signal strength, each sized to a fixed share of
+# the portfolio value (position_budget) or a fixed number of shares.
+
+DATA_DIR = "dataset/constituents"
+INITIAL_CASH = 1_000_000
+
+Panel = namedtuple("Panel", "symbols index open close")
+
+
+# ==== Data ====
+def load_panel(csv_paths):
+    # One CSV per symbol (named after the file), aligned on the union of their
+    # dates; bars where a symbol doesn't trade are NaN
+    frames = {os.path.splitext(os.path.basename(path))[0]: load_frame(path) for path in sorted(csv_paths)}
+    index = frames[next(iter(frames))].index
+    for df in frames.values():
+        index = index.union(df.index)
+    open_ = np.vstack([df["Open"].reindex(index).to_numpy(dtype=float) for df in frames.values()])
+    close = np.vstack([df["Close"].reindex(index).to_numpy(dtype=float) for df in frames.values()])
+    return Panel(list(frames), index, open_, close)
+
+
+def synthetic_panel(n_symbols=50, n_bars=2500, seed=0):
+    # Seeded daily random walks sharing a market factor, for when constituent
+    # data isn't available
+    rng = np.random.default_rng(seed)
+    market = rng.normal(0.0003, 0.009, n_bars)
+    beta = rng.uniform(0.6, 1.4, (n_symbols, 1))
+    returns = beta * market + rng.normal(0, 0.012, (n_symbols, n_bars))
+    close = rng.uniform(200, 4000, (n_symbols, 1)) * np.exp(np.cumsum(returns, axis=1))
+    open_ = np.empty_like(close)
+    open_[:, 0] = close[:, 0]
+    open_[:, 1:] = close[:, :-1] * (1 + rng.normal(0, 0.003, (n_symbols, n_bars - 1)))
+    index = pd.bdate_range("2015-01-01", periods=n_bars, name="Date")
+    return Panel([f"SYM{i:02d}" for i in range(n_symbols)], index, open_, close)
+
+
+def per_symbol(values, func, outputs=1):
+    # Applies a 1-D indicator kernel to every row over the bars the symbol
+    # actually trades, leaving NaN elsewhere. A kernel returning several
+    # series (outputs > 1) gives one array per series.
+    out = np.full((outputs,) + values.shape, np.nan)
+    for row, series in enumerate(values):
+        valid = ~np.isnan(series)
+        if valid.all():
+            out[:, row] = func(series)
+        elif valid.any():
+            out[:, row, valid] = func(series[valid])
+    return out[0] if outputs == 1 else tuple(out)
+
+
+# ==== Rules ====
+class BollingerRule:
+    # Buy below the lower band; sell above the SMA, at the profit target or
+    # after max_hold_bars. Deeper closes below the band are filled first.
+    name = "Bollinger"
+
+    def __init__(self, period=20, devfactor=2.0, profit_target=0.03, max_hold_bars=15):
+        self.period = period
+        self.devfactor = devfactor
+        self.profit_target = profit_target
+        self.max_hold_bars = max_hold_bars
+
+    def prepare(self, close):
+        self.mid, std = per_symbol(close, lambda c: rolling_mean_std(c, self.period), outputs=2)
+        self.lower = self.mid - self.devfactor * std
+        with np.errstate(invalid="ignore"):
+            self.entry = close < self.lower
+            self.score = (close - self.lower) / close
+
+    def exits(self, t, close, entry_price, entry_bar):
+        with np.errstate(invalid="ignore"):
+            gain_pct = (close - entry_price) / entry_price
+            return (close > self.mid[:, t]) | (gain_pct >= self.profit_target) | \
+                   (t - entry_bar >= self.max_hold_bars)
+
+
+class RSIRule:
+    # Buy when RSI drops below buy_threshold, sell above sell_threshold.
+    # The most oversold symbols are filled first.
+    name = "RSI"
+
+    def __init__(self, period=21, buy_threshold=40, sell_threshold=80):
+        self.period = period
+        self.buy_threshold = buy_threshold
+        self.sell_threshold = sell_threshold
+
+    def prepare(self, close):
+        self.rsi = per_symbol(close, lambda c: wilder_rsi(c, self.period))
+        with np.errstate(invalid="ignore"):
+            self.entry = self.rsi < self.buy_threshold
+        self.score = self.rsi
+
+    def exits(self, t, close, entry_price, entry_bar):
+        with np.errstate(invalid="ignore"):
+            return self.rsi[:, t] > self.sell_threshold
+
+
+RULES = {"bollinger": BollingerRule, "rsi": RSIRule}
+
+
+# ==== Portfolio simulation ====
+def run_portfolio(panel, rule, initial_cash=INITIAL_CASH, position_budget=0.05, position_size=None,
+                  max_positions=None, commission=0.001):
+    # Returns (equity, trades). equity is the bar-by-bar portfolio value;
+    # trades is a DataFrame with one row per fill.
+    open_, close = panel.open, panel.close
+    n_symbols, n_bars = close.shape
+    rule.prepare(close)
+    # Positions in symbols without a bar are valued at their last close
+    mark = np.nan_to_num(pd.DataFrame(close).ffill(axis=1).to_numpy())
+
+    cash = float(initial_cash)
+    value = cash
+    shares = np.zeros(n_symbols, dtype=np.int64)
+    entry_price = np.full(n_symbols, np.nan)
+    entry_bar = np.zeros(n_symbols, dtype=np.int64)
+    signal_price = np.full(n_symbols, np.nan)
+    pending_buy = np.zeros(n_symbols, dtype=bool)
+    pending_sell = np.zeros(n_symbols, dtype=bool)
+    equity = np.empty(n_bars)
+    fills = []
+
+    for t in range(n_bars):
+        price = open_[:, t]
+        tradable = ~np.isnan(price)
+
+        # Exits first, so their proceeds are available to this bar's entries
+        sell = np.flatnonzero(pending_sell & tradable)
+        if len(sell):
+            proceeds = shares[sell] * price[sell]
+            comm = commission * proceeds
+            cash += (proceeds - comm).sum()
+            fills.append((t, sell, -shares[sell], price[sell], comm))
+            shares[sell] = 0
+
+        buy = np.flatnonzero(pending_buy & tradable)
+        if len(buy):
+            buy = buy[np.argsort(rule.score[buy, t - 1], kind="stable")]
+            if max_positions is not None:
+                buy = buy[:max(max_positions - np.count_nonzero(shares), 0)]
+            if position_size is None:
+                size = np.floor(position_budget * value / price[buy]).astype(np.int64)
+            else:
+                size = np.full(len(buy), position_size, dtype=np.int64)
+            cost = size * price[buy]
+            comm = commission * cost
+            # Fill in priority order against the cash left by the orders before;
+            # an order that doesn't fit is rejected and the rest still get a go
+            fits = np.zeros(len(buy), dtype=bool)
+            for k, total in enumerate((cost + comm).tolist()):
+                if size[k] > 0 and total <= cash:
+                    fits[k] = True
+                    cash -= total
+            buy, size, comm = buy[fits], size[fits], comm[fits]
+            if len(buy):
+                shares[buy] = size
+                entry_price[buy] = signal_price[buy]
+                fills.append((t, buy, size, price[buy], comm))
+
+        # Orders not filled this bar (symbol not trading) are dropped; the
+        # rule re-signals on the close if it still applies
+        held = shares > 0
+        pending_sell = held & rule.exits(t, close[:, t], entry_price, entry_bar)
+        pending_buy = ~held & rule.entry[:, t]
+        signal_price = np.where(pending_buy, close[:, t], signal_price)
+        entry_bar = np.where(pending_buy, t, entry_bar)
+
+        value = cash + shares @ mark[:, t]
+        equity[t] = value
+
+    trades = pd.DataFrame([
+        {'Date': panel.index[t], 'Symbol': panel.symbols[s], 'Action': 'BUY' if n > 0 else 'SELL',
+         'Size': abs(int(n)), 'Price': p, 'Commission': c}
+        for t, symbols, sizes, prices, comms in fills
+        for s, n, p, c in zip(symbols, sizes, prices, comms)
+    ], columns=['Date', 'Symbol', 'Action', 'Size', 'Price', 'Commission'])
+    return equity, trades
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the mean-reversion rules across many symbols")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="folder with one CSV per symbol")
+    parser.add_argument("--synthetic", type=int, metavar="SYMBOLS",
+                        help="use a synthetic panel of this many symbols instead of --data-dir")
+    parser.add_argument("--bars", type=int, default=2500, help="bars per synthetic symbol")
+    parser.add_argument("--rules", nargs="+", choices=list(RULES), default=list(RULES))
+    parser.add_argument("--budget", type=float, default=0.05, help="fraction of portfolio value per position")
+    parser.add_argument("--size", type=int, help="fixed shares per position instead of --budget")
+    parser.add_argument("--max-positions", type=int)
+    parser.add_argument("--save", action="store_true", help="write trade logs and equity curves to results/")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.synthetic:
+        panel = synthetic_panel(args.synthetic, args.bars)
+    else:
+        paths = glob.glob(os.path.join(args.data_dir, "*.csv"))
+        if not paths:
+            parser.error(f"no CSV files in {args.data_dir}; use --synthetic 50 to try a generated panel")
+        panel = load_panel(paths)
+    print(f"Panel: {len(panel.symbols)} symbols x {len(panel.index)} bars "
+          f"(loaded in {time.perf_counter() - start:.2f}s)\n")
+
+    years = calendar_years(panel.index)
+    print(f"{'Rule':<12}{'Final Value':>16}{'CAGR':>9}{'Trades':>8}{'Time (s)':>10}")
+    for name in args.rules:
+        rule = RULES[name]()
+        start = time.perf_counter()
+        equity, trades = run_portfolio(panel, rule, position_budget=args.budget, position_size=args.size,
+                                       max_positions=args.max_positions)
+        elapsed = time.perf_counter() - start
+        growth = cagr(INITIAL_CASH, equity[-1], years)
+        print(f"{rule.name:<12}{equity[-1]:>16,.2f}{growth * 100:>8.2f}%{len(trades):>8}{elapsed:>10.2f}")
+        if args.save:
+            trades.to_csv(f"results/portfolio_{name}_trades_log.csv", index=False)
+            pd.Series(equity, index=panel.index, name="Equity").to_csv(f"results/portfolio_{name}_equity.csv")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+import argparse
+import atexit
+import functools
+import json
+import multiprocessing
+import os
+import platform
+import runpy
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+# Opt-in per-phase profiling for the backtest scripts and optimizers.
+#
+# With BACKTEST_PROFILE set, every phase of a run (data load, indicators, the
+# bar loop, the Cerebro run, metrics, plotting, saving) records its wall time,
+# bars per second where the bar count is known, and tracemalloc memory: net
+# bytes allocated, peak bytes above the phase's starting point and the change
+# in allocated blocks. At exit the run is written as JSON: Chrome trace events
+# (open the file in Perfetto or chrome://tracing), a per-phase summary and the
+# largest live allocation sites; the summary is also printed to stderr.
+# tracemalloc slows allocation-heavy code such as Cerebro runs several times
+# over; BACKTEST_PROFILE_MEMORY=0 (--no-memory) keeps the wall times honest
+# and records only the block counts.
+#
+#   BACKTEST_PROFILE=1 python phase_2_Backtrader_implementation/ma_crossover_bt.py
+#   python profiling.py --out results/ma.json phase_2_Backtrader_implementation/ma_crossover_bt.py
+#
+# BACKTEST_PROFILE=1 writes results/profile_<script>.json, any other value is
+# the output path. Library code marks its phases with phase() / profiled() /
+# loop(); Cerebro.run, plt.savefig / plt.show, pd.read_csv and
+# DataFrame.to_csv are wrapped only while profiling. Unset, phase() hands out
+# one shared no-op context manager and profiled() / loop() return what they
+# were given, so nothing is timed or traced. Only the main process is
+# profiled; optimizer worker processes are not.
+
+PROFILE_ENV = "BACKTEST_PROFILE"
+MEMORY_ENV = "BACKTEST_PROFILE_MEMORY"
+OFF = ("", "0", "false", "no")
+PROFILE_DIR = "results"
+TOP_ALLOCATIONS = 10
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    __slots__ = ("profiler", "name", "path", "bars", "start", "memory", "peak", "blocks")
+
+    def __init__(self, profiler, name, bars):
+        self.profiler = profiler
+        self.name = name
+        self.bars = bars
+
+    def __enter__(self):
+        self.profiler._enter(self)
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler._exit(self)
+        return False
+
+
+class Profiler:
+    def __init__(self, path, memory=True):
+        self.path = path
+        self.memory = memory
+        self.stack = []
+        self.events = []
+        self.peak = 0
+        self.started = datetime.now().isoformat(timespec="seconds")
+        if memory:
+            # Allocations made before this point (mostly imports) aren't traced
+            tracemalloc.start()
+        self.origin = time.perf_counter()
+
+    def _traced(self):
+        # (current, peak) traced bytes, zeros without memory tracing
+        return tracemalloc.get_traced_memory() if self.memory else (0, 0)
+
+    def _enter(self, ph):
+        # reset_peak() below would lose the run's and the parent's peak so far
+        peak = self._traced()[1]
+        self.peak = max(self.peak, peak)
+        if self.stack:
+            self.stack[-1].peak = max(self.stack[-1].peak, peak)
+        ph.path = "/".join([p.name for p in self.stack] + [ph.name])
+        self.stack.append(ph)
+        if self.memory:
+            tracemalloc.reset_peak()
+        ph.memory = ph.peak = self._traced()[0]
+        ph.blocks = sys.getallocatedblocks()
+        ph.start = time.perf_counter()
+
+    def _exit(self, ph):
+        end = time.perf_counter()
+        memory, peak = self._traced()
+        ph.peak = max(ph.peak, peak)
+        # A loop() phase whose generator is dropped early may close out of order
+        self.stack.remove(ph)
+        if self.stack:
+            self.stack[-1].peak = max(self.stack[-1].peak, ph.peak)
+        self.events.append({
+            "name": ph.name,
+            "path": ph.path,
+            "start_s": ph.start - self.origin,
+            "wall_s": end - ph.start,
+            "bars": ph.bars,
+            "alloc_bytes": memory - ph.memory if self.memory else None,
+            "peak_bytes": ph.peak - ph.memory if self.memory else None,
+            "net_blocks": sys.getallocatedblocks() - ph.blocks,
+        })
+
+    def summary(self, total):
+        # One row per phase path, heaviest first, plus the time outside any phase
+        rows = {}
+        for event in self.events:
+            row = rows.setdefault(event["path"], {"phase": event["path"], "calls": 0, "wall_s": 0.0,
+                                                  "bars": None, "alloc_bytes": 0, "peak_bytes": 0,
+                                                  "net_blocks": 0})
+            row["calls"] += 1
+            row["wall_s"] += event["wall_s"]
+            if event["bars"] is not None:
+                row["bars"] = (row["bars"] or 0) + event["bars"]
+            if self.memory:
+                row["alloc_bytes"] += event["alloc_bytes"]
+                row["peak_bytes"] = max(row["peak_bytes"], event["peak_bytes"])
+            else:
+                row["alloc_bytes"] = row["peak_bytes"] = None
+            row["net_blocks"] += event["net_blocks"]
+        for row in rows.values():
+            row["bars_per_sec"] = row["bars"] / row["wall_s"] if row["bars"] and row["wall_s"] else None
+        top_level = sum(row["wall_s"] for row in rows.values() if "/" not in row["phase"])
+        rows["(other)"] = {"phase": "(other)", "calls": 1, "wall_s": max(total - top_level, 0.0),
+                           "bars": None, "alloc_bytes": None, "peak_bytes": None, "net_blocks": None,
+                           "bars_per_sec": None}
+        return sorted(rows.values(), key=lambda row: row["wall_s"], reverse=True)
+
+    def report(self):
+        total = time.perf_counter() - self.origin
+        # Close phases left open by an exception or sys.exit() inside them
+        while self.stack:
+            self._exit(self.stack[-1])
+        top, peak = [], None
+        if self.memory:
+            top = tracemalloc.take_snapshot().statistics("lineno")[:TOP_ALLOCATIONS]
+            peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+        pid = os.getpid()
+        trace_events = [{
+            "name": event["name"], "cat": "phase", "ph": "X", "pid": pid, "tid": 0,
+            "ts": event["start_s"] * 1e6, "dur": event["wall_s"] * 1e6,
+            "args": {key: event[key] for key in ("bars", "alloc_bytes", "peak_bytes", "net_blocks")},
+        } for event in self.events]
+        phases = self.summary(total)
+        report = {
+            "traceEvents": sorted(trace_events, key=lambda event: event["ts"]),
+            "displayTimeUnit": "ms",
+            "otherData": {"script": sys.argv[0], "argv": sys.argv[1:], "started": self.started,
+                          "python": platform.python_version(), "total_s": total, "peak_bytes": peak},
+            "phases": phases,
+            "top_allocations": [{"where": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                                 "size_bytes": stat.size, "count": stat.count} for stat in top],
+        }
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "w") as f:
+            json.dump(report, f, indent=1)
+
+        traced = f", peak traced {peak / 2**20:.1f} MB" if peak is not None else ""
+        print(f"\nProfile written to {self.path} ({total:.3f}s total{traced})", file=sys.stderr)
+        print(f"{'Phase':<36}{'Calls':>7}{'Wall (s)':>11}{'Bars/sec':>13}{'Alloc (MB)':>12}{'Peak (MB)':>11}",
+              file=sys.stderr)
+        for row in phases:
+            rate = f"{row['bars_per_sec']:,.0f}" if row["bars_per_sec"] else "-"
+            alloc = f"{row['alloc_bytes'] / 2**20:.2f}" if row["alloc_bytes"] is not None else "-"
+            peak_mb = f"{row['peak_bytes'] / 2**20:.2f}" if row["peak_bytes"] is not None else "-"
+            print(f"{row['phase']:<36}{row['calls']:>7}{row['wall_s']:>11.4f}{rate:>13}{alloc:>12}{peak_mb:>11}",
+                  file=sys.stderr)
+
+
+_profiler = None
+
+
+def enabled():
+    return _profiler is not None
+
+
+def phase(name, bars=None):
+    # Context manager timing one phase; bars (if known) gives bars per second.
+    # Re-entering the innermost phase's name (a kernel calling another kernel)
+    # is folded into it.
+    if _profiler is None or (_profiler.stack and _profiler.stack[-1].name == name):
+        return _NULL_PHASE
+    return _Phase(_profiler, name, bars)
+
+
+def profiled(name):
+    # Decorator running every call of the function as phase `name`
+    def decorate(func):
+        if _profiler is None:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def loop(name, iterable, bars=None):
+    # Times a for loop over iterable, body included, as phase `name`
+    if _profiler is None:
+        return iterable
+    return _timed_loop(name, iterable, bars)
+
+
+def _timed_loop(name, iterable, bars):
+    with phase(name, bars):
+        yield from iterable
+
+
+def _wrap(owner, attr, name):
+    func = getattr(owner, attr)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with phase(name):
+            return func(*args, **kwargs)
+    setattr(owner, attr, wrapper)
+
+
+def _wrap_cerebro_run(cerebro_cls):
+    run = cerebro_cls.run
+
+    @functools.wraps(run)
+    def wrapper(self, *args, **kwargs):
+        with phase("backtest") as ph:
+            result = run(self, *args, **kwargs)
+            if isinstance(ph, _Phase):
+                # Bars of the first feed times the strategy runs (several with optstrategy)
+                frame = self.datas[0].p.dataname if self.datas else None
+                if hasattr(frame, "__len__"):
+                    ph.bars = len(frame) * max(len(result), 1)
+        return result
+    cerebro_cls.run = wrapper
+
+
+def _install_hooks():
+    import pandas as pd
+    _wrap(pd, "read_csv", "load")
+    _wrap(pd.DataFrame, "to_csv", "save")
+    try:
+        import matplotlib.pyplot as plt
+    except ImportError:
+        pass
+    else:
+        _wrap(plt, "savefig", "plot")
+        _wrap(plt, "show", "plot")
+    try:
+        import backtrader as bt
+    except ImportError:
+        pass
+    else:
+        _wrap_cerebro_run(bt.Cerebro)
+
+
+def _output_path(setting):
+    if setting.lower() in ("1", "true", "yes"):
+        script = os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0] or "python"
+        return os.path.join(PROFILE_DIR, f"profile_{script}.json")
+    return setting
+
+
+def _start_from_env():
+    global _profiler
+    setting = os.environ.get(PROFILE_ENV, "").strip()
+    if setting.lower() in OFF or multiprocessing.parent_process() is not None:
+        return
+    # Hooks first, so importing matplotlib / backtrader isn't traced or timed
+    _install_hooks()
+    _profiler = Profiler(_output_path(setting), memory=os.environ.get(MEMORY_ENV, "1").strip().lower() not in OFF)
+    atexit.register(_profiler.report)
+
+
+_start_from_env()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a backtest script with per-phase profiling")
+    parser.add_argument("--out", help="profile JSON path (default results/profile_<script>.json)")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc for accurate wall times")
+    parser.add_argument("script")
+    parser.add_argument("args", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    # The script runs as __main__ and imports the library modules, which import
+    # `profiling` by name: a second copy of this module that starts the
+    # profiler from the environment
+    sys.argv = [args.script] + args.args
+    os.environ[PROFILE_ENV] = args.out or "1"
+    if args.no_memory:
+        os.environ[MEMORY_ENV] = "0"
+    sys.path.insert(0, os.path.dirname(os.path.abspath(args.script)))
+    import profiling  # noqa: F401  (starts the profiler)
+    runpy.run_path(args.script, run_name="__main__")
+
+
+if __name__ == "__main__":
+    main()
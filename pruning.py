@@ -0,0 +1,119 @@
+import math
+
+import numpy as np
+
+# Early termination for the optimizer backtests. A configuration stops being
+# simulated as soon as it breaks one of the enabled rules:
+#   drawdown    equity has fallen more than max_drawdown below its peak
+#   min_equity  equity is below min_equity
+#   bound       even a perfect future can't lift it above the best final
+#               value this process has completed (never prunes the winner)
+# The bound assumes at most `exposure` shares are held from here on, and that
+# they gain on every favourable move, so it is always an over-estimate.
+#
+# Pruned configurations are reported with a NaN final value, the rule that
+# stopped them and the number of bars they were simulated for.
+#
+# Which rows the bound prunes depends on what each worker happened to finish
+# first, so it changes with --workers and chunking. The result store keys
+# rows on settings(), which leaves the bound out (it never changes a
+# completed row), and storable() keeps bound-pruned rows out of the store, so
+# a resumed run evaluates them again instead of mixing in another run's.
+
+REASONS = ("", "drawdown", "min_equity", "bound")
+
+
+class Pruning:
+    def __init__(self, max_drawdown=None, min_equity=None, bound=False):
+        self.max_drawdown = max_drawdown
+        self.min_equity = min_equity
+        self.bound = bound
+        # Best completed final value; each worker process keeps its own, and
+        # it carries over from one chunk to the next
+        self.best = -math.inf
+
+    def __bool__(self):
+        return self.max_drawdown is not None or self.min_equity is not None or self.bound
+
+    def settings(self):
+        # The rules that decide a row's stored result on their own
+        return [self.max_drawdown, self.min_equity]
+
+    def check(self, value, peak, upside=math.inf):
+        # Reason the configuration should stop now ("" to keep going).
+        # upside is the most the remaining bars could add to value.
+        if self.max_drawdown is not None and value < peak * (1 - self.max_drawdown):
+            return "drawdown"
+        if self.min_equity is not None and value < self.min_equity:
+            return "min_equity"
+        if self.bound and value + upside < self.best - 1e-9 * abs(self.best):
+            return "bound"
+        return ""
+
+    def check_many(self, value, peak, upside=math.inf):
+        # Vectorized check: reason index into REASONS per row, 0 to keep going
+        reason = np.zeros(len(value), dtype=np.int64)
+        if self.bound and self.best > -math.inf:
+            reason[value + upside < self.best - 1e-9 * abs(self.best)] = 3
+        if self.min_equity is not None:
+            reason[value < self.min_equity] = 2
+        if self.max_drawdown is not None:
+            reason[value < peak * (1 - self.max_drawdown)] = 1
+        return reason
+
+    def completed(self, final_values):
+        finished = np.asarray(final_values, dtype=float)
+        finished = finished[~np.isnan(finished)]
+        if len(finished):
+            self.best = max(self.best, float(finished.max()))
+
+
+def storable(row):
+    # Whether a result row may go to the result store (see above)
+    return row.get("PRUNED") != "bound"
+
+
+def remaining_gains(close):
+    # gains[t]: sum of the up-moves after bar t, the most one long share can
+    # still make from there
+    moves = np.maximum(np.diff(np.asarray(close, dtype=float)), 0.)
+    gains = np.zeros(len(close))
+    gains[:-1] = np.cumsum(moves[::-1])[::-1]
+    return gains
+
+
+def remaining_moves(close):
+    # moves[t]: sum of absolute moves after bar t, the most one share held
+    # long or short can still make from there
+    moves = np.abs(np.diff(np.asarray(close, dtype=float)))
+    total = np.zeros(len(close))
+    total[:-1] = np.cumsum(moves[::-1])[::-1]
+    return total
+
+
+def pruning_stats(rows, n_bars):
+    # Summary over result rows carrying PRUNED / BARS_SIMULATED columns
+    reasons = [row["PRUNED"] for row in rows]
+    simulated = sum(row["BARS_SIMULATED"] for row in rows)
+    stats = {
+        "combinations": len(rows),
+        "pruned": sum(1 for reason in reasons if reason),
+        "bars_simulated": int(simulated),
+        "bars_total": int(n_bars * len(rows)),
+    }
+    for reason in REASONS[1:]:
+        stats[f"pruned_{reason}"] = reasons.count(reason)
+    stats["bars_saved_pct"] = round(100 * (1 - simulated / max(stats["bars_total"], 1)), 1)
+    return stats
+
+
+def add_pruning_args(parser):
+    parser.add_argument("--max-drawdown", type=float, help="prune at this drawdown from peak (0.05 = 5%%)")
+    parser.add_argument("--min-equity", type=float, help="prune when equity drops below this")
+    parser.add_argument("--prune-bound", action="store_true",
+                        help="prune configurations that can no longer beat the best one so far")
+
+
+def pruning_from_args(args):
+    pruning = Pruning(args.max_drawdown, args.min_equity, args.prune_bound)
+    return pruning if pruning else None
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import time
+
+from grid_search import run_grid
+
+# Append-only result store for the optimizers, so an interrupted grid resumes
+# where it stopped. Result rows go to SQLite as they arrive, keyed by a hash of
+# the optimizer name, its run context (dataset and any setting that changes
+# the numbers) and the parameter tuple. A rerun only evaluates the
+# combinations missing from the store, so extending a grid only computes the
+# new points; changing the data or the settings starts a new set of keys.
+
+STORE_PATH = "optimization/results.sqlite"
+COMMIT_INTERVAL = 1.0   # seconds; at most this much work is lost on a crash
+CHUNKS_PER_WORKER = 16  # rows reach the store as each chunk finishes
+
+
+def _to_json(value):
+    # numpy scalars in parameter tuples and result rows
+    return value.item()
+
+
+def _dumps(value):
+    return json.dumps(value, default=_to_json)
+
+
+def data_signature(path):
+    # Path, size and mtime, so a regenerated dataset is evaluated afresh
+    stat = os.stat(path)
+    return [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+
+
+class ResultStore:
+    def __init__(self, optimizer, context=None, path=STORE_PATH, fresh=False):
+        self.optimizer = optimizer
+        self.context = json.dumps(context, sort_keys=True, default=_to_json)
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS results "
+                        "(key TEXT PRIMARY KEY, optimizer TEXT, params TEXT, row TEXT)")
+        if fresh:
+            self.db.execute("DELETE FROM results WHERE optimizer = ?", (optimizer,))
+        self.db.commit()
+        self._last_commit = time.monotonic()
+        self._rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def key(self, params):
+        text = _dumps([self.optimizer, self.context, list(params)])
+        return hashlib.sha1(text.encode()).hexdigest()
+
+    def _load(self, search_space):
+        if self._rows is None:
+            self._rows = {}
+        wanted = {self.key(params): params for params in search_space if params not in self._rows}
+        cursor = self.db.execute("SELECT key, row FROM results WHERE optimizer = ?", (self.optimizer,))
+        for key, row in cursor:
+            if key in wanted:
+                self._rows[wanted[key]] = json.loads(row)
+
+    def missing(self, search_space):
+        # Combinations with no stored row, in search-space order
+        self._load(search_space)
+        return [params for params in search_space if params not in self._rows]
+
+    def rows(self, search_space):
+        self._load(search_space)
+        return [self._rows[params] for params in search_space]
+
+    def add(self, params, row, persist=True):
+        # persist=False keeps the row for this run only
+        if persist:
+            self.db.execute("INSERT OR IGNORE INTO results VALUES (?, ?, ?, ?)",
+                            (self.key(params), self.optimizer, _dumps(list(params)), _dumps(row)))
+        if self._rows is not None:
+            self._rows[params] = row
+        if time.monotonic() - self._last_commit >= COMMIT_INTERVAL:
+            self.commit()
+
+    def commit(self):
+        self.db.commit()
+        self._last_commit = time.monotonic()
+
+    def close(self):
+        self.commit()
+        self.db.close()
+
+
+def run_resumable(store, evaluate, search_space, shared=None, workers=None, chunk_size=None,
+                  chunks_per_worker=CHUNKS_PER_WORKER, persist=None):
+    # run_grid over the combinations the store doesn't have yet, saving each
+    # row as it arrives (only those persist(row) accepts, when given). Returns
+    # the rows for the whole search space, in order.
+    search_space = list(search_space)
+    todo = store.missing(search_space)
+    if chunk_size is None:
+        workers = workers or os.cpu_count() or 1
+        chunk_size = max(1, math.ceil(len(todo) / (workers * chunks_per_worker)))
+    if len(todo) < len(search_space):
+        print(f"Resuming: {len(search_space) - len(todo)} of {len(search_space)} "
+              f"combinations already in {store.path}")
+    try:
+        for params, row in zip(todo, run_grid(evaluate, todo, shared, workers, chunk_size)):
+            store.add(params, row, persist is None or persist(row))
+    finally:
+        store.commit()
+    return store.rows(search_space)
+
+
+def add_store_args(parser):
+    parser.add_argument("--store", default=STORE_PATH, help="SQLite file results are saved to as they arrive")
+    parser.add_argument("--fresh", action="store_true",
+                        help="drop this optimizer's stored results and evaluate the whole grid")
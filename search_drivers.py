@@ -0,0 +1,226 @@
+import math
+from collections import namedtuple
+
+import numpy as np
+
+from grid_search import build_search_space
+
+# Budgeted parameter search for the optimizers, as an alternative to
+# enumerating the whole grid. A driver proposes parameter tuples and scores
+# them with objective(params_list, fraction) -> scores (higher is better),
+# where fraction is the share of the history to backtest on, starting from
+# its first bar. The budget is counted in full-history evaluations, so an
+# evaluation on a third of the history costs 1/3.
+#
+#   random    uniform samples, each on the full history
+#   halving   successive halving: many samples on a short window, the best
+#             1/eta promoted to a window eta times longer, up to the full history
+#   tpe       Tree-structured Parzen Estimator: after random start-up trials,
+#             samples where good trials are dense relative to bad ones
+#
+# Dimensions are sequences of values (ranges, lists) or Continuous(low, high).
+
+Continuous = namedtuple("Continuous", "low high")
+Trial = namedtuple("Trial", "params fraction score")
+
+
+class SearchSpace:
+    def __init__(self, dims, where=None):
+        # dims: name -> sequence of values or Continuous; where(*params)
+        # filters out invalid combinations, as in build_search_space
+        self.names = list(dims)
+        self.dims = [dim if isinstance(dim, Continuous) else list(dim) for dim in dims.values()]
+        self.where = where
+        self.finite = not any(isinstance(dim, Continuous) for dim in self.dims)
+        self._grid = None
+
+    def grid(self):
+        if self._grid is None:
+            self._grid = build_search_space(*self.dims, where=self.where)
+        return self._grid
+
+    def size(self):
+        return len(self.grid()) if self.finite else math.inf
+
+    def valid(self, params):
+        return self.where is None or self.where(*params)
+
+    def sample(self, rng, n, exclude=()):
+        # n distinct valid points not in exclude (fewer if a finite space runs out)
+        if self.finite:
+            exclude = set(exclude)
+            remaining = [params for params in self.grid() if params not in exclude]
+            picks = rng.choice(len(remaining), size=min(n, len(remaining)), replace=False)
+            return [remaining[i] for i in picks]
+        points = []
+        while len(points) < n:
+            params = tuple(_sample_dim(dim, rng) for dim in self.dims)
+            if self.valid(params):
+                points.append(params)
+        return points
+
+
+def _sample_dim(dim, rng):
+    if isinstance(dim, Continuous):
+        return round(float(rng.uniform(dim.low, dim.high)), 6)
+    return dim[rng.integers(len(dim))]
+
+
+class Budget:
+    def __init__(self, total):
+        self.total = total
+        self.spent = 0.
+
+    def affordable(self, fraction):
+        # How many evaluations at this fraction still fit
+        return int((self.total - self.spent) / fraction + 1e-9)
+
+    def evaluate(self, objective, params_list, fraction, trials):
+        if not params_list:
+            return []
+        scores = objective(params_list, fraction)
+        self.spent += len(params_list) * fraction
+        new = [Trial(params, fraction, float(score)) for params, score in zip(params_list, scores)]
+        trials.extend(new)
+        return new
+
+
+# ==== Drivers ====
+def random_search(space, objective, budget, rng, batch_size=64):
+    budget = Budget(budget)
+    trials = []
+    seen = set()
+    while (n := min(batch_size, budget.affordable(1.))) > 0:
+        params_list = space.sample(rng, n, exclude=seen)
+        if not params_list:
+            break
+        seen.update(params_list)
+        budget.evaluate(objective, params_list, 1., trials)
+    return trials
+
+
+def successive_halving(space, objective, budget, rng, eta=3, min_fraction=1 / 9):
+    # Every rung costs about the same (eta times fewer trials on eta times more
+    # bars), so the start-up sample size follows from the budget
+    fractions = []
+    fraction = min_fraction
+    while fraction < 1:
+        fractions.append(fraction)
+        fraction *= eta
+    fractions.append(1.)
+
+    n_start = int(budget / (min_fraction * len(fractions)))
+    candidates = space.sample(rng, max(n_start, 1))
+    budget = Budget(budget)
+    trials = []
+    for rung, fraction in enumerate(fractions):
+        candidates = candidates[:budget.affordable(fraction)]
+        rung_trials = budget.evaluate(objective, candidates, fraction, trials)
+        if not rung_trials or fraction == 1.:
+            break
+        keep = max(1, len(rung_trials) // eta)
+        rung_trials.sort(key=lambda trial: trial.score, reverse=True)
+        candidates = [trial.params for trial in rung_trials[:keep]]
+    return trials
+
+
+def tpe_search(space, objective, budget, rng, n_startup=20, gamma=0.25, n_candidates=32, batch_size=8):
+    budget = Budget(budget)
+    trials = []
+    budget.evaluate(objective, space.sample(rng, min(n_startup, budget.affordable(1.))), 1., trials)
+
+    while (n := min(batch_size, budget.affordable(1.))) > 0:
+        seen = {trial.params for trial in trials}
+        ranked = sorted(trials, key=lambda trial: trial.score, reverse=True)
+        n_good = max(1, int(math.ceil(gamma * len(ranked))))
+        good = [trial.params for trial in ranked[:n_good]]
+        bad = [trial.params for trial in ranked[n_good:]] or good
+
+        proposals = []
+        for _ in range(n):
+            params = _tpe_propose(space, good, bad, rng, n_candidates, seen)
+            if params is None:
+                break
+            proposals.append(params)
+            seen.add(params)
+        if not proposals:
+            break
+        budget.evaluate(objective, proposals, 1., trials)
+    return trials
+
+
+def _tpe_propose(space, good, bad, rng, n_candidates, seen):
+    # Draw candidates from the good-trial density l(x) and keep the one with
+    # the highest l(x) / g(x), dimensions treated as independent
+    best, best_ratio = None, -math.inf
+    drawn = 0
+    for _ in range(n_candidates * 4):
+        params = tuple(_parzen_sample(dim, [p[d] for p in good], rng) for d, dim in enumerate(space.dims))
+        if params in seen or not space.valid(params):
+            continue
+        ratio = sum(_parzen_log_density(dim, [p[d] for p in good], params[d]) -
+                    _parzen_log_density(dim, [p[d] for p in bad], params[d])
+                    for d, dim in enumerate(space.dims))
+        if ratio > best_ratio:
+            best, best_ratio = params, ratio
+        drawn += 1
+        if drawn == n_candidates:
+            break
+    if best is None and space.size() > len(seen):
+        # Good region exhausted; fall back to an unseen random point
+        picks = space.sample(rng, 1, exclude=seen)
+        best = picks[0] if picks else None
+    return best
+
+
+def _bandwidth(dim, n):
+    return (dim.high - dim.low) * max(n, 1) ** (-1 / 5) / 2
+
+
+def _parzen_sample(dim, observed, rng):
+    # Mixture of the observations plus one uniform prior component
+    pick = rng.integers(len(observed) + 1)
+    if isinstance(dim, Continuous):
+        if pick == len(observed):
+            return round(float(rng.uniform(dim.low, dim.high)), 6)
+        value = rng.normal(observed[pick], _bandwidth(dim, len(observed)))
+        return round(float(np.clip(value, dim.low, dim.high)), 6)
+    if pick == len(observed):
+        return dim[rng.integers(len(dim))]
+    return observed[pick]
+
+
+def _parzen_log_density(dim, observed, value):
+    if isinstance(dim, Continuous):
+        sigma = _bandwidth(dim, len(observed))
+        obs = np.asarray(observed, dtype=float)
+        kernels = np.exp(-0.5 * ((value - obs) / sigma) ** 2) / (sigma * math.sqrt(2 * math.pi))
+        return math.log((kernels.sum() + 1 / (dim.high - dim.low)) / (len(obs) + 1))
+    # Categorical counts with one prior observation spread over every value
+    count = sum(1 for obs in observed if obs == value)
+    return math.log((count + 1 / len(dim)) / (len(observed) + 1))
+
+
+DRIVERS = {
+    "random": random_search,
+    "halving": successive_halving,
+    "tpe": tpe_search,
+}
+
+
+def run_search(driver, space, objective, budget, seed=0, **options):
+    # Returns (best full-history trial, every trial in evaluation order)
+    trials = DRIVERS[driver](space, objective, budget, np.random.default_rng(seed), **options)
+    full = [trial for trial in trials if trial.fraction == 1.]
+    best = max(full, key=lambda trial: trial.score) if full else None
+    return best, trials
+
+
+def frame_objective(evaluate, df, score_key):
+    # Objective from an optimizer's evaluate(df, chunk) -> result rows: the
+    # row's score_key on the first `fraction` of the frame
+    def objective(params_list, fraction):
+        stop = len(df) if fraction >= 1 else max(int(round(len(df) * fraction)), 2)
+        rows = evaluate(df.iloc[:stop], params_list)
+        return np.array([row[score_key] for row in rows], dtype=float)
+    return objective
@@ -2,6 +2,8 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import os
 
+from metrics import cagr, calendar_years, max_drawdown, round_trips, trade_stats
+
 def load_equity_curve(csv_path):
     df = pd.read_csv(csv_path, parse_dates=['Date'])
     df = df.drop_duplicates(subset='Date')
@@ -9,15 +11,11 @@ def load_equity_curve(csv_path):
     return df['Portfolio Value']
 
 def compute_metrics(df):
-    start_val = df.iloc[0]
-    end_val = df.iloc[-1]
-    pnl = end_val - start_val
-    duration_years = (df.index[-1] - df.index[0]).days / 365.25
-    cagr = (end_val / start_val) ** (1 / duration_years) - 1
-    rolling_max = df.cummax()
-    drawdown = df / rolling_max - 1
-    max_dd = drawdown.min()
-    return round(pnl, 2), round(cagr * 100, 2), round(max_dd * 100, 2)
+    values = df.to_numpy(dtype=float)
+    pnl = values[-1] - values[0]
+    growth = cagr(values[0], values[-1], calendar_years(df.index))
+    max_dd = max_drawdown(values)
+    return round(pnl, 2), round(growth * 100, 2), round(max_dd * 100, 2)
 
 def load_and_compute(csv_path, label):
     df = pd.read_csv(csv_path)
@@ -25,33 +23,20 @@ def load_and_compute(csv_path, label):
     equity['Date'] = pd.to_datetime(equity['Date'])
     equity = equity.drop_duplicates(subset='Date')
     equity = equity.set_index('Date')
-    pnl, cagr, max_dd = compute_metrics(equity['Portfolio Value'])
+    pnl, growth, max_dd = compute_metrics(equity['Portfolio Value'])
 
     trades = df[df['Action'] == 'SELL']
-    wins, losses = 0, 0
-    position_open = False
-    entry_price = 0.0
-
-    for _, row in df.iterrows():
-        if row['Action'] == 'BUY':
-            entry_price = row['Price']
-            position_open = True
-        elif row['Action'] == 'SELL' and position_open:
-            if row['Price'] - entry_price > 0:
-                wins += 1
-            else:
-                losses += 1
-            position_open = False
-
-    win_rate = (wins / (wins + losses) * 100) if (wins + losses) > 0 else 0
+    entries, exits = round_trips(df['Action'].to_numpy(), df['Price'].to_numpy())
+    stats = trade_stats(exits - entries)
     return {
         'Label': label,
         'Final Value': round(equity['Portfolio Value'].iloc[-1], 2),
         'Net PnL': pnl,
-        'CAGR (%)': cagr,
+        'CAGR (%)': growth,
         'Max Drawdown (%)': max_dd,
         'Trades': len(trades),
-        'Win Rate (%)': round(win_rate, 2)
+        'Win Rate (%)': round(stats['win_rate'], 2),
+        'Profit Factor': round(stats['profit_factor'], 2)
     }, equity
 
 def plot_equity_curves(ma_curve, bb_curve):
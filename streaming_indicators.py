@@ -0,0 +1,426 @@
+import math
+import sys
+from collections import deque
+
+from indicators import PREFIX_BLOCK, span_alpha, wilder_alpha
+
+# Streaming (one bar at a time) versions of the kernels in indicators.py.
+# Every update is O(1) and keeps only the state the recursion needs. The
+# arithmetic is the batch kernels' arithmetic step for step, so replaying a
+# series through these objects reproduces the batch arrays bit for bit.
+
+NAN = float('nan')
+
+
+class StreamingEMA:
+    # pandas-style ewm(...).mean() recursion for a single smoothing factor
+    __slots__ = ('alpha', 'adjust', 'min_periods', 'value',
+                 '_weighted', '_nobs', '_old_wt', '_started')
+
+    def __init__(self, span=None, alpha=None, adjust=False, min_periods=0):
+        self.alpha = float(span_alpha(span)) if alpha is None else float(alpha)
+        self.adjust = adjust
+        self.min_periods = max(min_periods, 1)
+        self.value = NAN
+        self._weighted = NAN
+        self._nobs = 0
+        self._old_wt = 1.
+        self._started = False
+
+    def update(self, cur):
+        is_obs = cur == cur
+        if not self._started:
+            # First bar seeds the mean directly
+            self._started = True
+            self._weighted = cur
+            self._nobs = int(is_obs)
+        else:
+            self._nobs += is_obs
+            weighted = self._weighted
+            if weighted == weighted:
+                self._old_wt *= 1. - self.alpha
+                if is_obs:
+                    new_wt = 1. if self.adjust else self.alpha
+                    if weighted != cur:
+                        self._weighted = (self._old_wt * weighted + new_wt * cur) / (self._old_wt + new_wt)
+                    self._old_wt = self._old_wt + new_wt if self.adjust else 1.
+            elif is_obs:
+                self._weighted = cur
+
+        self.value = self._weighted if self._nobs >= self.min_periods else NAN
+        return self.value
+
+
+class RollingMeanStd:
+    # Rolling mean and sample std over a fixed window, using the same blocked
+    # prefix sums as indicators.rolling_mean_std. The ring buffer holds, for
+    # each bar still inside the window, its exclusive in-block prefix sums.
+    __slots__ = ('window', 'ddof', 'with_std', 'mean', 'std', '_block', '_count',
+                 '_ref', '_prev_ref', '_sum1', '_sum2', '_prev_total1', '_prev_total2',
+                 '_ring')
+
+    def __init__(self, window, ddof=1, with_std=True):
+        self.window = window
+        self.ddof = ddof
+        self.with_std = with_std
+        self.mean = NAN
+        self.std = NAN
+        self._block = PREFIX_BLOCK * -(-window // PREFIX_BLOCK)
+        self._count = 0
+        self._ref = NAN
+        self._prev_ref = NAN
+        self._sum1 = 0.
+        self._sum2 = 0.
+        self._prev_total1 = 0.
+        self._prev_total2 = 0.
+        self._ring = deque(maxlen=window)
+
+    def update(self, value):
+        i = self._count
+        self._count += 1
+        block_pos = i % self._block
+        if block_pos == 0:
+            # New block: keep the closing block's totals for straddling windows
+            self._prev_ref = self._ref if i else value
+            self._prev_total1 = self._sum1
+            self._prev_total2 = self._sum2
+            self._ref = value
+            self._sum1 = 0.
+            self._sum2 = 0.
+
+        block_start = i - block_pos
+        self._ring.append((self._sum1, self._sum2, block_start))
+        dev = value - self._ref
+        self._sum1 = self._sum1 + dev
+        if self.with_std:
+            self._sum2 = self._sum2 + dev * dev
+
+        window = self.window
+        if self._count < window:
+            return self.mean, self.std
+
+        begin = self._count - window
+        pre1, pre2, begin_block = self._ring[0]
+        if begin_block == block_start:
+            head1, head2 = pre1, pre2
+            count, tail1, tail2 = 0, 0., 0.
+        else:
+            head1, head2 = 0., 0.
+            count = block_start - begin
+            tail1 = self._prev_total1 - pre1
+            tail2 = self._prev_total2 - pre2
+        shift = self._prev_ref - self._ref
+
+        win1 = self._sum1 - head1 + (tail1 + count * shift)
+        self.mean = (self._ref * window + win1) / window
+
+        if self.with_std and window > self.ddof:
+            win2 = self._sum2 - head2 + (tail2 + (2 * shift) * tail1 + count * (shift * shift))
+            var = (win2 - win1 * win1 / window) / (window - self.ddof)
+            self.std = math.sqrt(max(var, 0.))
+        return self.mean, self.std
+
+
+class StreamingSMA:
+    __slots__ = ('window', 'value', '_rolling')
+
+    def __init__(self, window):
+        self.window = window
+        self.value = NAN
+        self._rolling = RollingMeanStd(window, with_std=False)
+
+    def update(self, value):
+        self.value = self._rolling.update(value)[0]
+        return self.value
+
+
+class StreamingBollinger:
+    # (mid, upper, lower), as indicators.bollinger_bands
+    __slots__ = ('period', 'devfactor', 'mid', 'upper', 'lower', '_rolling')
+
+    def __init__(self, period, devfactor=2.0):
+        self.period = period
+        self.devfactor = devfactor
+        self.mid = self.upper = self.lower = NAN
+        self._rolling = RollingMeanStd(period)
+
+    def update(self, value):
+        mid, std = self._rolling.update(value)
+        width = self.devfactor * std
+        self.mid, self.upper, self.lower = mid, mid + width, mid - width
+        return self.mid, self.upper, self.lower
+
+
+class StreamingMACD:
+    # (macd, signal, histogram), as indicators.macd
+    __slots__ = ('macd', 'signal', 'histogram', '_fast', '_slow', '_signal')
+
+    def __init__(self, fast, slow, signal):
+        self.macd = self.signal = self.histogram = NAN
+        self._fast = StreamingEMA(span=fast)
+        self._slow = StreamingEMA(span=slow)
+        self._signal = StreamingEMA(span=signal)
+
+    def update(self, value):
+        self.macd = self._fast.update(value) - self._slow.update(value)
+        self.signal = self._signal.update(self.macd)
+        self.histogram = self.macd - self.signal
+        return self.macd, self.signal, self.histogram
+
+
+class StreamingRSI:
+    # Wilder RSI, as indicators.wilder_rsi
+    __slots__ = ('period', 'value', '_prev', '_avg_gain', '_avg_loss')
+
+    def __init__(self, period, adjust=False):
+        self.period = period
+        self.value = NAN
+        self._prev = None
+        alpha = float(wilder_alpha(period))
+        self._avg_gain = StreamingEMA(alpha=alpha, adjust=adjust, min_periods=period)
+        self._avg_loss = StreamingEMA(alpha=alpha, adjust=adjust, min_periods=period)
+
+    def update(self, value):
+        delta = NAN if self._prev is None else value - self._prev
+        self._prev = value
+        if delta != delta:
+            gain = loss = NAN
+        else:
+            gain = delta if delta > 0 else 0.
+            loss = -delta if delta < 0 else 0.
+        avg_gain = self._avg_gain.update(gain)
+        avg_loss = self._avg_loss.update(loss)
+
+        if avg_gain != avg_gain or avg_loss != avg_loss:
+            rs = NAN
+        elif avg_loss == 0:
+            # NumPy division semantics, as in the batch kernel
+            rs = math.inf if avg_gain > 0 else NAN
+        else:
+            rs = avg_gain / avg_loss
+        self.value = 100 - (100 / (1 + rs))
+        return self.value
+
+
+class StreamingOBV:
+    __slots__ = ('value', '_prev')
+
+    def __init__(self):
+        self.value = 0
+        self._prev = None
+
+    def update(self, close, volume):
+        if self._prev is not None:
+            if close > self._prev:
+                self.value += volume
+            elif close < self._prev:
+                self.value -= volume
+        self._prev = close
+        return self.value
+
+
+# ==== Backtrader-identical indicators ====
+# Streaming versions of CachedIndicators' bt_* series, which reproduce
+# Backtrader's arithmetic: averages are math.fsum over the window (O(window)
+# per bar, the price of matching it bit for bit), EMA / SMMA are seeded with
+# the SMA of the first full window, and Bollinger bands use the population
+# standard deviation. Inputs that start with NaN (a line still warming up)
+# start counting at their first value, like a Backtrader line.
+
+class StreamingBtSMA:
+    __slots__ = ('period', 'value', '_window')
+
+    def __init__(self, period):
+        self.period = period
+        self.value = NAN
+        self._window = deque(maxlen=period)
+
+    def update(self, value):
+        if value != value and not self._window:
+            return self.value
+        self._window.append(value)
+        if len(self._window) == self.period:
+            self.value = math.fsum(self._window) / self.period
+        return self.value
+
+
+class StreamingBtSmoothing:
+    # Backtrader's ExponentialSmoothing: prev * (1 - alpha) + value * alpha
+    # once the SMA seed is in
+    __slots__ = ('alpha', 'value', '_alpha1', '_seed')
+
+    def __init__(self, period, alpha):
+        self.alpha = alpha
+        self.value = NAN
+        self._alpha1 = 1.0 - alpha
+        self._seed = StreamingBtSMA(period)
+
+    def update(self, value):
+        if self._seed is not None:
+            self.value = self._seed.update(value)
+            if self.value == self.value:
+                self._seed = None
+        else:
+            self.value = self.value * self._alpha1 + value * self.alpha
+        return self.value
+
+
+class StreamingBtEMA(StreamingBtSmoothing):
+    __slots__ = ()
+
+    def __init__(self, period):
+        super().__init__(period, 2.0 / (1.0 + period))
+
+
+class StreamingBtMACD:
+    # (macd, signal), as CachedIndicators.bt_macd
+    __slots__ = ('macd', 'signal', '_fast', '_slow', '_signal')
+
+    def __init__(self, fast, slow, signal):
+        self.macd = self.signal = NAN
+        self._fast = StreamingBtEMA(fast)
+        self._slow = StreamingBtEMA(slow)
+        self._signal = StreamingBtEMA(signal)
+
+    def update(self, value):
+        self.macd = self._fast.update(value) - self._slow.update(value)
+        self.signal = self._signal.update(self.macd)
+        return self.macd, self.signal
+
+
+class StreamingBtRSI:
+    # bt.indicators.RSI, as CachedIndicators.bt_rsi
+    __slots__ = ('period', 'value', '_prev', '_up', '_down')
+
+    def __init__(self, period):
+        self.period = period
+        self.value = NAN
+        self._prev = None
+        self._up = StreamingBtSmoothing(period, 1.0 / period)
+        self._down = StreamingBtSmoothing(period, 1.0 / period)
+
+    def update(self, value):
+        if self._prev is None:
+            up = down = NAN
+        else:
+            up = max(value - self._prev, 0.0)
+            down = max(self._prev - value, 0.0)
+        self._prev = value
+        up = self._up.update(up)
+        down = self._down.update(down)
+
+        if up != up or down != down:
+            rs = NAN
+        elif down == 0:
+            # NumPy division semantics, as in the batch series
+            rs = math.inf if up > 0 else NAN
+        else:
+            rs = up / down
+        self.value = 100.0 - 100.0 / (1.0 + rs)
+        return self.value
+
+
+class StreamingBtBollinger:
+    # (mid, top, bot), as CachedIndicators.bt_bollinger
+    __slots__ = ('period', 'devfactor', 'mid', 'top', 'bot', '_window')
+
+    def __init__(self, period, devfactor=2.0):
+        self.period = period
+        self.devfactor = devfactor
+        self.mid = self.top = self.bot = NAN
+        self._window = deque(maxlen=period)
+
+    def update(self, value):
+        window = self._window
+        window.append(value)
+        if len(window) == self.period:
+            self.mid = ma = math.fsum(window) / self.period
+            meansq = math.fsum(x ** 2 for x in window) / self.period
+            stddev = self.devfactor * pow(abs(meansq - ma ** 2), 0.5)
+            self.top = ma + stddev
+            self.bot = ma - stddev
+        return self.mid, self.top, self.bot
+
+
+class StreamingCrossOver:
+    # bt.indicators.CrossOver, as native_backtest.crossover: +1 / -1 when the
+    # difference changes sign against its last non-zero value, else 0; NaN
+    # until both lines have a value and one bar more
+    __slots__ = ('value', '_last')
+
+    def __init__(self):
+        self.value = NAN
+        self._last = None
+
+    def update(self, fast, slow):
+        diff = fast - slow
+        if diff != diff:
+            return self.value
+        if self._last is None:
+            self._last = diff
+            return self.value
+        self.value = float(self._last < 0 and diff > 0) - float(self._last > 0 and diff < 0)
+        if diff != 0:
+            self._last = diff
+        return self.value
+
+
+def replay_check(csv_path="dataset/nifty_data_clean.csv"):
+    # Replays the dataset through every streaming indicator and compares the
+    # result with the batch kernels (and the bt_* series), bit for bit
+    import numpy as np
+
+    import indicators
+    from dataset_store import load_frame
+    from indicator_cache import CachedIndicators
+    from native_backtest import crossover
+
+    df = load_frame(csv_path)
+    close = df["Close"].to_numpy()
+    volume = df["Volume"].to_numpy()
+
+    def run(indicator, *columns):
+        return np.array([indicator.update(*bar) for bar in zip(*columns)], dtype=float)
+
+    checks = {}
+    for window in (5, 20, 90):
+        checks[f"SMA({window})"] = (run(StreamingSMA(window), close), indicators.sma(close, window))
+        mean_std = run(RollingMeanStd(window), close)
+        checks[f"STD({window})"] = (mean_std[:, 1], indicators.rolling_std(close, window))
+    checks["Bollinger(20, 2)"] = (run(StreamingBollinger(20, 2.0), close).T,
+                                  np.array(indicators.bollinger_bands(close, 20, 2.0)))
+    for span in (12, 26, 70):
+        checks[f"EMA({span})"] = (run(StreamingEMA(span=span), close), indicators.ema(close, span))
+    checks["MACD(16, 70, 6)"] = (run(StreamingMACD(16, 70, 6), close).T,
+                                 np.array(indicators.macd(close, 16, 70, 6)))
+    for period in (14, 21):
+        for adjust in (False, True):
+            checks[f"RSI({period}, adjust={adjust})"] = (
+                run(StreamingRSI(period, adjust=adjust), close),
+                indicators.wilder_rsi(close, period, adjust=adjust))
+    checks["OBV"] = (run(StreamingOBV(), close, volume), indicators.obv(close, volume).astype(float))
+
+    cached = CachedIndicators(df)
+    close_list = close.tolist()
+    obv_list = indicators.obv(close, volume).tolist()
+    for period in (20, 90):
+        checks[f"bt SMA({period})"] = (run(StreamingBtSMA(period), close_list), cached.bt_sma(period))
+    checks["bt Bollinger(20, 2)"] = (run(StreamingBtBollinger(20, 2.0), close_list).T,
+                                     np.array(cached.bt_bollinger(20, 2.0)))
+    checks["bt MACD(16, 70, 6)"] = (run(StreamingBtMACD(16, 70, 6), close_list).T,
+                                    np.array(cached.bt_macd(16, 70, 6)))
+    checks["bt RSI(21)"] = (run(StreamingBtRSI(21), close_list), cached.bt_rsi(21))
+    checks["bt OBV SMA(5)"] = (run(StreamingBtSMA(5), obv_list), cached.bt_obv_ma(5))
+    checks["bt CrossOver(20, 90)"] = (run(StreamingCrossOver(), cached.bt_sma(20).tolist(), cached.bt_sma(90).tolist()),
+                                      crossover(cached.bt_sma(20), cached.bt_sma(90)))
+
+    all_equal = True
+    for name, (streamed, batch) in checks.items():
+        equal = np.array_equal(streamed, batch, equal_nan=True)
+        all_equal &= equal
+        print(f"{name:<24}: {'bit-identical' if equal else 'MISMATCH'}")
+    return all_equal
+
+
+if __name__ == "__main__":
+    sys.exit(0 if replay_check(*sys.argv[1:]) else 1)
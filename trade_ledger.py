@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from jit import njit
+
+# Rebuilds a bar-by-bar equity curve from a trade log. Every trade is placed
+# on its bar with one index lookup, cash and share changes are summed per bar
+# and accumulated, so the replay is linear in bars + trades instead of
+# scanning the whole log for every bar.
+#
+# Trades apply in log order on the bar whose timestamp equals theirs (trades
+# matching no bar are ignored). A buy whose cost the cash on hand can't cover
+# is skipped, as in the optimizers' replay loops.
+
+
+def trade_bars(index, dates):
+    # Bar position of each trade, -1 where its date matches no bar
+    return pd.DatetimeIndex(index).get_indexer(pd.DatetimeIndex(pd.to_datetime(dates)))
+
+
+@njit(cache=True)
+def _filled(shares, cash_change, initial_cash):
+    # One pass in log order carrying the cash forward; a buy the cash on hand
+    # can't cover is skipped and leaves the cash as it was
+    filled = np.ones(len(shares), dtype=np.bool_)
+    cash = initial_cash
+    for k in range(len(shares)):
+        if shares[k] > 0 and cash < -cash_change[k]:
+            filled[k] = False
+        else:
+            cash += cash_change[k]
+    return filled
+
+
+def replay_ledger(index, dates, actions, prices, sizes, initial_cash, commission=0.0):
+    # (cash, shares) after each bar's trades, one value per bar
+    bars = trade_bars(index, dates)
+    actions = np.asarray(actions)
+    sizes = np.asarray(sizes, dtype=np.int64)
+    prices = np.asarray(prices, dtype=float)
+    shares = np.where(actions == "BUY", sizes, np.where(actions == "SELL", -sizes, 0))
+
+    # Stable sort keeps the log order of trades on the same bar
+    order = np.argsort(np.where(bars < 0, len(index), bars), kind="stable")
+    order = order[bars[order] >= 0]
+    bars, shares, prices = bars[order], shares[order], prices[order]
+    value = shares * prices
+    cash_change = -value - commission * np.abs(value)
+
+    filled = _filled(np.ascontiguousarray(shares, dtype=np.int64), np.ascontiguousarray(cash_change),
+                     float(initial_cash))
+
+    n_bars = len(index)
+    cash = np.cumsum(np.concatenate(([float(initial_cash)],
+                                     np.bincount(bars[filled], weights=cash_change[filled],
+                                                 minlength=n_bars))))[1:]
+    held = np.cumsum(np.bincount(bars[filled], weights=shares[filled], minlength=n_bars)).astype(np.int64)
+    return cash, held
+
+
+def ledger_equity(index, close, dates, actions, prices, sizes, initial_cash, commission=0.0):
+    # Portfolio value at every bar's close
+    cash, held = replay_ledger(index, dates, actions, prices, sizes, initial_cash, commission)
+    return cash + held * np.asarray(close, dtype=float)